@@ -0,0 +1,182 @@
+"""ヒント表の構築（v2）
+
+到達可能な全状態について、クリアまでの最小残り質問数と最短でクリアに向かう次の質問の
+集合を後退解析で求め、src/hints.py の形式で書き出す。ゲーム中は engine.hint() が
+この表を 1 回引くだけで答える。
+
+遷移はエンジン（src/engine.py）と同じ意味論で評価する:
+- 棄却は confirmed のみで判定し、導出（formation_conditions）の不動点計算で棄却済みを飛ばす
+- 利用可能性は prerequisites ⊆ confirmed かつ想起条件を known（confirmed ∪ derived）で判定
+- クリア判定は confirmed のみ
+
+状態は confirmed のビットセット。reveals が全て confirmed 済みの質問は状態を変えないので
+展開しない。回答で confirmed は真に増えるので、要素数の多い状態から順に
+  残り手数(s) = 0（クリア済み） / min(1 + 残り手数(後続)) / クリア不能
+を確定できる（後続は必ず先に確定している）。クリア済みの状態は展開しない。
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from common import option_value  # noqa: E402
+from disk_frontier import BitsetCodec  # noqa: E402
+from engine import PuzzleData, hint, init_game, load_hints, load_puzzle  # noqa: E402
+from hints import puzzle_fingerprint, write_hint_table  # noqa: E402
+
+
+class HintRules:
+    """エンジンの遷移を confirmed のビットセット上で評価する"""
+
+    def __init__(self, puzzle: PuzzleData):
+        ids = list(puzzle.descriptors)
+        ids.extend(puzzle.initial_confirmed)
+        for d in puzzle.descriptors.values():
+            for conditions in (d.formation_conditions, d.rejection_conditions):
+                for group in conditions or []:
+                    ids.extend(group)
+        for q in puzzle.questions.values():
+            ids.extend(q.prerequisites)
+            ids.extend(q.reveals)
+            for group in q.recall_conditions:
+                ids.extend(group)
+        for group in puzzle.clear_conditions:
+            ids.extend(group)
+        self.codec = codec = BitsetCodec(ids)
+
+        def bit(id_: str) -> int:
+            return 1 << codec.index[id_]
+
+        self.formation = [
+            (bit(d.id), [codec.encode(g) for g in d.formation_conditions])
+            for d in puzzle.descriptors.values()
+            if d.formation_conditions is not None
+        ]
+        self.rejection = [
+            (bit(d.id), [codec.encode(g) for g in d.rejection_conditions])
+            for d in puzzle.descriptors.values()
+            if d.rejection_conditions is not None
+        ]
+        # 質問（定義順）: (前提条件マスク, 想起条件マスクのリスト, reveals マスク)
+        self.questions = [
+            (codec.encode(q.prerequisites), [codec.encode(g) for g in q.recall_conditions], codec.encode(q.reveals))
+            for q in puzzle.questions.values()
+        ]
+        self.clear = [codec.encode(g) for g in puzzle.clear_conditions]
+        self.initial = codec.encode(puzzle.initial_confirmed)
+
+    def known(self, confirmed: int) -> int:
+        """confirmed ∪ derived（evaluate_derivations と同じ計算）"""
+        rejected = 0
+        for bit, groups in self.rejection:
+            if any(confirmed & g == g for g in groups):
+                rejected |= bit
+        known = confirmed
+        changed = True
+        while changed:
+            changed = False
+            for bit, groups in self.formation:
+                if known & bit or rejected & bit:
+                    continue
+                if any(known & g == g for g in groups):
+                    known |= bit
+                    changed = True
+        return known
+
+    def is_clear(self, confirmed: int) -> bool:
+        return any(confirmed & g == g for g in self.clear)
+
+    def successors(self, confirmed: int):
+        """(質問の位置, 回答後の confirmed)。状態を変えない質問は除く"""
+        known = self.known(confirmed)
+        for i, (prerequisites, recall, reveals) in enumerate(self.questions):
+            if confirmed & reveals == reveals or confirmed & prerequisites != prerequisites:
+                continue
+            if any(known & g == g for g in recall):
+                yield i, confirmed | reveals
+
+
+def retrograde(rules: HintRules) -> dict[int, tuple[int | None, int]]:
+    """到達可能状態ごとの (残り手数（クリア不能なら None）, 最適な次の質問の位置マスク)"""
+    # 前向き: 到達可能状態と遷移を列挙する
+    successors: dict[int, list[tuple[int, int]]] = {}
+    stack = [rules.initial]
+    while stack:
+        bits = stack.pop()
+        if bits in successors:
+            continue
+        moves: list[tuple[int, int]] = []
+        if not rules.is_clear(bits):
+            for pos, succ in rules.successors(bits):
+                moves.append((pos, succ))
+                if succ not in successors:
+                    stack.append(succ)
+        successors[bits] = moves
+
+    # 後ろ向き: confirmed の要素数が多い状態から確定する
+    entries: dict[int, tuple[int | None, int]] = {}
+    for bits in sorted(successors, key=lambda b: -b.bit_count()):
+        if rules.is_clear(bits):
+            entries[bits] = (0, 0)
+            continue
+        best: int | None = None
+        mask = 0
+        for pos, succ in successors[bits]:
+            remaining = entries[succ][0]
+            if remaining is None:
+                continue
+            if best is None or remaining + 1 < best:
+                best, mask = remaining + 1, 1 << pos
+            elif remaining + 1 == best:
+                mask |= 1 << pos
+        entries[bits] = (best, mask)
+    return entries
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python build_hints.py <data.json> [--out PATH]", file=sys.stderr)
+        sys.exit(2)
+
+    path = sys.argv[1]
+    if not Path(path).exists():
+        print(f"Error: {path} が見つかりません", file=sys.stderr)
+        sys.exit(2)
+
+    out = option_value("--out") or str(Path(path).with_suffix(".hints"))
+
+    puzzle = load_puzzle(path)
+    if not puzzle.clear_conditions:
+        print("clear_conditions が未定義")
+        return
+
+    start = time.perf_counter()
+    rules = HintRules(puzzle)
+    entries = retrograde(rules)
+    size = write_hint_table(out, entries, rules.codec.ids, list(puzzle.questions), puzzle_fingerprint(puzzle))
+    elapsed = time.perf_counter() - start
+
+    unsolvable = sum(1 for remaining, _ in entries.values() if remaining is None)
+    cleared = sum(1 for remaining, _ in entries.values() if remaining == 0)
+    print(f"[build_hints] {out}: {len(entries)} 状態 / {size} バイト ({elapsed:.2f} 秒)")
+    print(f"  クリア済み: {cleared} / クリア不能: {unsolvable}")
+
+    # 書き出した表をエンジン経由で引く
+    load_hints(puzzle, out)
+    initial = hint(init_game(puzzle), puzzle)
+    if initial is None:
+        print("  ✗ 初期状態がヒント表にありません")
+        sys.exit(1)
+    if initial.remaining is None:
+        print("  初期状態: クリア不能")
+    else:
+        questions = ", ".join(q.id for q in initial.questions) or "（なし）"
+        print(f"  初期状態: 残り {initial.remaining} 問 / 次の質問: {questions}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,8 @@ import json
 import sys
 from pathlib import Path
 
+from closure import DerivationClosure, get_closure
+
 
 def load_data(path: str) -> dict:
     with open(path, encoding="utf-8") as f:
@@ -90,21 +92,13 @@ def check_reveals_scope(data: dict) -> list[str]:
     return errors
 
 
-def _derivable_from(available: set[str], derived_conditions: dict[str, list[list[str]]]) -> set[str]:
-    """available から不動点計算で導出可能な記述素を返す"""
-    derived = set(available)
-    changed = True
-    while changed:
-        changed = False
-        for did, conditions in derived_conditions.items():
-            if did in derived:
-                continue
-            for cond_group in conditions:
-                if all(ref in derived for ref in cond_group):
-                    derived.add(did)
-                    changed = True
-                    break
-    return derived - available
+def _derivable_from(
+    available: set[str],
+    closure: DerivationClosure,
+    base: set[str] | None = None,
+) -> set[str]:
+    """available から不動点計算で導出可能な記述素を返す（閉包サービスでメモ化）"""
+    return set(closure.closure(available, base=base)) - available
 
 
 def check_recall_derivability(data: dict) -> list[str]:
@@ -122,17 +116,20 @@ def check_recall_derivability(data: dict) -> list[str]:
         conds = d.get("formation_conditions", []) + d.get("entailment_conditions", [])
         if conds:
             derived_conditions[d["id"]] = conds
+    closure = get_closure(derived_conditions)  # 条件のコンパイルはファイルごとに 1 回
 
     for chain in data.get("_piece_chains", []):
         chain_id = chain.get("id", "?")
         # 累積 input: initial_confirmed + 前のステップの output も利用可能
         cumulative_available: set[str] = set(initial)
+        previous: set[str] | None = None
         for i, step in enumerate(chain.get("steps", [])):
             step_input = set(step.get("input", []))
             cumulative_available.update(step_input)
 
-            # cumulative_available から導出可能な記述素を計算
-            derivable = _derivable_from(cumulative_available, derived_conditions)
+            # cumulative_available から導出可能な記述素を計算（前ステップの閉包から差分拡張）
+            derivable = _derivable_from(cumulative_available, closure, base=previous)
+            previous = set(cumulative_available)
             reachable = cumulative_available | derivable
 
             for qid in step.get("questions", []):
@@ -9,6 +9,8 @@ import json
 import sys
 from pathlib import Path
 
+from closure import get_closure
+
 
 def load_data(path: str) -> dict:
     with open(path, encoding="utf-8") as f:
@@ -92,43 +94,21 @@ def _derivable_descriptors(
     allowed_confirmed: set[str],
     descriptors: dict[str, list[list[str]]],
     rejection_conditions: dict[str, list[list[str]]] | None = None,
+    base: set[str] | None = None,
 ) -> set[str]:
     """allowed_confirmed から導出可能な全記述素を不動点計算で求める。
 
     導出ロジック:
     1. 棄却集合を計算（rejection_conditions が confirmed で満たされるもの）
     2. 導出済み集合を allowed_confirmed で初期化
-    3. 記述素が導出済み集合内と一致 → 導出（棄却済みを除く）
-    4. 形成条件のいずれかのグループが全て導出済み → 導出（棄却済みを除く）
-    5. 変化がなくなるまで繰り返す
+    3. 形成条件のいずれかのグループが全て導出済み → 導出（棄却済みを除く）
+    4. 変化がなくなるまで繰り返す
+
+    計算は共有の閉包サービス（closure.py）でメモ化される。
     """
-    # 棄却集合の計算
-    rejected = set()
-    if rejection_conditions:
-        for did, conditions in rejection_conditions.items():
-            if any(all(c in allowed_confirmed for c in group) for group in conditions):
-                rejected.add(did)
-
-    derived = set(allowed_confirmed)
-    changed = True
-    while changed:
-        changed = False
-        for did, conditions in descriptors.items():
-            if did in derived or did in rejected:
-                continue
-            # 記述素が confirmed と一致する場合
-            if did in allowed_confirmed:
-                derived.add(did)
-                changed = True
-                continue
-            # 形成条件が全て導出済みの場合
-            for cond_group in conditions:
-                if all(ref in derived for ref in cond_group):
-                    derived.add(did)
-                    changed = True
-                    break
+    closure = get_closure(descriptors, rejection_conditions)
     # 導出済み集合のうち導出記述素IDに該当するものを返す
-    return {did for did in derived if did in descriptors}
+    return set(closure.derivable(allowed_confirmed, base=base))
 
 
 def check_recall_scope(data: dict) -> list[str]:
@@ -0,0 +1,225 @@
+"""導出閉包サービス
+
+「許可集合（allowed）から導出可能な記述素」の不動点計算を 1 か所に集約する。
+条件はパズルごとに 1 回だけビットマスクへコンパイルし、内容の指紋をキーに
+モジュール内でキャッシュする。結果は allowed の正準ビットセットをキーにメモ化する。
+長時間動くプロセスでも増え続けないよう、キャッシュとメモはどちらも件数に上限を設け、
+最も長く使われていないものから捨てる。
+
+導出ロジック（v2）:
+1. 棄却集合を計算（rejection_conditions が allowed で満たされるもの）
+2. 導出済み集合を allowed で初期化
+3. 条件グループのいずれかが全て導出済み → 導出（棄却済みを除く）
+4. 変化がなくなるまで繰り返す
+
+base に既に問い合わせた部分集合を渡すと、その閉包から不動点計算を再開する。
+棄却集合が base と同じ（棄却なしを含む）なら導出は単調なので結果は変わらない。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from collections.abc import Iterable
+
+_MAX_CLOSURES = 128
+_MAX_MEMO = 1 << 16  # 1 閉包あたりのメモ（閉包・decode 結果それぞれ）の上限
+
+
+def _remember(cache: dict, key, value, limit: int) -> None:
+    """cache に追加する（上限に達していれば最も長く使われていないものを捨てる）"""
+    if len(cache) >= limit:
+        del cache[next(iter(cache))]
+    cache[key] = value
+
+
+class DerivationClosure:
+    """1 パズル分の導出条件をコンパイルし、閉包をメモ化して返す"""
+
+    def __init__(
+        self,
+        conditions: dict[str, list[list[str]]],
+        rejection_conditions: dict[str, list[list[str]]] | None = None,
+    ):
+        self.ids: list[str] = []
+        self.index: dict[str, int] = {}
+        for did, groups in conditions.items():
+            self._bit(did)
+            for group in groups:
+                for ref in group:
+                    self._bit(ref)
+        for did, groups in (rejection_conditions or {}).items():
+            self._bit(did)
+            for group in groups:
+                for ref in group:
+                    self._bit(ref)
+
+        self._rules: list[tuple[int, list[int]]] = [
+            (self._bit(did), [self.encode(g) for g in groups])
+            for did, groups in conditions.items()
+        ]
+        self._rejection: list[tuple[int, list[int]]] = [
+            (self._bit(did), [self.encode(g) for g in groups])
+            for did, groups in (rejection_conditions or {}).items()
+        ]
+        self._targets = 0
+        for bit, _ in self._rules:
+            self._targets |= bit
+
+        # allowed ビット → (棄却ビット, 閉包ビット)
+        self._memo: dict[int, tuple[int, int]] = {}
+        self._decoded: dict[int, frozenset[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.extended = 0
+
+    # --- ビットセット ---
+
+    def _bit(self, id_: str) -> int:
+        """ID のビットを返す（未知の ID には遅延的に番号を振る）"""
+        idx = self.index.get(id_)
+        if idx is None:
+            idx = len(self.ids)
+            self.ids.append(id_)
+            self.index[id_] = idx
+        return 1 << idx
+
+    def encode(self, members: Iterable[str]) -> int:
+        bits = 0
+        for id_ in members:
+            bits |= self._bit(id_)
+        return bits
+
+    def decode(self, bits: int) -> frozenset[str]:
+        result = self._decoded.pop(bits, None)
+        if result is not None:
+            self._decoded[bits] = result  # 最近使ったものとして末尾に移す
+        else:
+            ids = []
+            rest = bits
+            while rest:
+                low = rest & -rest
+                ids.append(self.ids[low.bit_length() - 1])
+                rest ^= low
+            result = frozenset(ids)
+            _remember(self._decoded, bits, result, _MAX_MEMO)
+        return result
+
+    # --- 閉包 ---
+
+    def _rejected(self, allowed: int) -> int:
+        rejected = 0
+        for bit, groups in self._rejection:
+            if any(allowed & g == g for g in groups):
+                rejected |= bit
+        return rejected
+
+    def _fixpoint(self, known: int, rejected: int) -> int:
+        changed = True
+        while changed:
+            changed = False
+            for bit, groups in self._rules:
+                if known & bit or rejected & bit:
+                    continue
+                if any(known & g == g for g in groups):
+                    known |= bit
+                    changed = True
+        return known
+
+    def closure_bits(self, allowed: int, base: int | None = None) -> int:
+        """allowed ∪ 導出可能な記述素のビットセット"""
+        cached = self._memo.pop(allowed, None)
+        if cached is not None:
+            self._memo[allowed] = cached
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+
+        rejected = self._rejected(allowed)
+        start = allowed
+        if base is not None and base & allowed == base:
+            prior = self._memo.get(base)
+            if prior is not None and prior[0] == rejected:
+                start |= prior[1]
+                self.extended += 1
+        known = self._fixpoint(start, rejected)
+        _remember(self._memo, allowed, (rejected, known), _MAX_MEMO)
+        return known
+
+    def closure(self, allowed: Iterable[str], base: Iterable[str] | None = None) -> frozenset[str]:
+        """allowed ∪ 導出可能な記述素"""
+        base_bits = None if base is None else self.encode(base)
+        return self.decode(self.closure_bits(self.encode(allowed), base_bits))
+
+    def derivable(self, allowed: Iterable[str], base: Iterable[str] | None = None) -> frozenset[str]:
+        """閉包のうち導出条件を持つ記述素（allowed に含まれるものも含む）"""
+        base_bits = None if base is None else self.encode(base)
+        return self.decode(self.closure_bits(self.encode(allowed), base_bits) & self._targets)
+
+    # --- 統計 ---
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "extended": self.extended,
+            "hit_rate": round(self.hit_rate, 4),
+            "cached": len(self._memo),
+        }
+
+
+_CLOSURES: dict[str, DerivationClosure] = {}
+
+
+def _fingerprint(conditions: dict, rejection_conditions: dict | None) -> str:
+    """条件の内容に対する指紋（id が null の記述素を含む壊れたデータでも落ちない）
+
+    >>> _fingerprint({None: [["d1"]], "d2": [["d1"]]}, None) == _fingerprint({"d2": [["d1"]], None: [["d1"]]}, {})
+    True
+    """
+    payload = json.dumps(
+        [sorted(map(repr, c.items())) for c in (conditions, rejection_conditions or {})], ensure_ascii=False
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def get_closure(
+    conditions: dict[str, list[list[str]]],
+    rejection_conditions: dict[str, list[list[str]]] | None = None,
+) -> DerivationClosure:
+    """条件の内容が同じなら同じ DerivationClosure を返す（パズルごとに 1 回コンパイル）"""
+    key = _fingerprint(conditions, rejection_conditions)
+    closure = _CLOSURES.pop(key, None)
+    if closure is not None:
+        _CLOSURES[key] = closure  # 最近使ったものとして末尾に移す
+    else:
+        closure = DerivationClosure(conditions, rejection_conditions)
+        _remember(_CLOSURES, key, closure, _MAX_CLOSURES)
+    return closure
+
+
+def closure_stats() -> dict:
+    """キャッシュ中の全閉包の統計を合算する"""
+    hits = sum(c.hits for c in _CLOSURES.values())
+    misses = sum(c.misses for c in _CLOSURES.values())
+    total = hits + misses
+    return {
+        "puzzles": len(_CLOSURES),
+        "hits": hits,
+        "misses": misses,
+        "extended": sum(c.extended for c in _CLOSURES.values()),
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+    }
+
+
+def format_stats() -> str:
+    s = closure_stats()
+    return (
+        f"[closure] 閉包キャッシュ: hit {s['hits']} / miss {s['misses']} "
+        f"(hit率 {s['hit_rate']:.1%}, 差分拡張 {s['extended']}, 条件セット {s['puzzles']})"
+    )
@@ -0,0 +1,14 @@
+"""評価スクリプト共通モジュール (v2)"""
+
+from __future__ import annotations
+
+import sys
+
+
+def option_value(name: str) -> str | None:
+    """コマンドライン引数 name の次の値（なければ None）"""
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv):
+            return sys.argv[idx + 1]
+    return None
@@ -0,0 +1,221 @@
+"""ディスク退避型フロンティア
+
+層別 BFS のフロンティア層と訪問済み集合をローカルのメモリマップファイルへ退避する。
+状態は固定長ビットセット（ビッグエンディアンのバイト列）で表現し、
+ソート済みランのマージで重複排除する。
+
+メモリ上に保持するのは 1 ラン分のバッファとマージ中の先頭レコードのみなので、
+状態数が 10^8 規模になってもメモリ使用量は run_size で上限が決まる。
+
+利用しているのは v2 の find_min_questions（--disk）のみ。v3 の網羅探索は対象外で、
+v3 find_min_questions は層ごとに支配枝刈り（層内の全状態どうしの包含判定）を行い、
+explore_states は最短経路の復元用に親ポインタ付きの状態グラフを保持するため、
+どちらも層をメモリ上に持つ前提で組まれている。
+"""
+
+from __future__ import annotations
+
+import heapq
+import mmap
+import os
+import shutil
+import tempfile
+from collections.abc import Callable, Iterable, Iterator
+
+DEFAULT_RUN_SIZE = 1 << 20  # 1 ランあたりのレコード数
+
+
+class BitsetCodec:
+    """ID 集合 ↔ 固定長ビットセットの相互変換"""
+
+    def __init__(self, ids: Iterable[str]):
+        self.ids: list[str] = list(dict.fromkeys(ids))
+        self.index: dict[str, int] = {id_: i for i, id_ in enumerate(self.ids)}
+        self.width = max(1, (len(self.ids) + 7) // 8)  # レコード長（バイト）
+
+    def encode(self, members: Iterable[str]) -> int:
+        bits = 0
+        for id_ in members:
+            bits |= 1 << self.index[id_]
+        return bits
+
+    def decode(self, bits: int) -> frozenset[str]:
+        return frozenset(id_ for i, id_ in enumerate(self.ids) if bits >> i & 1)
+
+    def to_bytes(self, bits: int) -> bytes:
+        # ビッグエンディアンなのでバイト列の辞書順 = 整数の大小順
+        return bits.to_bytes(self.width, "big")
+
+    def from_bytes(self, record: bytes) -> int:
+        return int.from_bytes(record, "big")
+
+
+class StateFile:
+    """ソート済み・重複なしの固定長レコード列を保持するファイル"""
+
+    def __init__(self, path: str, width: int, count: int):
+        self.path = path
+        self.width = width
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self.count == 0:
+            return
+        with open(self.path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                w = self.width
+                for offset in range(0, self.count * w, w):
+                    yield mm[offset:offset + w]
+
+    def __contains__(self, record: bytes) -> bool:
+        """二分探索による所属判定"""
+        if self.count == 0:
+            return False
+        with open(self.path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                w = self.width
+                lo, hi = 0, self.count
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    value = mm[mid * w:(mid + 1) * w]
+                    if value < record:
+                        lo = mid + 1
+                    elif value > record:
+                        hi = mid
+                    else:
+                        return True
+        return False
+
+
+def _write_unique(path: str, width: int, records: Iterable[bytes]) -> StateFile:
+    """ソート済みレコード列を重複排除しながら書き出す"""
+    count = 0
+    prev = None
+    with open(path, "wb") as f:
+        for record in records:
+            if record == prev:
+                continue
+            f.write(record)
+            prev = record
+            count += 1
+    return StateFile(path, width, count)
+
+
+def _difference(records: Iterable[bytes], excluded: Iterable[bytes]) -> Iterator[bytes]:
+    """ソート済みレコード列 records から excluded に含まれるものを除く（マージ差分）"""
+    it = iter(excluded)
+    current = next(it, None)
+    for record in records:
+        while current is not None and current < record:
+            current = next(it, None)
+        if current != record:
+            yield record
+
+
+class LayerWriter:
+    """1 層分のレコードを受け取り、ソート済みランとしてディスクへ書き出す"""
+
+    def __init__(self, workdir: str, width: int, prefix: str, run_size: int = DEFAULT_RUN_SIZE):
+        self.workdir = workdir
+        self.width = width
+        self.prefix = prefix
+        self.run_size = run_size
+        self._buffer: list[bytes] = []
+        self._runs: list[StateFile] = []
+
+    def add(self, record: bytes) -> None:
+        self._buffer.append(record)
+        if len(self._buffer) >= self.run_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        self._buffer.sort()
+        path = os.path.join(self.workdir, f"{self.prefix}.run{len(self._runs)}")
+        self._runs.append(_write_unique(path, self.width, self._buffer))
+        self._buffer = []
+
+    def finish(self, path: str) -> StateFile:
+        """全ランを k-way マージして重複排除済みの 1 ファイルにまとめる"""
+        self._flush()
+        merged = _write_unique(path, self.width, heapq.merge(*self._runs))
+        for run in self._runs:
+            os.remove(run.path)
+        self._runs = []
+        return merged
+
+
+class DiskFrontier:
+    """層別 BFS のフロンティアと訪問済み集合をディスク上で管理する。
+
+    layers[d] は深さ d で初めて到達した状態のソート済みファイル。
+    visited は全層の和集合で、各層の確定時にマージで更新する。
+    """
+
+    def __init__(self, width: int, workdir: str | None = None, run_size: int = DEFAULT_RUN_SIZE):
+        self.width = width
+        self.run_size = run_size
+        self.workdir = tempfile.mkdtemp(prefix="frontier_", dir=workdir)
+        self.layers: list[StateFile] = []
+        self.visited = StateFile(os.path.join(self.workdir, "visited.0"), width, 0)
+        self._generation = 0
+
+    def __enter__(self) -> DiskFrontier:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    @property
+    def total_states(self) -> int:
+        return len(self.visited)
+
+    def seed(self, records: Iterable[bytes]) -> StateFile:
+        """初期層（深さ 0）を設定する"""
+        writer = self.writer()
+        for record in records:
+            writer.add(record)
+        return self.commit(writer)
+
+    def writer(self) -> LayerWriter:
+        depth = len(self.layers)
+        return LayerWriter(self.workdir, self.width, f"layer{depth}", self.run_size)
+
+    def commit(self, writer: LayerWriter) -> StateFile:
+        """候補層から訪問済みを除いて新しい層を確定し、訪問済み集合を更新する"""
+        depth = len(self.layers)
+        candidates = writer.finish(os.path.join(self.workdir, f"cand{depth}"))
+        layer = _write_unique(
+            os.path.join(self.workdir, f"layer{depth}"),
+            self.width,
+            _difference(candidates, self.visited),
+        )
+        os.remove(candidates.path)
+
+        self._generation += 1
+        old_visited = self.visited
+        self.visited = _write_unique(
+            os.path.join(self.workdir, f"visited.{self._generation}"),
+            self.width,
+            heapq.merge(old_visited, layer),
+        )
+        if os.path.exists(old_visited.path):
+            os.remove(old_visited.path)
+
+        self.layers.append(layer)
+        return layer
+
+    def expand(self, successors: Callable[[bytes], Iterable[bytes]]) -> StateFile:
+        """最新層の全状態を展開し、次の層を確定する"""
+        writer = self.writer()
+        for record in self.layers[-1]:
+            for succ in successors(record):
+                writer.add(succ)
+        return self.commit(writer)
@@ -1,14 +1,21 @@
 """クリアに至る最小質問集合の列挙
 
 クリア条件から逆算し、必要な質問の最小集合を全て求める。
+質問集合の族は ZDD で記号的に表現し、数え上げは厳密に、列挙は必要時のみ行う。
+iter_clear_chains は極小質問集合を要素数の昇順に遅延列挙する。
 """
 
 from __future__ import annotations
 
 import json
 import sys
+import time
+from collections.abc import Iterator
 from pathlib import Path
 
+from common import option_value
+from zdd import BASE, EMPTY, ZDD
+
 
 def load_data(path: str) -> dict:
     with open(path, encoding="utf-8") as f:
@@ -42,30 +49,30 @@ def build_indices(data: dict) -> tuple:
 
 
 def find_question_sets_for_descriptor(
+    zdd: ZDD,
     descriptor_id: str,
     descriptor_to_questions: dict[str, list[dict]],
     derived_conditions: dict[str, list[list[str]]],
-    memo: dict[str, list[frozenset[str]]],
+    memo: dict[str, int],
     initial_confirmed: set[str],
-    rejection_conditions: dict[str, list[list[str]]] | None = None,
-) -> list[frozenset[str]]:
+    blockers: int = EMPTY,
+) -> int:
     """ある記述素を confirmed にするために必要な質問集合の候補を全て返す。
 
-    戻り値: frozenset[質問ID] のリスト（OR: いずれかの集合があれば十分）
+    戻り値: 質問ID集合の族を表す ZDD ノード（OR: いずれかの集合があれば十分）
     """
     if descriptor_id in memo:
         return memo[descriptor_id]
 
-    # 循環防止用にまず空を入れる
-    memo[descriptor_id] = []
+    # 循環防止用にまず空族を入れる
+    memo[descriptor_id] = EMPTY
 
     questions = descriptor_to_questions.get(descriptor_id, [])
     if not questions:
         # どの質問でも reveals されない（initial_confirmed なら不要、そうでなければ到達不能）
-        memo[descriptor_id] = []
-        return []
+        return EMPTY
 
-    results: list[frozenset[str]] = []
+    results = EMPTY
     for q in questions:
         # この質問を使う場合、質問自体 + recall_conditions を満たすための質問集合が必要
         qid = q["id"]
@@ -73,81 +80,83 @@ def find_question_sets_for_descriptor(
 
         # recall の各グループ（OR）について、必要な質問集合を求める
         recall_options = find_question_sets_for_recall(
-            recall_conds, descriptor_to_questions, derived_conditions, memo,
-            initial_confirmed, rejection_conditions,
+            zdd, recall_conds, descriptor_to_questions, derived_conditions, memo,
+            initial_confirmed, blockers,
         )
 
         # 各 recall オプションに自身の質問を追加
-        for option in recall_options:
-            results.append(option | frozenset([qid]))
+        results = zdd.union(results, zdd.join(recall_options, zdd.single(qid)))
 
-    results = minimize(list(set(results)))
+    results = zdd.minimal(zdd.nonsup(results, blockers))
     memo[descriptor_id] = results
     return results
 
 
 def find_question_sets_for_recall(
+    zdd: ZDD,
     recall_conditions: list[list[str]],
     descriptor_to_questions: dict[str, list[dict]],
     derived_conditions: dict[str, list[list[str]]],
-    memo: dict[str, list[frozenset[str]]],
+    memo: dict[str, int],
     initial_confirmed: set[str],
-    rejection_conditions: dict[str, list[list[str]]] | None = None,
-) -> list[frozenset[str]]:
+    blockers: int = EMPTY,
+) -> int:
     """recall_conditions（OR of AND）を満たすための質問集合候補を返す"""
     if not recall_conditions:
         # recall_conditions = [] → 条件なし（利用不可）
-        return []
+        return EMPTY
 
-    results: list[frozenset[str]] = []
+    results = EMPTY
     for cond_group in recall_conditions:
         if not cond_group:
             # 空グループ [[]] → 無条件で利用可能
-            results.append(frozenset())
+            results = zdd.union(results, BASE)
             continue
 
         # AND: グループ内の全記述素を形成する必要がある
         group_options = find_question_sets_for_derived_group(
-            cond_group, descriptor_to_questions, derived_conditions, memo,
-            initial_confirmed, rejection_conditions,
+            zdd, cond_group, descriptor_to_questions, derived_conditions, memo,
+            initial_confirmed, blockers,
         )
-        results.extend(group_options)
+        results = zdd.union(results, group_options)
 
     return results
 
 
 def find_question_sets_for_derived_group(
+    zdd: ZDD,
     descriptor_ids: list[str],
     descriptor_to_questions: dict[str, list[dict]],
     derived_conditions: dict[str, list[list[str]]],
-    memo: dict[str, list[frozenset[str]]],
+    memo: dict[str, int],
     initial_confirmed: set[str],
-    rejection_conditions: dict[str, list[list[str]]] | None = None,
-) -> list[frozenset[str]]:
+    blockers: int = EMPTY,
+) -> int:
     """記述素グループ（AND）を全て形成するための質問集合候補を返す"""
     # 各記述素について必要な質問集合を求め、直積を取る
-    per_descriptor_options: list[list[frozenset[str]]] = []
+    per_descriptor_options: list[int] = []
     for did in descriptor_ids:
         options = find_question_sets_for_derived(
-            did, descriptor_to_questions, derived_conditions, memo,
-            initial_confirmed, rejection_conditions,
+            zdd, did, descriptor_to_questions, derived_conditions, memo,
+            initial_confirmed, blockers,
         )
-        if not options:
-            return []  # 1つでも到達不能なら全体が不可能
+        if options == EMPTY:
+            return EMPTY  # 1つでも到達不能なら全体が不可能
         per_descriptor_options.append(options)
 
     # 直積: 各記述素から1つずつ選んで和集合を取る
-    return cartesian_union(per_descriptor_options)
+    return cartesian_union(zdd, per_descriptor_options, blockers)
 
 
 def find_question_sets_for_derived(
+    zdd: ZDD,
     descriptor_id: str,
     descriptor_to_questions: dict[str, list[dict]],
     derived_conditions: dict[str, list[list[str]]],
-    memo: dict[str, list[frozenset[str]]],
+    memo: dict[str, int],
     initial_confirmed: set[str],
-    rejection_conditions: dict[str, list[list[str]]] | None = None,
-) -> list[frozenset[str]]:
+    blockers: int = EMPTY,
+) -> int:
     """ある導出記述素を形成するための質問集合候補を返す。
 
     記述素は3つの方法で形成される:
@@ -157,160 +166,190 @@ def find_question_sets_for_derived(
     """
     # 初期確認済みの記述素は質問不要
     if descriptor_id in initial_confirmed:
-        return [frozenset()]
+        return BASE
 
     cache_key = f"derived:{descriptor_id}"
     if cache_key in memo:
         return memo[cache_key]
 
-    memo[cache_key] = []  # 循環防止
-
-    results: list[frozenset[str]] = []
+    memo[cache_key] = EMPTY  # 循環防止
 
     # 方法1: reveals match（記述素を reveals する質問経由）
-    descriptor_options = find_question_sets_for_descriptor(
-        descriptor_id, descriptor_to_questions, derived_conditions, memo,
-        initial_confirmed, rejection_conditions,
+    results = find_question_sets_for_descriptor(
+        zdd, descriptor_id, descriptor_to_questions, derived_conditions, memo,
+        initial_confirmed, blockers,
     )
-    results.extend(descriptor_options)
 
     # 方法2: formation_conditions 経由
     conditions = derived_conditions.get(descriptor_id, [])
     for cond_group in conditions:
         group_options = find_question_sets_for_derived_group(
-            cond_group, descriptor_to_questions, derived_conditions, memo,
-            initial_confirmed, rejection_conditions,
+            zdd, cond_group, descriptor_to_questions, derived_conditions, memo,
+            initial_confirmed, blockers,
         )
-        results.extend(group_options)
+        results = zdd.union(results, group_options)
 
-    results = minimize(list(set(results)))
+    results = zdd.minimal(zdd.nonsup(results, blockers))
     memo[cache_key] = results
     return results
 
 
-def cartesian_union(
-    options_list: list[list[frozenset[str]]],
-) -> list[frozenset[str]]:
-    """複数の選択肢リストの直積を取り、各組の和集合を返す。
-    各ステップで重複排除と極小化を行い、組み合わせ爆発を抑制する。"""
-    if not options_list:
-        return [frozenset()]
-
-    result = minimize(list(set(options_list[0])))
-    for next_options in options_list[1:]:
-        next_min = minimize(list(set(next_options)))
-        new_result: set[frozenset[str]] = set()
-        for existing in result:
-            for addition in next_min:
-                new_result.add(existing | addition)
-        result = minimize(list(new_result))
-
+def cartesian_union(zdd: ZDD, options_list: list[int], blockers: int = EMPTY) -> int:
+    """複数の選択肢族の直積を取り、各組の和集合からなる族を返す。
+    各ステップで棄却枝刈りと極小化を行い、ノード数の増大を抑制する。"""
+    result = BASE
+    for options in options_list:
+        result = zdd.minimal(zdd.nonsup(zdd.join(result, zdd.minimal(options)), blockers))
     return result
 
 
-def minimize(sets: list[frozenset[str]]) -> list[frozenset[str]]:
-    """包含関係で冗長な集合を除去し、極小集合のみ残す"""
-    # サイズ順にソート
-    sorted_sets = sorted(set(sets), key=len)
-    minimal: list[frozenset[str]] = []
-    for s in sorted_sets:
-        if not any(m <= s for m in minimal):
-            minimal.append(s)
-    return minimal
-
-
-def _would_reject(
-    descriptor_id: str,
-    question_set: frozenset[str],
-    questions_by_id: dict[str, dict],
+def build_blockers(
+    zdd: ZDD,
+    data: dict,
+    descriptor_to_questions: dict[str, list[dict]],
     initial_confirmed: set[str],
     rejection_conditions: dict[str, list[list[str]]],
-) -> bool:
-    """質問集合の reveals の和集合が descriptor_id の rejection_conditions を満たすか判定"""
-    if descriptor_id not in rejection_conditions:
-        return False
-    # 質問集合が confirms する記述素の和集合
-    all_confirmed = set(initial_confirmed)
-    for qid in question_set:
-        q = questions_by_id.get(qid)
-        if q:
-            all_confirmed.update(q.get("reveals", []))
-    # rejection_conditions の OR of AND 判定（confirmed のみ参照）
-    return any(
-        all(c in all_confirmed for c in group)
-        for group in rejection_conditions[descriptor_id]
-    )
+) -> int:
+    """クリアを不能にする質問集合の族（極小形）を返す。
 
-
-def run(path: str) -> list[frozenset[str]]:
-    data = load_data(path)
+    質問集合の reveals ∪ initial_confirmed が全クリア条件グループについて
+    いずれかの記述素の rejection_conditions を満たすとき、その集合はクリア不能。
+    棄却は質問集合について単調なので、この族のいずれかを含む集合も全てクリア不能。
+    探索中の部分集合をこの族で枝刈りする（nonsup）。
+    """
+    revealing: dict[str, int] = {}
+
+    def reveal_options(did: str) -> int:
+        # 記述素を confirmed にする質問の選択肢（initial なら質問不要）
+        if did in initial_confirmed:
+            return BASE
+        if did not in revealing:
+            f = EMPTY
+            for q in descriptor_to_questions.get(did, []):
+                f = zdd.union(f, zdd.single(q["id"]))
+            revealing[did] = f
+        return revealing[did]
+
+    blockers = BASE
+    for cg in data.get("clear_conditions", []):
+        # このグループのいずれかの記述素が棄却される質問集合
+        group_blockers = EMPTY
+        for did in cg:
+            for rej_group in rejection_conditions.get(did, []):
+                f = BASE
+                for c in rej_group:
+                    f = zdd.join(f, reveal_options(c))
+                group_blockers = zdd.union(group_blockers, f)
+        blockers = zdd.minimal(zdd.join(blockers, group_blockers))
+    return blockers
+
+
+def clear_family(data: dict, deadline: float | None = None) -> tuple[ZDD, int]:
+    """クリアに至る極小質問集合の族を ZDD として記号的に求める。
+
+    rejection_conditions によりクリア不能になる部分集合は構築中に枝刈りする。
+    time.monotonic() が deadline を超えると、直積・極小化の途中でも TimeoutError を送出する。
+
+    棄却は質問集合について単調なので、循環のない入力では最後にまとめて除外する方式と結果が一致する。
+    循環のある入力では一致しないことがある。循環防止の空族が memo に残ると、その記述素は
+    循環の途中で計算されたまま不完全になり、どの記述素がそうなるかは訪問順で決まる。枝刈りで
+    全選択肢が棄却された AND グループは残りの記述素を訪れずに打ち切るため、訪問順が変わる。
+    下の例では、事後除外の方式は d3 の計算中に q4 の想起条件 [d1, d4] を調べて d4 を空族に固定し、
+    唯一のクリア経路 {q3, q2} を落とす（q3 で d3、d3 を想起条件に q2 で d4）。枝刈りありでは
+    d1 の選択肢 {q1} が d4 を棄却するため、このグループは d4 を訪れずに打ち切られる。
+
+    >>> data = {
+    ...     "descriptors": [{"id": "d4", "rejection_conditions": [["d1"]]}],
+    ...     "questions": [
+    ...         {"id": "q1", "reveals": ["d1"], "recall_conditions": [[]]},
+    ...         {"id": "q2", "reveals": ["d4"], "recall_conditions": [["d3"]]},
+    ...         {"id": "q3", "reveals": ["d3"], "recall_conditions": [[]]},
+    ...         {"id": "q4", "reveals": ["d3"], "recall_conditions": [["d1", "d4"]]},
+    ...     ],
+    ...     "clear_conditions": [["d3", "d4"]],
+    ... }
+    >>> zdd, family = clear_family(data)
+    >>> [sorted(qset) for qset in zdd.iter_by_size(family)]
+    [['q2', 'q3']]
+    """
     descriptor_to_questions, derived_conditions, initial_confirmed, rejection_conditions = build_indices(data)
-    clear_conditions = data.get("clear_conditions", [])
-
-    if not clear_conditions:
-        print("clear_conditions が未定義")
-        return []
+    zdd = ZDD((q["id"] for q in data.get("questions", [])), deadline)
+    blockers = EMPTY
+    if rejection_conditions:
+        blockers = build_blockers(zdd, data, descriptor_to_questions, initial_confirmed, rejection_conditions)
 
-    memo: dict[str, list[frozenset[str]]] = {}
-    all_options: list[frozenset[str]] = []
+    memo: dict[str, int] = {}
+    all_options = EMPTY
 
     # 各クリア条件グループ（OR）
-    for cond_group in clear_conditions:
+    for cond_group in data.get("clear_conditions", []):
         # AND: グループ内の全記述素を confirmed にする
-        per_descriptor_options: list[list[frozenset[str]]] = []
+        per_descriptor_options: list[int] = []
         for descriptor_id in cond_group:
             options = find_question_sets_for_derived(
-                descriptor_id, descriptor_to_questions, derived_conditions, memo,
-                initial_confirmed, rejection_conditions or None,
+                zdd, descriptor_id, descriptor_to_questions, derived_conditions, memo,
+                initial_confirmed, blockers,
             )
-            if not options:
+            if options == EMPTY:
                 break  # この記述素が到達不能ならこのグループは不可能
             per_descriptor_options.append(options)
         else:
             # 全記述素について選択肢がある場合、直積を取る
-            group_options = cartesian_union(per_descriptor_options)
-            all_options.extend(group_options)
+            all_options = zdd.union(all_options, cartesian_union(zdd, per_descriptor_options, blockers))
 
-    # 棄却ポストフィルタ: 質問集合の reveals が rejection_conditions を満たし、
-    # formation_conditions 経由で導出される記述素を棄却してしまう場合は除外
-    if rejection_conditions:
-        questions_by_id = {q["id"]: q for q in data.get("questions", [])}
-        filtered: list[frozenset[str]] = []
-        for qset in all_options:
-            # この質問集合で棄却される記述素を計算
-            all_confirmed = set(initial_confirmed)
-            for qid in qset:
-                q = questions_by_id.get(qid)
-                if q:
-                    all_confirmed.update(q.get("reveals", []))
-            rejected_ids = set()
-            for did, conds in rejection_conditions.items():
-                if any(all(c in all_confirmed for c in group) for group in conds):
-                    rejected_ids.add(did)
-            # クリア条件の記述素が棄却されないか確認
-            clear_blocked = False
-            for cg in clear_conditions:
-                if any(did in rejected_ids for did in cg):
-                    # このクリア条件グループ内の記述素が棄却される
-                    continue
-                # 棄却されないグループがあれば OK
-                break
-            else:
-                # 全クリア条件グループが棄却の影響を受ける場合は除外
-                if rejected_ids:
-                    clear_blocked = True
-            if not clear_blocked:
-                filtered.append(qset)
-        all_options = filtered
-
-    # 極小化
-    minimal = minimize(all_options)
-    return minimal
+    return zdd, zdd.minimal(all_options)
+
+
+def iter_clear_chains(
+    data: dict,
+    limit: int | None = None,
+    timeout: float | None = None,
+) -> Iterator[frozenset[str]]:
+    """クリアに至る極小質問集合を要素数の昇順に遅延列挙する。
+
+    limit 件を返すか、timeout 秒を超えた時点で打ち切る。
+    timeout は ZDD の構築時間も含み、構築中に超えた場合は 1 件も返さない。
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        zdd, family = clear_family(data, deadline)
+    except TimeoutError:
+        return
+    yield from iter_family(zdd, family, limit, deadline)
+
+
+def iter_family(
+    zdd: ZDD,
+    family: int,
+    limit: int | None = None,
+    deadline: float | None = None,
+) -> Iterator[frozenset[str]]:
+    """構築済みの族（clear_family の結果）を要素数の昇順に列挙する。
+
+    limit 件を返すか、time.monotonic() が deadline を超えた時点で打ち切る。
+    """
+    for i, qset in enumerate(zdd.iter_by_size(family), 1):
+        if deadline is not None and time.monotonic() > deadline:
+            return
+        yield qset
+        if limit is not None and i >= limit:
+            return
+
+
+def run(path: str) -> list[frozenset[str]]:
+    data = load_data(path)
+    if not data.get("clear_conditions", []):
+        print("clear_conditions が未定義")
+        return []
+    return list(iter_clear_chains(data))
 
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python find_clear_chains.py <data.json>", file=sys.stderr)
+        print(
+            "Usage: python find_clear_chains.py <data.json> [--limit N] [--timeout SEC]",
+            file=sys.stderr,
+        )
         sys.exit(2)
 
     path = sys.argv[1]
@@ -318,23 +357,35 @@ def main():
         print(f"Error: {path} が見つかりません", file=sys.stderr)
         sys.exit(2)
 
-    minimal = run(path)
-
-    print(f"[find_clear_chains] クリアに至る最小質問集合: {len(minimal)} 通り\n")
-    # サイズ順 → 辞書順
-    for i, qset in enumerate(sorted(minimal, key=lambda s: (len(s), sorted(s))), 1):
-        ids = sorted(qset)
-        print(f"  #{i} ({len(ids)}問): {ids}")
-
-    # 質問ラベルも表示
     data = load_data(path)
+    if not data.get("clear_conditions", []):
+        print("clear_conditions が未定義")
+        return
+
+    limit = option_value("--limit")
+    timeout = option_value("--timeout")
     q_labels = {q["id"]: q["text"] for q in data.get("questions", [])}
-    print()
-    for i, qset in enumerate(sorted(minimal, key=lambda s: (len(s), sorted(s))), 1):
-        print(f"  --- #{i} ---")
-        for qid in sorted(qset):
+
+    # 族は 1 回だけ構築し、数え上げと列挙で共有する。--timeout は構築の前から数え、構築中にも打ち切る
+    deadline = time.monotonic() + float(timeout) if timeout else None
+    try:
+        zdd, family = clear_family(data, deadline)
+    except TimeoutError:
+        print(f"[find_clear_chains] --timeout {timeout} 秒以内に族を構築できず打ち切り")
+        return
+    total = zdd.count(family)
+    print(f"[find_clear_chains] クリアに至る最小質問集合: {total} 通り\n")
+    shown = 0
+    chains = iter_family(zdd, family, limit=int(limit) if limit else None, deadline=deadline)
+    for shown, qset in enumerate(chains, 1):
+        ids = sorted(qset)
+        print(f"  #{shown} ({len(ids)}問): {ids}", flush=True)
+        for qid in ids:
             print(f"    {qid}: {q_labels.get(qid, '?')}")
 
+    if shown < total:
+        print(f"\n  （{total} 通り中 {shown} 通りを表示して打ち切り）")
+
 
 if __name__ == "__main__":
     main()
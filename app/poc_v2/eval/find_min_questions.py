@@ -5,6 +5,11 @@
 
 クリア判定は confirmed（観測）のみで行う。
 仮説（formation_conditions 由来の derived）ではクリアできない。
+
+--disk を指定すると、フロンティア層と訪問済み集合をメモリマップファイルへ退避する
+層別 BFS で探索する（大規模パズル向け。メモリ使用量は --run-size で上限が決まる）。
+ディスク退避はこの v2 ソルバーのみ（v3 の網羅探索には未対応。disk_frontier を参照）。
+--stats を指定すると導出閉包キャッシュの hit 率を出力する。
 """
 
 import json
@@ -12,6 +17,10 @@ import sys
 from collections import deque
 from pathlib import Path
 
+from closure import format_stats, get_closure
+from common import option_value
+from disk_frontier import DEFAULT_RUN_SIZE, BitsetCodec, DiskFrontier
+
 MAX_SOLUTIONS = 200
 
 
@@ -20,23 +29,6 @@ def load_data(path: str) -> dict:
         return json.load(f)
 
 
-def derive(confirmed: frozenset, formation_map: dict) -> frozenset:
-    """confirmed から導出可能な仮説を全て求め、confirmed ∪ derived を返す"""
-    known = set(confirmed)
-    changed = True
-    while changed:
-        changed = False
-        for did, conditions in formation_map.items():
-            if did in known:
-                continue
-            for cond_group in conditions:
-                if all(ref in known for ref in cond_group):
-                    known.add(did)
-                    changed = True
-                    break
-    return frozenset(known)
-
-
 def check_clear(confirmed: frozenset, clear_conditions: list) -> bool:
     """クリア判定: confirmed（観測）のみで判定"""
     for cond_group in clear_conditions:
@@ -65,6 +57,8 @@ def find_minimum_questions(data: dict):
     if check_clear(initial, clear_conds):
         return 0, [[]]
 
+    closure = get_closure(formation_map)
+
     # BFS: state = confirmed frozenset（観測のみ）
     queue: deque = deque()
     queue.append((initial, []))
@@ -81,7 +75,7 @@ def find_minimum_questions(data: dict):
             continue
 
         # 想起条件の判定には known（confirmed + derived）を使う
-        known = derive(confirmed, formation_map)
+        known = closure.closure(confirmed)
         asked_ids = frozenset(path)
 
         for q in questions:
@@ -117,9 +111,131 @@ def find_minimum_questions(data: dict):
     return min_depth, solutions
 
 
+def _compile_bitsets(data: dict, codec: BitsetCodec) -> tuple:
+    """formation / recall / reveals / clear を codec 上のビットマスクに変換する"""
+    formation_bits = [
+        (1 << codec.index[d["id"]], [codec.encode(g) for g in d["formation_conditions"]])
+        for d in data["descriptors"]
+        if "formation_conditions" in d
+    ]
+    question_bits = [
+        (q["id"], [codec.encode(cg) for cg in q["recall_conditions"]], codec.encode(q["reveals"]))
+        for q in data["questions"]
+    ]
+    clear_bits = [codec.encode(cg) for cg in data["clear_conditions"]]
+    return formation_bits, question_bits, clear_bits
+
+
+def _puzzle_codec(data: dict) -> BitsetCodec:
+    ids = [d["id"] for d in data["descriptors"]]
+    ids.extend(data["initial_confirmed"])
+    for q in data["questions"]:
+        ids.extend(q["reveals"])
+        for cg in q["recall_conditions"]:
+            ids.extend(cg)
+    for d in data["descriptors"]:
+        for cg in d.get("formation_conditions", []):
+            ids.extend(cg)
+    for cg in data["clear_conditions"]:
+        ids.extend(cg)
+    return BitsetCodec(ids)
+
+
+def find_minimum_questions_disk(
+    data: dict,
+    workdir: str | None = None,
+    run_size: int = DEFAULT_RUN_SIZE,
+):
+    """find_minimum_questions のディスク退避版。
+
+    状態（confirmed）を固定長ビットセットで表し、各層をソート済みランとして
+    ディスクに書き出す。最小深さの層で見つかったクリア遷移から、
+    保存済みの層を逆向きに走査して質問順序を復元する。
+    戻り値は find_minimum_questions と同じ (min_depth, solutions)。
+    前駆状態は層のソート順で選ぶため、例示される質問順序は通常モードと異なる場合がある。
+    """
+    codec = _puzzle_codec(data)
+    formation_bits, question_bits, clear_bits = _compile_bitsets(data, codec)
+    initial = codec.encode(data["initial_confirmed"])
+
+    def is_clear(bits: int) -> bool:
+        return any(bits & cg == cg for cg in clear_bits)
+
+    def derive_bits(bits: int) -> int:
+        known = bits
+        changed = True
+        while changed:
+            changed = False
+            for bit, groups in formation_bits:
+                if known & bit:
+                    continue
+                if any(known & g == g for g in groups):
+                    known |= bit
+                    changed = True
+        return known
+
+    def successors(bits: int):
+        # reveals が全て confirmed 済みの質問は状態を変えないので展開しない
+        known = derive_bits(bits)
+        for qid, recall, reveal in question_bits:
+            if bits & reveal == reveal:
+                continue
+            if not any(known & g == g for g in recall):
+                continue
+            yield qid, bits | reveal
+
+    if is_clear(initial):
+        return 0, [[]]
+
+    with DiskFrontier(codec.width, workdir=workdir, run_size=run_size) as frontier:
+        frontier.seed([codec.to_bytes(initial)])
+        hits: list[tuple[int, str]] = []
+
+        def expand(record: bytes):
+            for qid, new_bits in successors(codec.from_bytes(record)):
+                if is_clear(new_bits):
+                    if len(hits) < MAX_SOLUTIONS:
+                        hits.append((codec.from_bytes(record), qid))
+                    continue
+                yield codec.to_bytes(new_bits)
+
+        while not hits:
+            layer = frontier.expand(expand)
+            if not hits and len(layer) == 0:
+                return float("inf"), []
+
+        min_depth = len(frontier.layers) - 1
+        print(f"[disk] 探索状態数: {frontier.total_states} (層数: {len(frontier.layers)})", file=sys.stderr)
+
+        # 逆向き走査: 各層を 1 回ずつ読み、目標状態ごとに最初に見つかった前駆状態を採用
+        parent: dict[int, tuple[int, str]] = {}
+        targets = {bits for bits, _ in hits}
+        for depth in range(min_depth - 2, -1, -1):
+            next_targets = set()
+            for record in frontier.layers[depth]:
+                bits = codec.from_bytes(record)
+                for qid, new_bits in successors(bits):
+                    if new_bits in targets and new_bits not in parent:
+                        parent[new_bits] = (bits, qid)
+                        next_targets.add(bits)
+            targets = next_targets
+
+    solutions: list[list[str]] = []
+    for bits, last_qid in hits:
+        path = [last_qid]
+        while bits != initial:
+            bits, qid = parent[bits]
+            path.append(qid)
+        solutions.append(path[::-1])
+    return min_depth, solutions
+
+
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python find_min_questions.py <data.json>", file=sys.stderr)
+        print(
+            "Usage: python find_min_questions.py <data.json> [--disk [--workdir DIR] [--run-size N]] [--stats]",
+            file=sys.stderr,
+        )
         sys.exit(2)
 
     path = sys.argv[1]
@@ -128,7 +244,15 @@ def main():
         sys.exit(2)
 
     data = load_data(path)
-    min_depth, solutions = find_minimum_questions(data)
+    if "--disk" in sys.argv:
+        run_size = option_value("--run-size")
+        min_depth, solutions = find_minimum_questions_disk(
+            data,
+            workdir=option_value("--workdir"),
+            run_size=int(run_size) if run_size else DEFAULT_RUN_SIZE,
+        )
+    else:
+        min_depth, solutions = find_minimum_questions(data)
 
     if not solutions:
         print("クリア不能: 質問の組み合わせでクリア条件に到達できません")
@@ -151,6 +275,7 @@ def main():
         if "formation_conditions" in d:
             formation_map[d["id"]] = d["formation_conditions"]
 
+    closure = get_closure(formation_map)
     q_map = {q["id"]: q for q in data["questions"]}
     d_map = {d["id"]: d["label"] for d in data["descriptors"]}
 
@@ -165,7 +290,7 @@ def main():
             confirmed_before = confirmed
             new_reveals = frozenset(q["reveals"])
             confirmed = confirmed | new_reveals
-            known = derive(confirmed, formation_map)
+            known = closure.closure(confirmed, base=confirmed_before)
             derived_new = sorted(known - confirmed)
 
             print(f"  {step}. {qid} 「{q['text']}」 → {q['answer']}")
@@ -179,6 +304,9 @@ def main():
         print(f"\n  クリア: {'✓' if clear_met else '✗'}")
         print()
 
+    if "--stats" in sys.argv:
+        print(format_stats())
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,255 @@
+"""ゼロサプレス型二分決定図（ZDD）による集合族の演算
+
+質問集合の族（OR of 集合）を共有ノードの DAG として表現し、
+和・結合（直積和）・極小化・要素数を族を展開せずに計算する。
+
+ノードは整数 ID で表す。0 = 空族 ∅、1 = {∅}（空集合のみを含む族）。
+変数は登録順に順序付けされ、根に近いほど順序が小さい。
+"""
+
+from __future__ import annotations
+
+import heapq
+import time
+from collections.abc import Iterable, Iterator
+
+EMPTY = 0  # 空族 ∅
+BASE = 1  # {∅}
+
+_TERMINAL_VAR = 1 << 30  # 終端ノードの変数順序（どの変数よりも大きい）
+_DEADLINE_STRIDE = 0xFFF  # deadline はノードを 4096 個確保するごとに確かめる
+
+
+class ZDD:
+    """ZDD ノードの一意表と演算キャッシュを保持するマネージャ
+
+    deadline（time.monotonic() の値）を渡すと、それを過ぎた後のノード確保で TimeoutError を送出する。
+    1 回の演算の途中でも打ち切れるので、族の膨張を時間で抑えられる。
+    """
+
+    def __init__(self, variables: Iterable[str] = (), deadline: float | None = None):
+        self.deadline = deadline
+        self.variables: list[str] = []
+        self.var_index: dict[str, int] = {}
+        # ノード表: _var[n], _lo[n]（変数を含まない側）, _hi[n]（変数を含む側）
+        self._var: list[int] = [_TERMINAL_VAR, _TERMINAL_VAR]
+        self._lo: list[int] = [EMPTY, BASE]
+        self._hi: list[int] = [EMPTY, BASE]
+        self._unique: dict[tuple[int, int, int], int] = {}
+        self._cache: dict[tuple, int] = {}
+        self._count_cache: dict[int, int] = {EMPTY: 0, BASE: 1}
+        self._min_size_cache: dict[int, int] = {BASE: 0}
+        for name in variables:
+            self.var(name)
+
+    def __len__(self) -> int:
+        """確保済みノード数（終端を含む）"""
+        return len(self._var)
+
+    def var(self, name: str) -> int:
+        """変数名の順序を返す（未登録なら末尾に登録）"""
+        idx = self.var_index.get(name)
+        if idx is None:
+            idx = len(self.variables)
+            self.variables.append(name)
+            self.var_index[name] = idx
+        return idx
+
+    def node(self, v: int, lo: int, hi: int) -> int:
+        """一意表を引いてノードを返す。hi が空族ならゼロサプレスで lo を返す"""
+        if hi == EMPTY:
+            return lo
+        key = (v, lo, hi)
+        n = self._unique.get(key)
+        if n is None:
+            n = len(self._var)
+            if not n & _DEADLINE_STRIDE and self.deadline is not None and time.monotonic() > self.deadline:
+                raise TimeoutError(f"ZDD の構築が制限時間を超えました（{n} ノード）")
+            self._var.append(v)
+            self._lo.append(lo)
+            self._hi.append(hi)
+            self._unique[key] = n
+        return n
+
+    # --- 構築 ---
+
+    def single(self, name: str) -> int:
+        """{{name}}"""
+        return self.node(self.var(name), EMPTY, BASE)
+
+    def from_set(self, members: Iterable[str]) -> int:
+        """{members}（1 つの集合からなる族）"""
+        f = BASE
+        for v in sorted({self.var(m) for m in members}, reverse=True):
+            f = self.node(v, EMPTY, f)
+        return f
+
+    def from_sets(self, sets: Iterable[Iterable[str]]) -> int:
+        f = EMPTY
+        for s in sets:
+            f = self.union(f, self.from_set(s))
+        return f
+
+    # --- 二項演算 ---
+
+    def union(self, f: int, g: int) -> int:
+        """F ∪ G"""
+        if f == EMPTY or f == g:
+            return g
+        if g == EMPTY:
+            return f
+        if f > g:
+            f, g = g, f
+        key = ("u", f, g)
+        r = self._cache.get(key)
+        if r is not None:
+            return r
+        vf, vg = self._var[f], self._var[g]
+        if vf < vg:
+            r = self.node(vf, self.union(self._lo[f], g), self._hi[f])
+        elif vg < vf:
+            r = self.node(vg, self.union(f, self._lo[g]), self._hi[g])
+        else:
+            r = self.node(
+                vf,
+                self.union(self._lo[f], self._lo[g]),
+                self.union(self._hi[f], self._hi[g]),
+            )
+        self._cache[key] = r
+        return r
+
+    def join(self, f: int, g: int) -> int:
+        """F ⊔ G = {a ∪ b | a ∈ F, b ∈ G}（直積和）"""
+        if f == EMPTY or g == EMPTY:
+            return EMPTY
+        if f == BASE:
+            return g
+        if g == BASE:
+            return f
+        if f > g:
+            f, g = g, f
+        key = ("j", f, g)
+        r = self._cache.get(key)
+        if r is not None:
+            return r
+        vf, vg = self._var[f], self._var[g]
+        if vf < vg:
+            r = self.node(vf, self.join(self._lo[f], g), self.join(self._hi[f], g))
+        elif vg < vf:
+            r = self.node(vg, self.join(f, self._lo[g]), self.join(f, self._hi[g]))
+        else:
+            f0, f1, g0, g1 = self._lo[f], self._hi[f], self._lo[g], self._hi[g]
+            hi = self.union(
+                self.join(f1, g1),
+                self.union(self.join(f1, g0), self.join(f0, g1)),
+            )
+            r = self.node(vf, self.join(f0, g0), hi)
+        self._cache[key] = r
+        return r
+
+    def nonsup(self, f: int, g: int) -> int:
+        """F のうち G のいずれかの集合を部分集合として含むものを除いた族"""
+        if g == EMPTY or f == EMPTY:
+            return f
+        if f == g or self.contains_empty(g):
+            return EMPTY
+        if f == BASE:
+            return BASE  # G は ∅ を含まないので ∅ は残る
+        key = ("n", f, g)
+        r = self._cache.get(key)
+        if r is not None:
+            return r
+        vf, vg = self._var[f], self._var[g]
+        if vg < vf:
+            # G の vg を含む集合は F のどの集合の部分集合にもならない
+            r = self.nonsup(f, self._lo[g])
+        elif vf < vg:
+            r = self.node(vf, self.nonsup(self._lo[f], g), self.nonsup(self._hi[f], g))
+        else:
+            g0 = self._lo[g]
+            r = self.node(
+                vf,
+                self.nonsup(self._lo[f], g0),
+                self.nonsup(self.nonsup(self._hi[f], g0), self._hi[g]),
+            )
+        self._cache[key] = r
+        return r
+
+    def minimal(self, f: int) -> int:
+        """包含関係で極小な集合のみを残した族"""
+        if f <= BASE:
+            return f
+        key = ("m", f)
+        r = self._cache.get(key)
+        if r is not None:
+            return r
+        lo = self.minimal(self._lo[f])
+        hi = self.nonsup(self.minimal(self._hi[f]), lo)
+        r = self.node(self._var[f], lo, hi)
+        self._cache[key] = r
+        return r
+
+    # --- 問い合わせ ---
+
+    def contains_empty(self, f: int) -> bool:
+        """∅ ∈ F か（lo 側を終端までたどる）"""
+        while f > BASE:
+            f = self._lo[f]
+        return f == BASE
+
+    def count(self, f: int) -> int:
+        """族に含まれる集合の数（厳密値）"""
+        r = self._count_cache.get(f)
+        if r is None:
+            r = self.count(self._lo[f]) + self.count(self._hi[f])
+            self._count_cache[f] = r
+        return r
+
+    def min_size(self, f: int) -> int | None:
+        """族に含まれる集合の最小要素数（空族なら None）"""
+        if f == EMPTY:
+            return None
+        r = self._min_size_cache.get(f)
+        if r is None:
+            lo = self.min_size(self._lo[f])
+            hi = self.min_size(self._hi[f])
+            candidates = [x for x in (lo, None if hi is None else hi + 1) if x is not None]
+            r = min(candidates)
+            self._min_size_cache[f] = r
+        return r
+
+    def iter_sets(self, f: int) -> Iterator[frozenset[str]]:
+        """族の集合を列挙する（深さ優先、必要な分だけ展開）"""
+        stack: list[tuple[int, tuple[str, ...]]] = [(f, ())]
+        while stack:
+            n, chosen = stack.pop()
+            if n == EMPTY:
+                continue
+            if n == BASE:
+                yield frozenset(chosen)
+                continue
+            stack.append((self._hi[n], chosen + (self.variables[self._var[n]],)))
+            stack.append((self._lo[n], chosen))
+
+    def iter_by_size(self, f: int) -> Iterator[frozenset[str]]:
+        """族の集合を要素数の昇順に遅延列挙する。
+
+        部分パスの要素数 + 残りノードの min_size を下界とする最良優先探索。
+        下界は厳密なので、終端に到達した順に取り出せば要素数は単調非減少になる。
+        """
+        if f == EMPTY:
+            return
+        seq = 0
+        heap: list[tuple[int, int, int, tuple[str, ...]]] = [(self.min_size(f), seq, f, ())]
+        while heap:
+            _, _, n, chosen = heapq.heappop(heap)
+            if n == BASE:
+                yield frozenset(chosen)
+                continue
+            lo, hi = self._lo[n], self._hi[n]
+            if lo != EMPTY:
+                seq += 1
+                heapq.heappush(heap, (len(chosen) + self.min_size(lo), seq, lo, chosen))
+            seq += 1
+            hi_chosen = chosen + (self.variables[self._var[n]],)
+            heapq.heappush(heap, (len(hi_chosen) + self.min_size(hi), seq, hi, hi_chosen))
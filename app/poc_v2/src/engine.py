@@ -3,9 +3,11 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 
+from hints import HintTable, puzzle_fingerprint
+from instrumentation import StageStats, TurnStats, active_recorder, clock
 from models import (
     Descriptor,
     GameState,
@@ -27,6 +29,7 @@ class PuzzleData:
     clear_conditions: list[list[str]]  # OR of AND: クリア条件（記述素IDの族）
     pieces: dict[str, Piece]
     questions: dict[str, Question]
+    hints: HintTable | None = field(default=None, repr=False, compare=False)  # load_hints で設定
 
 
 def load_puzzle(path: str | Path) -> PuzzleData:
@@ -87,32 +90,42 @@ def init_game(puzzle: PuzzleData) -> GameState:
     return state
 
 
-def evaluate_derivations(state: GameState, puzzle: PuzzleData) -> tuple[list[str], list[str]]:
+def evaluate_derivations(
+    state: GameState, puzzle: PuzzleData, stats: StageStats | None = None
+) -> tuple[list[str], list[str]]:
     """confirmed 集合から導出可能な記述素を不動点計算で求め、state.derived を更新する。
 
     state.confirmed は変更しない。導出結果は state.derived に格納される。
     戻り値: (newly_derived, newly_rejected)
     - newly_derived: 新たに導出された記述素のリスト
     - newly_rejected: 今回棄却された（derived から除去された）記述素のリスト
+    stats: 計測値の加算先（不動点計算の走査回数、判定した条件セットの数、known に加わった記述素の数）
     """
+    start = clock() if stats is not None else 0.0
+    evaluated = 0
+
     # Step 1: 棄却集合の計算（confirmed のみ参照、O(n)）
     rejected = set()
     for d in puzzle.descriptors.values():
         if d.rejection_conditions is not None:
+            evaluated += len(d.rejection_conditions)
             if any(all(c in state.confirmed for c in group) for group in d.rejection_conditions):
                 rejected.add(d.id)
 
-    # Step 2: 不動点計算（rejected をスキップ）
+    # Step 2: 不動点計算（rejected をスキップ）。走査回数と判定数はローカルに数え、最後にまとめて stats へ加える
     known = set(state.confirmed)
     changed = True
+    iterations = 0
     while changed:
         changed = False
+        iterations += 1
         for d in puzzle.descriptors.values():
             if d.formation_conditions is None:
                 continue
             if d.id in known or d.id in rejected:
                 continue
             for condition_set in d.formation_conditions:
+                evaluated += 1
                 if all(c in known for c in condition_set):
                     known.add(d.id)
                     changed = True
@@ -122,6 +135,11 @@ def evaluate_derivations(state: GameState, puzzle: PuzzleData) -> tuple[list[str
     newly_derived = sorted(new_derived_set - state.derived)
     newly_rejected = sorted((state.derived - new_derived_set) - state.confirmed)
     state.derived = new_derived_set
+    if stats is not None:
+        stats.iterations += iterations
+        stats.clauses_evaluated += evaluated
+        stats.atoms_propagated += len(known) - len(state.confirmed)
+        stats.wall_time += clock() - start
     return newly_derived, newly_rejected
 
 
@@ -134,20 +152,37 @@ def _check_conditions(conditions: list[list[str]], state: GameState) -> bool:
     )
 
 
-def available_questions(state: GameState, puzzle: PuzzleData) -> list[Question]:
+def available_questions(
+    state: GameState, puzzle: PuzzleData, stats: StageStats | None = None
+) -> list[Question]:
     """利用可能な質問を返す: 前提条件・想起条件が満たされ、未回答のもの
 
     - 前提条件（prerequisites）: confirmed のみで判定。対話上で確立された事実。
     - 想起条件（recall_conditions）: known（confirmed ∪ derived）で判定。仮説の導出。
+    stats: 計測値の加算先（想起条件を判定した質問の数、利用可能な質問の数）。
+    None で計測が有効なら問い合わせ 1 回分を Recorder に記録する。
     """
+    recorder = active_recorder()
+    if stats is None and recorder is not None:
+        stats = StageStats("available_questions")
+        recorder.record_query(stats)
+    start = clock() if stats is not None else 0.0
+    evaluated = 0
+
     result = []
     for q in puzzle.questions.values():
         if q.id in state.answered:
             continue
         if q.prerequisites and not all(p in state.confirmed for p in q.prerequisites):
             continue
+        evaluated += 1
         if _check_conditions(q.recall_conditions, state):
             result.append(q)
+    if stats is not None:
+        stats.iterations += 1
+        stats.clauses_evaluated += evaluated
+        stats.atoms_propagated += len(result)
+        stats.wall_time += clock() - start
     return result
 
 
@@ -162,6 +197,7 @@ class AnswerResult:
     mechanism: str
     is_link: bool
     is_anomaly: bool
+    stats: TurnStats | None = None  # 計測が有効なときの段階ごとの計測値（instrumentation.enable）
 
 
 def answer_question(
@@ -170,6 +206,9 @@ def answer_question(
     """質問に回答し、状態を更新する"""
     new_confirmed: list[str] = []
     new_pieces: list[str] = []
+    recorder = active_recorder()
+    turn = TurnStats(question.id) if recorder is not None else None
+    turn_start = clock() if turn is not None else 0.0
 
     # reveals の記述素を confirmed に追加
     for descriptor_id in question.reveals:
@@ -178,9 +217,12 @@ def answer_question(
             new_confirmed.append(descriptor_id)
 
     # 導出の再評価
-    new_derived, new_rejected = evaluate_derivations(state, puzzle)
+    stats = turn.stage("derivation") if turn is not None else None
+    new_derived, new_rejected = evaluate_derivations(state, puzzle, stats=stats)
 
     # ピースの構成記述素がすべて揃ったかチェック（confirmed ∪ derived で判定）
+    stats = turn.stage("pieces") if turn is not None else None
+    start = clock() if stats is not None else 0.0
     known = state.known
     for piece in puzzle.pieces.values():
         if piece.id in state.discovered_pieces:
@@ -191,12 +233,17 @@ def answer_question(
             continue
         state.discovered_pieces.add(piece.id)
         new_pieces.append(piece.id)
+    if stats is not None:
+        stats.iterations += 1
+        stats.clauses_evaluated += len(puzzle.pieces)
+        stats.atoms_propagated += len(new_pieces)
+        stats.wall_time += clock() - start
 
     # 履歴に記録
     state.answered.add(question.id)
     state.history.append(question.id)
 
-    return AnswerResult(
+    result = AnswerResult(
         new_confirmed=new_confirmed,
         new_derived=new_derived,
         new_rejected=new_rejected,
@@ -205,6 +252,11 @@ def answer_question(
         is_link=question.mechanism == "link",
         is_anomaly=question.mechanism == "anomaly",
     )
+    if turn is not None:
+        turn.wall_time = clock() - turn_start
+        result.stats = turn
+        recorder.record_turn(turn)
+    return result
 
 
 def check_complete(state: GameState, puzzle: PuzzleData) -> bool:
@@ -213,3 +265,39 @@ def check_complete(state: GameState, puzzle: PuzzleData) -> bool:
         all(descriptor_id in state.confirmed for descriptor_id in condition_set)
         for condition_set in puzzle.clear_conditions
     )
+
+
+def load_hints(puzzle: PuzzleData, path: str | Path) -> None:
+    """ヒント表（eval/build_hints.py の出力）を読み込んで puzzle に結び付ける。
+
+    表を作ったときとパズル定義が異なる場合は ValueError。
+    """
+    table = HintTable(path)
+    if table.fingerprint != puzzle_fingerprint(puzzle):
+        table.close()
+        raise ValueError(f"{path}: ヒント表がパズル定義と一致しません（build_hints.py で作り直してください）")
+    puzzle.hints = table
+
+
+@dataclass
+class Hint:
+    """ヒント表から引いた現在の状態の評価"""
+
+    remaining: int | None  # クリアまでの最小残り質問数（クリア不能なら None）
+    questions: list[Question]  # 最短でクリアに向かう次の質問（定義順）
+
+
+def hint(state: GameState, puzzle: PuzzleData) -> Hint | None:
+    """現在の状態のヒントを返す。
+
+    ヒント表を 1 回引くだけなので O(1)。
+    ヒント表が未読み込み、または表にない状態なら None。
+    """
+    if puzzle.hints is None:
+        return None
+    key = puzzle.hints.encode(state.confirmed)
+    found = None if key is None else puzzle.hints.lookup(key)
+    if found is None:
+        return None
+    remaining, question_ids = found
+    return Hint(remaining=remaining, questions=[puzzle.questions[qid] for qid in question_ids])
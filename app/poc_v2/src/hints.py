@@ -0,0 +1,184 @@
+"""v2 POC: パズルエンジン - ヒント表
+
+到達可能状態ごとの「クリアまでの最小残り質問数」と「最短でクリアに向かう次の質問の集合」を
+オフラインの後退解析（eval/build_hints.py）で求めてファイルに保存し、ゲーム中はそれを引く。
+
+表のキーは confirmed のビットセット（番号付けはメタ情報の ids）。状態を変える質問
+（reveals に未確認の記述素を含むもの）は必ず未回答なので、残り手数と最適な次の質問は
+confirmed だけで決まる。棄却条件があると導出が confirmed に対して単調でないため、
+v3 のような関係する記述素への射影は行わない。
+
+ファイル形式（リトルエンディアン）:
+- ヘッダ: マジック "HINT"、バージョン、メタ情報 JSON のバイト長
+- メタ情報: JSON（fingerprint, ids, questions, key_bytes, mask_bytes, slot_bits, count）
+- スロット: 2^slot_bits 個の固定長レコード [キー key_bytes][残り手数 1][次の質問 mask_bytes]
+
+スロットはオープンアドレス法（線形探索、充填率 1/2 以下）のハッシュ表で、mmap で読むため
+表の大きさによらず 1 回の引きは O(1)。残り手数のバイトは 0 = 空きスロット、
+255 = クリア不能、それ以外は 残り手数 + 1。次の質問は questions の定義順の位置のビットマスク。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import struct
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from engine import PuzzleData
+
+MAGIC = b"HINT"
+VERSION = 1
+EMPTY = 0
+UNSOLVABLE = 255
+MAX_REMAINING = UNSOLVABLE - 2
+
+_HEADER = struct.Struct("<4sHI")
+_GOLDEN = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+
+def puzzle_fingerprint(puzzle: PuzzleData) -> str:
+    """表とパズル定義の対応を確かめるための指紋（導出・棄却・質問・初期状態・クリア条件）"""
+    payload = {
+        "descriptors": [
+            [d.id, d.formation_conditions, d.rejection_conditions] for d in puzzle.descriptors.values()
+        ],
+        "questions": [
+            [q.id, q.prerequisites, q.recall_conditions, q.reveals] for q in puzzle.questions.values()
+        ],
+        "initial_confirmed": puzzle.initial_confirmed,
+        "clear_conditions": puzzle.clear_conditions,
+    }
+    return hashlib.sha1(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _slot(key: int, slot_bits: int) -> int:
+    """キー（任意長の整数）→ 初期スロット。64 ビットずつ畳み込んでから乗算ハッシュをかける"""
+    folded = 0
+    while True:
+        folded ^= key & _MASK64
+        key >>= 64
+        if not key:
+            break
+    return (folded * _GOLDEN & _MASK64) >> (64 - slot_bits) if slot_bits else 0
+
+
+def write_hint_table(
+    path: str | Path,
+    entries: dict[int, tuple[int | None, int]],
+    ids: list[str],
+    question_ids: list[str],
+    fingerprint: str,
+) -> int:
+    """ヒント表を書き出す。
+
+    ids: ビット位置 → 記述素 ID
+    entries: confirmed → (残り手数（クリア不能なら None）, 次の質問の位置マスク)
+    戻り値: 書き出したバイト数
+    """
+    key_bytes = max(1, (len(ids) + 7) // 8)
+    mask_bytes = max(1, (len(question_ids) + 7) // 8)
+    record = key_bytes + 1 + mask_bytes
+    slot_bits = max(1, (2 * len(entries) - 1).bit_length())
+    slots = 1 << slot_bits
+
+    body = bytearray(slots * record)
+    for key, (remaining, mask) in entries.items():
+        if remaining is not None and remaining > MAX_REMAINING:
+            raise ValueError(f"残り手数 {remaining} はヒント表に格納できません（上限 {MAX_REMAINING}）")
+        slot = _slot(key, slot_bits)
+        while body[slot * record + key_bytes] != EMPTY:
+            slot = (slot + 1) & (slots - 1)
+        pos = slot * record
+        body[pos:pos + key_bytes] = key.to_bytes(key_bytes, "little")
+        body[pos + key_bytes] = UNSOLVABLE if remaining is None else remaining + 1
+        body[pos + key_bytes + 1:pos + record] = mask.to_bytes(mask_bytes, "little")
+
+    meta = json.dumps(
+        {
+            "fingerprint": fingerprint,
+            "ids": ids,
+            "questions": question_ids,
+            "key_bytes": key_bytes,
+            "mask_bytes": mask_bytes,
+            "slot_bits": slot_bits,
+            "count": len(entries),
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(meta)))
+        f.write(meta)
+        f.write(body)
+    return _HEADER.size + len(meta) + len(body)
+
+
+class HintTable:
+    """ヒント表ファイルを mmap で開いたもの"""
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, meta_len = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{self.path}: ヒント表の形式が不正です")
+        meta = json.loads(self._mm[_HEADER.size:_HEADER.size + meta_len])
+        self.fingerprint: str = meta["fingerprint"]
+        self.ids: list[str] = meta["ids"]
+        self.index: dict[str, int] = {id_: i for i, id_ in enumerate(self.ids)}
+        self.questions: list[str] = meta["questions"]
+        self.key_bytes: int = meta["key_bytes"]
+        self.mask_bytes: int = meta["mask_bytes"]
+        self.slot_bits: int = meta["slot_bits"]
+        self.count: int = meta["count"]
+        self._record = self.key_bytes + 1 + self.mask_bytes
+        self._offset = _HEADER.size + meta_len
+
+    def __len__(self) -> int:
+        return self.count
+
+    def encode(self, members: Iterable[str]) -> int | None:
+        """記述素 ID 集合 → キー（表の番号付けにない ID を含むなら None）"""
+        bits = 0
+        for id_ in members:
+            i = self.index.get(id_)
+            if i is None:
+                return None
+            bits |= 1 << i
+        return bits
+
+    def lookup(self, key: int) -> tuple[int | None, list[str]] | None:
+        """confirmed のキー（encode の結果） → (残り手数（クリア不能なら None）, 次の質問 ID（定義順）)。
+
+        表にない状態（到達不能な状態）なら None。
+        """
+        key_bytes, record, mm = self.key_bytes, self._record, self._mm
+        packed = key.to_bytes(key_bytes, "little")
+        last = (1 << self.slot_bits) - 1
+        slot = _slot(key, self.slot_bits)
+        while True:
+            pos = self._offset + slot * record
+            tag = mm[pos + key_bytes]
+            if tag == EMPTY:
+                return None
+            if mm[pos:pos + key_bytes] == packed:
+                break
+            slot = (slot + 1) & last
+
+        mask = int.from_bytes(mm[pos + key_bytes + 1:pos + record], "little")
+        questions = []
+        while mask:
+            low = mask & -mask
+            questions.append(self.questions[low.bit_length() - 1])
+            mask ^= low
+        return (None if tag == UNSOLVABLE else tag - 1), questions
+
+    def close(self) -> None:
+        self._mm.close()
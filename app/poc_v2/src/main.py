@@ -5,13 +5,16 @@ from __future__ import annotations
 import sys
 from pathlib import Path
 
+import instrumentation
 from engine import (
     AnswerResult,
     PuzzleData,
     answer_question,
     available_questions,
     check_complete,
+    hint,
     init_game,
+    load_hints,
     load_puzzle,
 )
 from models import GameState
@@ -90,9 +93,24 @@ def display_answer_result(
         print("  （新しい発見はありませんでした）")
 
 
-def run_simulation(puzzle_path: str | Path) -> None:
-    """CLI シミュレーション実行"""
+def display_hint(state: GameState, puzzle: PuzzleData) -> None:
+    """ヒント表から残り手数と最短の次の質問を表示"""
+    result = hint(state, puzzle)
+    if result is None:
+        print("ヒント表にない状態です。")
+    elif result.remaining is None:
+        print("💡 ヒント: この状態からはクリアできません。")
+    else:
+        print(f"💡 ヒント: 最短であと {result.remaining} 問")
+        for q in result.questions:
+            print(f"  → {q.text}")
+
+
+def run_simulation(puzzle_path: str | Path, hints_path: str | Path | None = None) -> None:
+    """CLI シミュレーション実行（hints_path を指定すると h でヒントを表示できる）"""
     puzzle = load_puzzle(puzzle_path)
+    if hints_path is not None:
+        load_hints(puzzle, hints_path)
     state = init_game(puzzle)
 
     print("=" * 60)
@@ -124,6 +142,8 @@ def run_simulation(puzzle_path: str | Path) -> None:
             )
             print(f"  {i}. {q.text}  {mech_icon}")
 
+        if puzzle.hints is not None:
+            print("  h. ヒント")
         print(f"  0. 終了")
 
         try:
@@ -136,6 +156,10 @@ def run_simulation(puzzle_path: str | Path) -> None:
             print("終了します。")
             break
 
+        if choice == "h" and puzzle.hints is not None:
+            display_hint(state, puzzle)
+            continue
+
         try:
             idx = int(choice) - 1
             if idx < 0 or idx >= len(questions):
@@ -203,9 +227,17 @@ def run_auto_simulation(puzzle_path: str | Path, *, show_ids: bool = True) -> No
             print(f"\n未発見ピース: {set(puzzle.pieces.keys()) - state.discovered_pieces}")
 
 
+def _option_value(name: str) -> str | None:
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv):
+            return sys.argv[idx + 1]
+    return None
+
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python main.py <data.json> [--auto]", file=sys.stderr)
+        print("Usage: python main.py <data.json> [--auto] [--hints PATH] [--profile PATH]", file=sys.stderr)
         sys.exit(2)
 
     puzzle_path = sys.argv[1]
@@ -213,8 +245,18 @@ if __name__ == "__main__":
         print(f"Error: {puzzle_path} が見つかりません", file=sys.stderr)
         sys.exit(2)
 
+    # --profile: 回答ごとの段階別計測を JSON Lines で書き出す
+    profile_path = _option_value("--profile")
+    recorder = instrumentation.enable() if profile_path else None
+
     show_ids = "--no-id" not in sys.argv
     if "--auto" in sys.argv:
         run_auto_simulation(puzzle_path, show_ids=show_ids)
     else:
-        run_simulation(puzzle_path)
+        run_simulation(puzzle_path, _option_value("--hints"))
+
+    if recorder is not None:
+        instrumentation.disable()
+        with open(profile_path, "w", encoding="utf-8") as f:
+            recorder.write_jsonl(f)
+        print(f"計測結果: {profile_path}（{len(recorder.turns)} ターン）")
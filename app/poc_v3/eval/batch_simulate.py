@@ -0,0 +1,348 @@
+"""多数ゲームの一括シミュレーション（v3）
+
+同じパズルを N ゲーム同時に進め、クリア率・行き詰まり率・手数の分布から難易度を見積もる。
+
+ゲーム状態は「ゲーム × 命題」の真偽行列を列ごとに持つ: 命題 i の列は整数 1 個で、
+ビット g がゲーム g でその命題が成り立つかを表す。節（前件の AND）の評価は列の AND、
+OR of AND はその OR なので、論理的導出・仮説導出・棄却・利用可能性・ピース・クリア判定を
+全ゲーム分まとめて 1 回の整数演算列で評価できる（ゲームごとの Python ループがない）。
+
+各ステップで全ゲームが 1 問ずつ回答する（ロックステップ）。どの質問を選ぶかは方策で決める:
+- random: 利用可能な質問から一様に選ぶ（質問ごとに乱数ビット列を引き、候補が 1 つに
+  絞れるまで「1 を引いた候補が残る」トーナメントを列単位で行う）
+- first: 定義順で最初の利用可能な質問（main.py の自動シミュレーションと同じ）
+
+--verify で指定した数のゲームを、記録した回答順のままエンジン（answer_question）で
+再生し、confirmed / derived / ピース / 回答済み / 結末が一致することを確かめる。
+"""
+
+from __future__ import annotations
+
+import random
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from common import option_value  # noqa: E402
+from compiled import load_compiled  # noqa: E402
+from engine import PuzzleData, answer_question, available_questions, check_complete, init_game  # noqa: E402
+
+DEFAULT_GAMES = 10000
+DEFAULT_VERIFY = 100
+MAX_STEPS = 1000
+
+# 方策: (利用可能性の列（質問の定義順）, ゲーム数) → 選んだ質問の列（ゲームごとに高々 1 つ）
+Policy = Callable[[list[int], int], list[int]]
+
+
+def _conjunction(columns: list[int], body: list[int], full: int) -> int:
+    """前件の全原子が成り立つゲームの集合"""
+    bits = full
+    for atom in body:
+        bits &= columns[atom]
+        if not bits:
+            break
+    return bits
+
+
+def _disjunction(columns: list[int], bodies: list[list[int]], full: int) -> int:
+    """いずれかの前件が成り立つゲームの集合"""
+    bits = 0
+    for body in bodies:
+        bits |= _conjunction(columns, body, full)
+        if bits == full:
+            break
+    return bits
+
+
+def _grouped(network, positions: dict[str, int]) -> list[tuple[int, list[list[int]]]]:
+    """ClauseNetwork → (head の位置, 前件（位置のリスト）のリスト)"""
+    groups: list[list[list[int]]] = [[] for _ in network.heads]
+    for c, body in enumerate(network.bodies):
+        groups[network.clause_head[c]].append([positions[a] for a in body])
+    return [(positions[h], g) for h, g in zip(network.heads, groups)]
+
+
+class BatchRules:
+    """パズルの条件を命題の位置（PuzzleIndex の番号付け）上にコンパイルしたもの"""
+
+    def __init__(self, puzzle: PuzzleData):
+        index = puzzle.index
+        props = index.props.index
+        self.props = list(index.props.ids)
+        self.entailment = _grouped(puzzle.entailment_network, props)
+        self.formation = _grouped(puzzle.formation_network, props)
+        self.rejection = _grouped(puzzle.rejection_network, props)
+
+        network = puzzle.availability_network
+        clauses: list[list[list[int]]] = [[] for _ in network.heads]
+        for c, body in enumerate(network.bodies):
+            clauses[network.clause_head[c]].append([props[a] for a in body])
+        self.question_ids = [q.id for q in puzzle.question_order]
+        self.reveals = [props[q.reveals] if q.reveals else None for q in puzzle.question_order]
+        self.clauses = clauses
+
+        # ピース（定義順）: (ピースの位置, 構成命題, 依存ピース)。未定義のピースに依存するものは発見されない
+        self.piece_ids = list(index.pieces.ids)
+        self.pieces = [
+            (index.pieces.index[p.id], [props[m] for m in p.members], [index.pieces.index[d] for d in p.depends_on])
+            for p in puzzle.pieces.values()
+            if all(d in index.pieces.index for d in p.depends_on)
+        ]
+        self.clear = [[props[a] for a in group] for group in puzzle.clear_conditions]
+        self.initial = [props[a] for a in puzzle.initial_confirmed]
+
+
+class BatchState:
+    """N ゲーム分の状態（命題・質問・ピースごとの列）"""
+
+    def __init__(self, rules: BatchRules, games: int):
+        self.rules = rules
+        self.games = games
+        self.full = (1 << games) - 1
+        self.confirmed = [0] * len(rules.props)
+        self.derived = [0] * len(rules.props)
+        self.answered = [0] * len(rules.question_ids)
+        self.pieces = [0] * len(rules.piece_ids)
+        self.active = self.full  # クリアも行き詰まりもしていないゲーム
+        self.history: list[list[int]] = []  # ステップごとの選んだ質問の列
+        self.cleared_at: list[int] = []  # ステップ k（0 = 初期状態）でクリアしたゲーム
+        self.stuck_at: list[int] = []  # ステップ k で行き詰まったゲーム
+
+    def entail(self) -> None:
+        """論理的導出の不動点（全ゲーム同時）"""
+        confirmed, full = self.confirmed, self.full
+        changed = True
+        while changed:
+            changed = False
+            for head, bodies in self.rules.entailment:
+                added = _disjunction(confirmed, bodies, full) & ~confirmed[head]
+                if added:
+                    confirmed[head] |= added
+                    changed = True
+
+    def form(self) -> None:
+        """仮説導出の 1 回パス: 形成済み ∧ ¬confirmed ∧ ¬棄却"""
+        confirmed, full = self.confirmed, self.full
+        rejected = [0] * len(confirmed)
+        for head, bodies in self.rules.rejection:
+            rejected[head] = _disjunction(confirmed, bodies, full)
+        derived = [0] * len(confirmed)
+        for head, bodies in self.rules.formation:
+            derived[head] = _disjunction(confirmed, bodies, full) & ~confirmed[head] & ~rejected[head]
+        self.derived = derived
+
+    def discover(self, moved: int) -> None:
+        """moved のゲームでピース判定（answer_question と同じく定義順に 1 回走査）"""
+        known = [c | d for c, d in zip(self.confirmed, self.derived)]
+        pieces = self.pieces
+        for piece, members, depends_on in self.rules.pieces:
+            found = moved & ~pieces[piece]
+            found = _conjunction(known, members, found)
+            found = _conjunction(pieces, depends_on, found)
+            pieces[piece] |= found
+
+    def available(self) -> list[int]:
+        """質問ごとの利用可能なゲームの集合（active のゲームに限る）"""
+        rules, confirmed, active = self.rules, self.confirmed, self.active
+        result = []
+        for i, clauses in enumerate(rules.clauses):
+            bits = active & ~self.answered[i]
+            reveal = rules.reveals[i]
+            if reveal is not None:
+                bits &= ~confirmed[reveal]
+            result.append(_disjunction(confirmed, clauses, bits) if bits else 0)
+        return result
+
+    def is_clear(self) -> int:
+        return _disjunction(self.confirmed, self.rules.clear, self.full) if self.rules.clear else 0
+
+    def start(self) -> None:
+        """init_game 相当: initial_confirmed → 論理的導出 → 仮説導出"""
+        for atom in self.rules.initial:
+            self.confirmed[atom] = self.full
+        self.entail()
+        self.form()
+        cleared = self.is_clear() & self.active
+        self.cleared_at.append(cleared)
+        self.stuck_at.append(0)
+        self.active &= ~cleared
+
+    def step(self, policy: Policy) -> None:
+        """active の全ゲームで 1 問ずつ回答する"""
+        avail = self.available()
+        offered = 0
+        for bits in avail:
+            offered |= bits
+        stuck = self.active & ~offered
+        self.active &= offered
+
+        picks = policy(avail, self.games)
+        rules = self.rules
+        for i, bits in enumerate(picks):
+            if not bits:
+                continue
+            self.answered[i] |= bits
+            reveal = rules.reveals[i]
+            if reveal is not None:
+                self.confirmed[reveal] |= bits
+        self.history.append(picks)
+
+        self.entail()
+        self.form()
+        self.discover(self.active)
+        cleared = self.is_clear() & self.active
+        self.cleared_at.append(cleared)
+        self.stuck_at.append(stuck)
+        self.active &= ~cleared
+
+    def run(self, policy: Policy, max_steps: int = MAX_STEPS) -> None:
+        self.start()
+        while self.active and len(self.history) < max_steps:
+            self.step(policy)
+
+    def path(self, game: int) -> list[str]:
+        """ゲーム g の回答順"""
+        bit = 1 << game
+        qids = []
+        for picks in self.history:
+            for i, bits in enumerate(picks):
+                if bits & bit:
+                    qids.append(self.rules.question_ids[i])
+                    break
+        return qids
+
+    def members(self, columns: list[int], ids: list[str], game: int) -> set[str]:
+        return {id_ for id_, bits in zip(ids, columns) if bits >> game & 1}
+
+
+def random_policy(rng: random.Random) -> Policy:
+    """利用可能な質問から一様に選ぶ方策"""
+
+    def choose(avail: list[int], games: int) -> list[int]:
+        candidates = list(avail)
+        while True:
+            # 候補が 2 つ以上残っているゲーム
+            seen = contested = 0
+            for bits in candidates:
+                contested |= seen & bits
+                seen |= bits
+            if not contested:
+                return candidates
+            # 各候補に乱数ビットを 1 つ引き、1 を引いた候補がいるゲームでは 0 の候補を落とす
+            draws = [rng.getrandbits(games) for _ in candidates]
+            ones = 0
+            for bits, draw in zip(candidates, draws):
+                ones |= bits & draw
+            ones &= contested
+            candidates = [bits & ~(ones & ~draw) for bits, draw in zip(candidates, draws)]
+
+    return choose
+
+
+def first_policy(avail: list[int], games: int) -> list[int]:
+    """定義順で最初の利用可能な質問を選ぶ方策"""
+    taken = 0
+    picks = []
+    for bits in avail:
+        picks.append(bits & ~taken)
+        taken |= bits
+    return picks
+
+
+POLICIES = {"random": lambda seed: random_policy(random.Random(seed)), "first": lambda seed: first_policy}
+
+
+def verify(puzzle: PuzzleData, batch: BatchState, games: list[int]) -> list[str]:
+    """記録した回答順をエンジンで再生し、一括シミュレーションの結果と突き合わせる"""
+    rules = batch.rules
+    errors = []
+    for g in games:
+        state = init_game(puzzle)
+        for qid in batch.path(g):
+            if qid not in {q.id for q in available_questions(state, puzzle)}:
+                errors.append(f"ゲーム {g}: {qid} がエンジンでは利用可能でない")
+                break
+            answer_question(state, puzzle.questions[qid], puzzle)
+        expected = {
+            "confirmed": batch.members(batch.confirmed, rules.props, g),
+            "derived": batch.members(batch.derived, rules.props, g),
+            "discovered_pieces": batch.members(batch.pieces, rules.piece_ids, g),
+            "answered": batch.members(batch.answered, rules.question_ids, g),
+        }
+        for name, members in expected.items():
+            if getattr(state, name) != members:
+                errors.append(f"ゲーム {g}: {name} が一致しない（一括 {sorted(members)} / エンジン {sorted(getattr(state, name))}）")
+        cleared = any(bits >> g & 1 for bits in batch.cleared_at)
+        if cleared != check_complete(state, puzzle):
+            errors.append(f"ゲーム {g}: クリア判定が一致しない")
+        elif not cleared and batch.active >> g & 1 == 0 and available_questions(state, puzzle):
+            errors.append(f"ゲーム {g}: 行き詰まり判定が一致しない")
+    return errors
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(
+            "Usage: python batch_simulate.py <data.json> "
+            "[--games N] [--policy random|first] [--seed N] [--verify N]",
+            file=sys.stderr,
+        )
+        sys.exit(2)
+
+    path = sys.argv[1]
+    if not Path(path).exists():
+        print(f"Error: {path} が見つかりません", file=sys.stderr)
+        sys.exit(2)
+
+    games = int(option_value("--games") or DEFAULT_GAMES)
+    policy_name = option_value("--policy") or "random"
+    seed = int(option_value("--seed") or 0)
+    n_verify = int(option_value("--verify") or DEFAULT_VERIFY)
+    if policy_name not in POLICIES:
+        print(f"Error: 未知の方策 {policy_name}（{', '.join(POLICIES)}）", file=sys.stderr)
+        sys.exit(2)
+
+    puzzle = load_compiled(path).puzzle
+    batch = BatchState(BatchRules(puzzle), games)
+
+    start = time.perf_counter()
+    batch.run(POLICIES[policy_name](seed))
+    elapsed = time.perf_counter() - start
+
+    cleared = [bits.bit_count() for bits in batch.cleared_at]
+    stuck = [bits.bit_count() for bits in batch.stuck_at]
+    print(f"[batch_simulate] {games} ゲーム / 方策 {policy_name} / {len(batch.history)} ステップ ({elapsed:.2f} 秒)")
+    print(f"  クリア: {sum(cleared)} ({sum(cleared) / games:.1%})")
+    print(f"  行き詰まり: {sum(stuck)} ({sum(stuck) / games:.1%})")
+    if batch.active:
+        print(f"  未終了（{MAX_STEPS} ステップで打ち切り）: {batch.active.bit_count()}")
+    if sum(cleared):
+        steps = [k for k, n in enumerate(cleared) for _ in range(n)]
+        print(
+            f"  クリア手数: 平均 {sum(steps) / len(steps):.2f} / 最小 {steps[0]} / "
+            f"中央値 {steps[len(steps) // 2]} / 最大 {steps[-1]}"
+        )
+
+    if n_verify > 0:
+        sample = sorted(random.Random(seed).sample(range(games), min(n_verify, games)))
+        start = time.perf_counter()
+        errors = verify(puzzle, batch, sample)
+        scalar = time.perf_counter() - start
+        print()
+        print(
+            f"  エンジン再生による検証: {len(sample)} ゲーム ({scalar:.2f} 秒、"
+            f"{games} ゲーム換算 {scalar / len(sample) * games:.1f} 秒)"
+        )
+        for e in errors[:20]:
+            print(f"    ✗ {e}")
+        if errors:
+            sys.exit(1)
+        print("    ✓ すべて一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""ヒント表の構築（v3）
+
+到達可能な全状態について、クリアまでの最小残り質問数と最短でクリアに向かう次の質問の
+集合を後退解析で求め、src/hints.py の形式で書き出す。ゲーム中は engine.hint() が
+この表を 1 回引くだけで答える。
+
+状態は find_min_questions と同じく confirmed を関係する命題へ射影したビットセット
+（SolverTables）。回答で confirmed は真に増えるので、要素数の多い状態から順に
+  残り手数(s) = 0（クリア済み） / min(1 + 残り手数(後続)) / クリア不能
+を確定できる（後続は必ず先に確定している）。クリア済みの状態は展開しない。
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from common import option_value  # noqa: E402
+from compiled import load_compiled  # noqa: E402
+from engine import hint, init_game, load_hints  # noqa: E402
+from find_min_questions import SolverTables, find_minimum_questions  # noqa: E402
+from hints import puzzle_fingerprint, write_hint_table  # noqa: E402
+
+
+def retrograde(tables: SolverTables, positions: dict[str, int]) -> dict[int, tuple[int | None, int]]:
+    """到達可能状態ごとの (残り手数（クリア不能なら None）, 最適な次の質問の位置マスク)。
+
+    positions: 質問ID → question_order での位置（マスクのビット位置）
+    """
+    # 前向き: 到達可能状態と遷移を列挙する
+    successors: dict[int, list[tuple[int, int]]] = {}
+    stack = [tables.initial]
+    while stack:
+        bits = stack.pop()
+        if bits in successors:
+            continue
+        moves: list[tuple[int, int]] = []
+        if not tables.is_clear(bits):
+            for qid, succ in tables.successors(bits):
+                moves.append((positions[qid], succ))
+                if succ not in successors:
+                    stack.append(succ)
+        successors[bits] = moves
+
+    # 後ろ向き: confirmed の要素数が多い状態から確定する
+    entries: dict[int, tuple[int | None, int]] = {}
+    for bits in sorted(successors, key=lambda b: -b.bit_count()):
+        if tables.is_clear(bits):
+            entries[bits] = (0, 0)
+            continue
+        best: int | None = None
+        mask = 0
+        for pos, succ in successors[bits]:
+            remaining = entries[succ][0]
+            if remaining is None:
+                continue
+            if best is None or remaining + 1 < best:
+                best, mask = remaining + 1, 1 << pos
+            elif remaining + 1 == best:
+                mask |= 1 << pos
+        entries[bits] = (best, mask)
+    return entries
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python build_hints.py <data.json> [--out PATH]", file=sys.stderr)
+        sys.exit(2)
+
+    path = sys.argv[1]
+    if not Path(path).exists():
+        print(f"Error: {path} が見つかりません", file=sys.stderr)
+        sys.exit(2)
+
+    out = option_value("--out") or str(Path(path).with_suffix(".hints"))
+
+    puzzle = load_compiled(path).puzzle
+    if not puzzle.clear_conditions:
+        print("clear_conditions が未定義")
+        return
+
+    start = time.perf_counter()
+    tables = SolverTables(puzzle)
+    question_ids = [q.id for q in puzzle.question_order]
+    entries = retrograde(tables, {qid: i for i, qid in enumerate(question_ids)})
+    size = write_hint_table(out, entries, tables.relevant, question_ids, puzzle_fingerprint(puzzle))
+    elapsed = time.perf_counter() - start
+
+    unsolvable = sum(1 for remaining, _ in entries.values() if remaining is None)
+    cleared = sum(1 for remaining, _ in entries.values() if remaining == 0)
+    print(f"[build_hints] {out}: {len(entries)} 状態 / {size} バイト ({elapsed:.2f} 秒)")
+    print(f"  クリア済み: {cleared} / クリア不能: {unsolvable}")
+
+    # 書き出した表をエンジン経由で引き、初期状態の残り手数を最小質問数と突き合わせる
+    load_hints(puzzle, out)
+    initial = hint(init_game(puzzle), puzzle)
+    min_depth, _ = find_minimum_questions(puzzle, tables)
+    if initial is None or initial.remaining != min_depth:
+        got = None if initial is None else initial.remaining
+        print(f"  ✗ 初期状態の残り手数 {got} が最小質問数 {min_depth} と一致しません")
+        sys.exit(1)
+    if min_depth is None:
+        print("  初期状態: クリア不能")
+    else:
+        print(f"  初期状態: 残り {min_depth} 問 / 次の質問: {', '.join(q.id for q in initial.questions) or '（なし）'}")
+
+
+if __name__ == "__main__":
+    main()
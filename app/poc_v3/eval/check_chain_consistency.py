@@ -2,14 +2,21 @@
 
 _tactical_chains / _piece_chains と questions の整合性を検証する。
 data_src.json 専用（_ プレフィックスフィールドが必要）。
+
+索引（ChainIndex）はファイルごとに 1 回だけ作る。命題の集合はビットセットで持ち、
+連鎖ステップが前段を参照するか・質問の利用可能条件が満たされるかはビット演算 1 回で判定する。
 """
 
 from __future__ import annotations
 
 import json
 import sys
+from functools import cached_property
 from pathlib import Path
 
+from closure import DerivationClosure, get_closure
+from phases import PhaseIndex, phase_index
+
 
 def load_data(path: str) -> dict:
     with open(path, encoding="utf-8") as f:
@@ -24,10 +31,123 @@ def _get_reveals(q: dict) -> list[str]:
     return r
 
 
-def check_chain_question_coverage(data: dict) -> list[str]:
+class ChainIndex:
+    """1 ファイル分の連鎖チェック用の索引。各値は初回アクセス時に 1 回だけ計算する"""
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.phases: PhaseIndex = phase_index(data)
+        self.initial = set(data.get("initial_confirmed", []))
+        # 命題マップの構築（v2: descriptors, v3: propositions）
+        self.descriptors = data.get("propositions", data.get("descriptors", []))
+        self._bits: dict[str, int] = {}
+
+    # --- ビットセット（fc と連鎖の照合用） ---
+
+    def bit(self, id_: str) -> int:
+        b = self._bits.get(id_)
+        if b is None:
+            b = 1 << len(self._bits)
+            self._bits[id_] = b
+        return b
+
+    def encode(self, ids) -> int:
+        bits = 0
+        for id_ in ids:
+            bits |= self.bit(id_)
+        return bits
+
+    # --- 索引 ---
+
+    @cached_property
+    def question_map(self) -> dict[str, dict]:
+        return {q["id"]: q for q in self.data.get("questions", [])}
+
+    @cached_property
+    def descriptor_map(self) -> dict[str, dict]:
+        return {d["id"]: d for d in self.descriptors}
+
+    @cached_property
+    def descriptor_to_piece(self) -> dict[str, str]:
+        mapping: dict[str, str] = {}
+        for piece in self.data.get("pieces", []):
+            for mid in piece.get("members", []):
+                mapping[mid] = piece["id"]
+        return mapping
+
+    @cached_property
+    def proposition_map(self) -> dict[str, dict]:
+        return {p["id"]: p for p in self.data.get("propositions", [])}
+
+    @cached_property
+    def fc_atoms(self) -> dict[str, int]:
+        """命題 → formation_conditions のいずれかのグループに現れる命題のビットセット
+
+        fc のいずれかの AND グループが前段を参照する ⇔ このビットセットが前段と交わる。
+        formation_conditions がない命題は含めない。
+        """
+        atoms: dict[str, int] = {}
+        for pid, prop in self.proposition_map.items():
+            fc = prop.get("formation_conditions")
+            if fc is not None:
+                atoms[pid] = self.encode(ref for group in fc for ref in group)
+        return atoms
+
+    @cached_property
+    def initial_bits(self) -> int:
+        return self.encode(self.initial)
+
+    @cached_property
+    def tactical_chain_steps(self) -> list[tuple[dict, list[str], list[int]]]:
+        """v4 配置（_phase4）の各連鎖 → (連鎖, ステップ列, 各ステップの前段のビットセット)
+
+        ステップ列は intermediates[0] → ... → intermediates[-1] → target。
+        最初のステップの前段は source、以降は直前のステップ。
+        """
+        # intermediates を前提にするので v4 配置（_phase4）の連鎖だけを対象にする
+        if self.phases.phase_of("tactical_chains") != 4:
+            return []
+        result = []
+        for chain in self.phases.tactical_chains:
+            steps = chain.get("intermediates", []) + [chain.get("target", "")]
+            predecessors = [self.encode(chain.get("source", []))] + [self.bit(step) for step in steps[:-1]]
+            result.append((chain, steps, predecessors))
+        return result
+
+    # --- 導出（利用可能条件の照合用） ---
+
+    @cached_property
+    def closure(self) -> DerivationClosure:
+        """導出閉包（条件をコンパイルしたもの。allowed ごとの結果は閉包側でメモ化される）"""
+        formation_conditions: dict[str, list[list[str]]] = {}
+        entailment_conditions: dict[str, list[list[str]]] = {}
+        rejection_conditions: dict[str, list[list[str]]] = {}
+        # 条件が null の命題は条件なしとして扱う（閉包は全条件をまとめてコンパイルする）
+        for d in self.descriptors:
+            if d.get("formation_conditions") is not None:
+                formation_conditions[d["id"]] = d["formation_conditions"]
+            if d.get("entailment_conditions") is not None:
+                entailment_conditions[d["id"]] = d["entailment_conditions"]
+            if d.get("rejection_conditions") is not None:
+                rejection_conditions[d["id"]] = d["rejection_conditions"]
+        return get_closure(formation_conditions, entailment_conditions, rejection_conditions or None)
+
+    @cached_property
+    def availability_groups(self) -> dict[str, tuple[list[list[str]], list[int]]]:
+        """質問 → (利用可能条件, 各 AND グループの閉包ビットセット)。条件のない質問は含めない"""
+        groups = {}
+        for qid, q in self.question_map.items():
+            fc = _get_availability_fc(q, self.descriptor_map)
+            if fc:
+                groups[qid] = (fc, [self.closure.encode(g) for g in fc])
+        return groups
+
+
+def check_chain_question_coverage(ix: ChainIndex) -> list[str]:
     """全連鎖ステップに対応する質問が存在するか"""
     errors = []
-    question_ids = {q["id"] for q in data.get("questions", [])}
+    data = ix.data
+    question_ids = ix.question_map.keys()
 
     for chain in data.get("_piece_chains", []):
         chain_id = chain.get("id", "?")
@@ -48,12 +168,12 @@ def check_chain_question_coverage(data: dict) -> list[str]:
     return errors
 
 
-def check_output_coverage(data: dict) -> list[str]:
+def check_output_coverage(ix: ChainIndex) -> list[str]:
     """ステップの output が質問群の reveals 合集合で全カバーされるか"""
     errors = []
-    question_map = {q["id"]: q for q in data.get("questions", [])}
+    question_map = ix.question_map
 
-    for chain in data.get("_piece_chains", []):
+    for chain in ix.data.get("_piece_chains", []):
         chain_id = chain.get("id", "?")
         for i, step in enumerate(chain.get("steps", [])):
             outputs = set(step.get("output", []))
@@ -76,12 +196,12 @@ def check_output_coverage(data: dict) -> list[str]:
     return errors
 
 
-def check_reveals_scope(data: dict) -> list[str]:
+def check_reveals_scope(ix: ChainIndex) -> list[str]:
     """質問が reveals する命題がステップの output 範囲内か"""
     errors = []
-    question_map = {q["id"]: q for q in data.get("questions", [])}
+    question_map = ix.question_map
 
-    for chain in data.get("_piece_chains", []):
+    for chain in ix.data.get("_piece_chains", []):
         chain_id = chain.get("id", "?")
         for i, step in enumerate(chain.get("steps", [])):
             outputs = set(step.get("output", []))
@@ -100,51 +220,6 @@ def check_reveals_scope(data: dict) -> list[str]:
     return errors
 
 
-def _derivable_from(
-    available: set[str],
-    formation_conditions: dict[str, list[list[str]]],
-    entailment_conditions: dict[str, list[list[str]]],
-    rejection_conditions: dict[str, list[list[str]]] | None = None,
-) -> set[str]:
-    """available から v3 の 2 段階導出で到達可能な命題を返す。
-
-    1. 論理的導出（entailment）: confirmed → confirmed の不動点計算
-    2. 仮説導出（formation）: confirmed → derived の 1 回パス
-    """
-    # Step 1: 論理的導出（不動点計算）
-    confirmed = set(available)
-    changed = True
-    while changed:
-        changed = False
-        for did, conditions in entailment_conditions.items():
-            if did in confirmed:
-                continue
-            for cond_group in conditions:
-                if all(ref in confirmed for ref in cond_group):
-                    confirmed.add(did)
-                    changed = True
-                    break
-
-    # Step 2: 棄却集合の計算
-    rejected = set()
-    if rejection_conditions:
-        for did, conditions in rejection_conditions.items():
-            if any(all(c in confirmed for c in group) for group in conditions):
-                rejected.add(did)
-
-    # Step 3: 仮説導出（1 回パス）
-    derived = set()
-    for did, conditions in formation_conditions.items():
-        if did in confirmed or did in rejected:
-            continue
-        for cond_group in conditions:
-            if all(ref in confirmed for ref in cond_group):
-                derived.add(did)
-                break
-
-    return (confirmed | derived) - available
-
-
 def _get_availability_fc(q: dict, descriptor_map: dict) -> list[list[str]] | None:
     """質問の利用可能条件を返す。
 
@@ -166,7 +241,7 @@ def _get_availability_fc(q: dict, descriptor_map: dict) -> list[list[str]] | Non
     return d.get("formation_conditions")
 
 
-def check_availability_derivability(data: dict) -> list[str]:
+def check_availability_derivability(ix: ChainIndex) -> list[str]:
     """質問の利用可能条件が対応ステップの input から導出可能か。
 
     利用可能条件は OR-of-AND なので、少なくとも1つのグループが
@@ -174,60 +249,38 @@ def check_availability_derivability(data: dict) -> list[str]:
     cumulative_available のベースラインには initial_confirmed を含める。
     """
     errors = []
-    question_map = {q["id"]: q for q in data.get("questions", [])}
-    initial = set(data.get("initial_confirmed", []))
-
-    # 命題マップの構築（v2: descriptors, v3: propositions）
-    descriptors = data.get("propositions", data.get("descriptors", []))
-    descriptor_map = {d["id"]: d for d in descriptors}
-
-    # 導出条件の収集
-    formation_conditions: dict[str, list[list[str]]] = {}
-    entailment_conditions: dict[str, list[list[str]]] = {}
-    rejection_conditions: dict[str, list[list[str]]] = {}
-    for d in descriptors:
-        if "formation_conditions" in d:
-            formation_conditions[d["id"]] = d["formation_conditions"]
-        if "entailment_conditions" in d:
-            entailment_conditions[d["id"]] = d["entailment_conditions"]
-        if "rejection_conditions" in d:
-            rejection_conditions[d["id"]] = d["rejection_conditions"]
+    question_map = ix.question_map
 
-    for chain in data.get("_piece_chains", []):
+    for chain in ix.data.get("_piece_chains", []):
         chain_id = chain.get("id", "?")
         # 累積 input: initial_confirmed + 前のステップの output も利用可能
-        cumulative_available: set[str] = set(initial)
+        cumulative_available: set[str] = set(ix.initial)
+        previous: int | None = None
         for i, step in enumerate(chain.get("steps", [])):
-            step_input = set(step.get("input", []))
-            cumulative_available.update(step_input)
+            cumulative_available.update(step.get("input", []))
 
-            # cumulative_available から導出可能な命題を計算（v3 の 2 段階導出）
-            derivable = _derivable_from(cumulative_available, formation_conditions, entailment_conditions, rejection_conditions or None)
-            reachable = cumulative_available | derivable
+            # cumulative_available から到達可能な命題（v3 の 2 段階導出、前ステップから差分拡張）
+            available = ix.closure.encode(cumulative_available)
+            reachable = ix.closure.closure_bits(available, previous)
+            previous = available
 
             for qid in step.get("questions", []):
-                q = question_map.get(qid)
-                if q is None:
-                    continue
-                fc = _get_availability_fc(q, descriptor_map)
-                if not fc:
+                if qid not in question_map or qid not in ix.availability_groups:
                     continue
+                fc, groups = ix.availability_groups[qid]
                 # OR-of-AND: 少なくとも1つのグループが全て reachable なら OK
-                has_valid_group = any(
-                    all(ref in reachable for ref in cond_group)
-                    for cond_group in fc
+                if any(reachable & g == g for g in groups):
+                    continue
+                out_of_scope = []
+                for j, cond_group in enumerate(fc):
+                    unreachable = [ref for ref in cond_group if not reachable & ix.closure.encode((ref,))]
+                    if unreachable:
+                        out_of_scope.append(f"[{j}]: {unreachable}")
+                errors.append(
+                    f"_piece_chains '{chain_id}' step[{i}]: "
+                    f"質問 '{qid}' の利用可能条件にステップ input から "
+                    f"導出可能なグループがない（{', '.join(out_of_scope)}）"
                 )
-                if not has_valid_group:
-                    out_of_scope = []
-                    for j, cond_group in enumerate(fc):
-                        unreachable = [ref for ref in cond_group if ref not in reachable]
-                        if unreachable:
-                            out_of_scope.append(f"[{j}]: {unreachable}")
-                    errors.append(
-                        f"_piece_chains '{chain_id}' step[{i}]: "
-                        f"質問 '{qid}' の利用可能条件にステップ input から "
-                        f"導出可能なグループがない（{', '.join(out_of_scope)}）"
-                    )
 
             # output を次のステップで利用可能に
             cumulative_available.update(step.get("output", []))
@@ -235,18 +288,13 @@ def check_availability_derivability(data: dict) -> list[str]:
     return errors
 
 
-def check_reveals_piece_membership(data: dict) -> list[str]:
+def check_reveals_piece_membership(ix: ChainIndex) -> list[str]:
     """reveals する命題のピース帰属が正しいか"""
     errors = []
-    question_map = {q["id"]: q for q in data.get("questions", [])}
-
-    # descriptor → piece mapping
-    descriptor_to_piece: dict[str, str] = {}
-    for piece in data.get("pieces", []):
-        for mid in piece.get("members", []):
-            descriptor_to_piece[mid] = piece["id"]
+    question_map = ix.question_map
+    descriptor_to_piece = ix.descriptor_to_piece
 
-    for chain in data.get("_piece_chains", []):
+    for chain in ix.data.get("_piece_chains", []):
         chain_id = chain.get("id", "?")
         expected_piece = chain.get("piece_id")
         if expected_piece is None:
@@ -269,7 +317,7 @@ def check_reveals_piece_membership(data: dict) -> list[str]:
     return errors
 
 
-def check_fc_chain_consistency(data: dict) -> list[str]:
+def check_fc_chain_consistency(ix: ChainIndex) -> list[str]:
     """_phase4.tactical_chains の連鎖構造と propositions の fc が整合するか。
 
     連鎖 source → intermediates → target において:
@@ -279,95 +327,70 @@ def check_fc_chain_consistency(data: dict) -> list[str]:
     連鎖が段階的オープンとして機能しない。
     """
     errors = []
-    phase4 = data.get("_phase4", {})
-    chains = phase4.get("tactical_chains", [])
-    if not chains:
-        return []
+    props = ix.proposition_map
+    fc_atoms = ix.fc_atoms
+    initial_bits = ix.initial_bits
 
-    # 命題マップ
-    props = {p["id"]: p for p in data.get("propositions", [])}
-    initial = set(data.get("initial_confirmed", []))
-
-    for chain in chains:
+    for chain, steps, predecessors in ix.tactical_chain_steps:
         cid = chain.get("id", "?")
         source = chain.get("source", [])
-        intermediates = chain.get("intermediates", [])
-        target = chain.get("target", "")
 
-        if not intermediates:
+        if len(steps) == 1:
             # Phase 10（間引き）後は空の intermediates を許容する
-            if "_phase10" in data:
+            if ix.phases.has_phase(10):
                 continue
             errors.append(f"連鎖 '{cid}': intermediates が空（中間命題なし）")
             continue
 
-        # 連鎖のステップ列を構築: source → intermediates[0] → ... → intermediates[-1] → target
-        steps = intermediates + [target]
-
+        source_bits = predecessors[0]
         for i, step_id in enumerate(steps):
-            prop = props.get(step_id)
-            if prop is None:
-                errors.append(f"連鎖 '{cid}': ステップ '{step_id}' が propositions に存在しない")
+            atoms = fc_atoms.get(step_id)
+            if atoms is None:
+                if step_id not in props:
+                    errors.append(f"連鎖 '{cid}': ステップ '{step_id}' が propositions に存在しない")
+                else:
+                    errors.append(f"連鎖 '{cid}': '{step_id}' に formation_conditions がない")
                 continue
 
-            fc = prop.get("formation_conditions")
-            if fc is None:
-                errors.append(f"連鎖 '{cid}': '{step_id}' に formation_conditions がない")
+            # fc のいずれかの AND グループが前段を参照しているか
+            if atoms & predecessors[i]:
                 continue
 
-            # 前段の命題を特定
-            if i == 0:
-                # 最初の intermediate: 前段は source
-                expected_predecessors = set(source)
-                predecessor_label = f"source {source}"
+            # 前段をスキップしている
+            fc = props[step_id]["formation_conditions"]
+            predecessor_label = f"source {source}" if i == 0 else f"前段 '{steps[i - 1]}'"
+            # source のみ参照（intermediate をスキップ）のケースを特定
+            refs_only_source = atoms and not atoms & ~(source_bits | initial_bits)
+            if i > 0 and refs_only_source:
+                errors.append(
+                    f"連鎖 '{cid}': '{step_id}' の fc={fc} が "
+                    f"{predecessor_label} をスキップし source を直接参照 "
+                    f"→ 段階的オープンが機能しない"
+                )
+            elif i > 0:
+                errors.append(
+                    f"連鎖 '{cid}': '{step_id}' の fc={fc} が "
+                    f"{predecessor_label} を参照していない"
+                )
             else:
-                # 後続: 前段は直前の intermediate
-                prev_id = steps[i - 1]
-                expected_predecessors = {prev_id}
-                predecessor_label = f"前段 '{prev_id}'"
-
-            # fc のいずれかの AND グループが前段を参照しているか
-            refs_predecessor = False
-            all_fc_refs: set[str] = set()
-            for and_group in fc:
-                all_fc_refs.update(and_group)
-                if expected_predecessors & set(and_group):
-                    refs_predecessor = True
-
-            if not refs_predecessor:
-                # 前段をスキップしている
-                # source のみ参照（intermediate をスキップ）のケースを特定
-                source_set = set(source)
-                refs_only_source = all_fc_refs and all_fc_refs <= (source_set | initial)
-                if i > 0 and refs_only_source:
-                    errors.append(
-                        f"連鎖 '{cid}': '{step_id}' の fc={fc} が "
-                        f"{predecessor_label} をスキップし source を直接参照 "
-                        f"→ 段階的オープンが機能しない"
-                    )
-                elif i > 0:
+                # 最初の intermediate が source を参照していない
+                # source が全て initial_confirmed なら fc は initial のみでも可
+                if source_bits & ~initial_bits or atoms & ~initial_bits:
                     errors.append(
                         f"連鎖 '{cid}': '{step_id}' の fc={fc} が "
                         f"{predecessor_label} を参照していない"
                     )
-                else:
-                    # 最初の intermediate が source を参照していない
-                    # source が全て initial_confirmed なら fc は initial のみでも可
-                    if not (source_set <= initial and all_fc_refs <= initial):
-                        errors.append(
-                            f"連鎖 '{cid}': '{step_id}' の fc={fc} が "
-                            f"{predecessor_label} を参照していない"
-                        )
 
     return errors
 
 
 def run(path: str) -> tuple[bool, list[str]]:
     data = load_data(path)
+    ix = ChainIndex(data)
 
     # _piece_chains も _tactical_chains もなければスキップ
     has_chains = "_piece_chains" in data or "_tactical_chains" in data
-    has_phase4 = "_phase4" in data and "tactical_chains" in data.get("_phase4", {})
+    has_phase4 = "tactical_chains" in ix.phases.phase(4)  # _phase4 にキーがあれば空でも検証する
     if not has_chains and not has_phase4:
         print("  SKIP: 連鎖メタ情報なし")
         return True, []
@@ -383,7 +406,7 @@ def run(path: str) -> tuple[bool, list[str]]:
 
     all_errors: list[str] = []
     for label, fn in checks:
-        errors = fn(data)
+        errors = fn(ix)
         if errors:
             print(f"  FAIL: {label}")
             for e in errors:
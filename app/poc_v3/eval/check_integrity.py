@@ -2,12 +2,23 @@
 
 data.json の構造的な整合性を検証する。
 v2（descriptors, pieces, clear_conditions）と v3（propositions）の両形式に対応。
+
+ID の索引（命題・ピース・initial_confirmed・reveals）と data_src.json かどうかの判定は
+DataIndex が 1 回の走査でまとめて作る。各チェックは Rule の訪問メソッド
+（on_data / on_descriptor / on_piece / on_question / finish）として実装し、
+validate() が命題 → ピース → 質問の 1 回の走査で全チェックに配る。
+--max-errors N を指定すると、エラーが N 件に達した時点で走査を打ち切る。
 """
 
+from __future__ import annotations
+
+import functools
 import json
 import sys
 from pathlib import Path
 
+from common import option_value
+
 
 REQUIRED_KEYS_V2_DATA = ["id", "title", "statement", "truth", "descriptors", "initial_confirmed", "clear_conditions", "pieces", "questions"]
 REQUIRED_KEYS_V2_SRC = ["title", "descriptors", "initial_confirmed", "clear_conditions", "pieces", "questions"]
@@ -29,16 +40,15 @@ def _is_v3(data: dict) -> bool:
 def _is_src(data: dict) -> bool:
     """data_src.json かどうかを _ プレフィックス付きフィールドの有無で判定"""
     for key in data:
-        if key.startswith("_"):
+        if key[:1] == "_":
             return True
-    collection = "propositions" if _is_v3(data) else "descriptors"
-    for d in data.get(collection, []):
+    for d in _get_descriptors(data):
         for key in d:
-            if key.startswith("_"):
+            if key[:1] == "_":
                 return True
     for q in data.get("questions", []):
         for key in q:
-            if key.startswith("_"):
+            if key[:1] == "_":
                 return True
     return False
 
@@ -48,278 +58,399 @@ def _get_descriptors(data: dict) -> list[dict]:
     return data.get("propositions", data.get("descriptors", []))
 
 
-def check_required_keys(data: dict) -> list[str]:
-    errors = []
-    is_v3 = _is_v3(data)
-    is_src = _is_src(data)
-
-    if is_v3:
-        required = REQUIRED_KEYS_V3_SRC if is_src else REQUIRED_KEYS_V3_DATA
-    else:
-        required = REQUIRED_KEYS_V2_SRC if is_src else REQUIRED_KEYS_V2_DATA
-
-    for key in required:
-        if key not in data:
-            errors.append(f"必須キー '{key}' が存在しない")
-
-    if is_src:
-        has_st = "S" in data and "T" in data
-        has_full = "statement" in data and "truth" in data
-        if not has_st and not has_full:
-            errors.append("問題文/真相キーが不足: (S, T) または (statement, truth) が必要")
-    return errors
-
-
-def check_unique_ids(data: dict) -> list[str]:
-    errors = []
-    is_v3 = _is_v3(data)
-    collections = ["questions"]
-    if is_v3:
-        collections.insert(0, "propositions")
-    else:
-        collections = ["descriptors", "pieces", "questions"]
-
-    for collection_name in collections:
-        items = data.get(collection_name, [])
-        ids = [item["id"] for item in items]
-        seen = set()
-        for id_ in ids:
-            if id_ in seen:
-                errors.append(f"{collection_name} 内で ID '{id_}' が重複")
-            seen.add(id_)
-    return errors
-
-
-def check_initial_confirmed(data: dict) -> list[str]:
-    errors = []
-    descriptor_ids = {d["id"] for d in _get_descriptors(data)}
-    for ref in data.get("initial_confirmed", []):
-        if ref not in descriptor_ids:
-            # v3: S命題は initial_confirmed に含まれるが propositions には含まれないことがある
-            # propositions には分割命題・中間命題のみが含まれる場合がある
-            if not _is_v3(data):
-                errors.append(f"initial_confirmed の '{ref}' が descriptors に存在しない")
-    return errors
-
-
-def check_clear_conditions(data: dict) -> list[str]:
-    if _is_v3(data):
-        return []  # v3 では clear_conditions を使用しない
-    errors = []
-    descriptor_ids = {d["id"] for d in _get_descriptors(data)}
-    clear_conds = data.get("clear_conditions", [])
-    if not clear_conds:
-        errors.append("clear_conditions が空（クリア不可能）")
-        return errors
-    for i, cond_group in enumerate(clear_conds):
-        if not cond_group:
-            errors.append(f"clear_conditions[{i}] が空グループ")
-        for ref in cond_group:
-            if ref not in descriptor_ids:
-                errors.append(f"clear_conditions[{i}] の参照 '{ref}' が descriptors に存在しない")
-    return errors
-
-
-def check_piece_refs(data: dict) -> list[str]:
-    if _is_v3(data):
-        return []  # v3 では pieces を使用しない
-    errors = []
-    descriptor_ids = {d["id"] for d in _get_descriptors(data)}
-    piece_ids = {p["id"] for p in data.get("pieces", [])}
-    for piece in data.get("pieces", []):
+def _get_reveals(q: dict) -> list[str]:
+    """reveals を文字列・リスト両対応でリストとして返す"""
+    r = q.get("reveals", [])
+    if isinstance(r, str):
+        return [r] if r else []
+    return r
+
+
+def _duplicates(ids: list[str]) -> list[str]:
+    seen: set[str] = set()
+    duplicates = []
+    for id_ in ids:
+        if id_ in seen:
+            duplicates.append(id_)
+        seen.add(id_)
+    return duplicates
+
+
+class DataIndex:
+    """全チェックが共有する ID 索引（命題・ピース・質問を 1 回ずつ走査して作る）"""
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.is_v3 = _is_v3(data)
+        self.descriptors = _get_descriptors(data)
+        self.questions = data.get("questions", [])
+        self.pieces = data.get("pieces", [])
+        self.initial = set(data.get("initial_confirmed", []))
+
+        self.is_src = _is_src(data)
+        # ID 集合とコレクションごとの重複 ID（出現順）
+        descriptor_ids = [d["id"] for d in self.descriptors]
+        self.descriptor_ids = set(descriptor_ids)
+        collections = [("propositions" if self.is_v3 else "descriptors", descriptor_ids, self.descriptor_ids)]
+        self.piece_ids: set[str] = set()  # v3 では pieces を使用しない
+        if not self.is_v3:
+            piece_ids = [p["id"] for p in self.pieces]
+            self.piece_ids = set(piece_ids)
+            collections.append(("pieces", piece_ids, self.piece_ids))
+        question_ids = [q["id"] for q in self.questions]
+        collections.append(("questions", question_ids, set(question_ids)))
+        self.duplicates = [
+            (name, id_) for name, ids, unique in collections if len(unique) != len(ids) for id_ in _duplicates(ids)
+        ]
+
+        self.reveals: set[str] = set()
+        for q in self.questions:
+            r = q.get("reveals", [])
+            if isinstance(r, str):
+                if r:
+                    self.reveals.add(r)
+            else:
+                self.reveals.update(r)
+        # v3: initial_confirmed の S 命題も有効な参照先
+        self.valid_ids = self.descriptor_ids | self.initial
+        # 対話上で確立可能な命題
+        self.grounded = self.initial | self.reveals
+
+
+class _ErrorLimit(Exception):
+    """--max-errors に達した"""
+
+
+class _ErrorSink:
+    def __init__(self, max_errors: int | None):
+        self.max_errors = max_errors
+        self.total = 0
+
+    def count(self) -> None:
+        self.total += 1
+        if self.max_errors is not None and self.total >= self.max_errors:
+            raise _ErrorLimit
+
+
+HOOKS = ("on_data", "on_descriptor", "on_piece", "on_question", "finish")
+
+
+class Rule:
+    """1 つのチェック。validate() の走査中に訪問メソッドが呼ばれ、report() でエラーを記録する"""
+
+    label = ""
+    v2_only = False  # v3 では使わない項目（常に PASS）
+
+    def __init__(self, index: DataIndex, sink: _ErrorSink):
+        self.index = index
+        self.sink = sink
+        self.errors: list[str] = []
+        self.notes: list[str] = []  # 判定前に表示する補足
+        self.completed = False  # 最後まで走査したか（打ち切り時は False のまま）
+
+    def report(self, message: str) -> None:
+        self.errors.append(message)
+        self.sink.count()
+
+    def on_data(self, data: dict) -> None:
+        pass
+
+    def on_descriptor(self, d: dict) -> None:
+        pass
+
+    def on_piece(self, piece: dict) -> None:
+        pass
+
+    def on_question(self, q: dict) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+class RequiredKeys(Rule):
+    label = "必須キーの存在"
+
+    def on_data(self, data: dict) -> None:
+        if self.index.is_v3:
+            required = REQUIRED_KEYS_V3_SRC if self.index.is_src else REQUIRED_KEYS_V3_DATA
+        else:
+            required = REQUIRED_KEYS_V2_SRC if self.index.is_src else REQUIRED_KEYS_V2_DATA
+
+        for key in required:
+            if key not in data:
+                self.report(f"必須キー '{key}' が存在しない")
+
+        if self.index.is_src:
+            has_st = "S" in data and "T" in data
+            has_full = "statement" in data and "truth" in data
+            if not has_st and not has_full:
+                self.report("問題文/真相キーが不足: (S, T) または (statement, truth) が必要")
+
+
+class UniqueIds(Rule):
+    label = "ID の一意性"
+
+    def on_data(self, data: dict) -> None:
+        for collection_name, id_ in self.index.duplicates:
+            self.report(f"{collection_name} 内で ID '{id_}' が重複")
+
+
+class InitialConfirmed(Rule):
+    # v3: S命題は initial_confirmed に含まれるが propositions には含まれないことがある
+    # propositions には分割命題・中間命題のみが含まれる場合がある
+    label = "initial_confirmed の妥当性"
+    v2_only = True
+
+    def on_data(self, data: dict) -> None:
+        for ref in data.get("initial_confirmed", []):
+            if ref not in self.index.descriptor_ids:
+                self.report(f"initial_confirmed の '{ref}' が descriptors に存在しない")
+
+
+class ClearConditions(Rule):
+    label = "clear_conditions の妥当性"
+    v2_only = True  # v3 では clear_conditions を使用しない
+
+    def on_data(self, data: dict) -> None:
+        clear_conds = data.get("clear_conditions", [])
+        if not clear_conds:
+            self.report("clear_conditions が空（クリア不可能）")
+            return
+        for i, cond_group in enumerate(clear_conds):
+            if not cond_group:
+                self.report(f"clear_conditions[{i}] が空グループ")
+            for ref in cond_group:
+                if ref not in self.index.descriptor_ids:
+                    self.report(f"clear_conditions[{i}] の参照 '{ref}' が descriptors に存在しない")
+
+
+class PieceRefs(Rule):
+    label = "pieces の参照整合"
+    v2_only = True  # v3 では pieces を使用しない
+
+    def on_piece(self, piece: dict) -> None:
         pid = piece["id"]
+        descriptor_ids = self.index.descriptor_ids
         for mref in piece.get("members", []):
             if mref not in descriptor_ids:
-                errors.append(f"piece '{pid}' の members 参照 '{mref}' が descriptors に存在しない")
+                self.report(f"piece '{pid}' の members 参照 '{mref}' が descriptors に存在しない")
         for trigger_group in piece.get("trigger", []):
             for tref in trigger_group:
                 if tref not in descriptor_ids:
-                    errors.append(f"piece '{pid}' の trigger 参照 '{tref}' が descriptors に存在しない")
+                    self.report(f"piece '{pid}' の trigger 参照 '{tref}' が descriptors に存在しない")
         for dep in piece.get("depends_on", []):
-            if dep not in piece_ids:
-                errors.append(f"piece '{pid}' の depends_on 参照 '{dep}' が pieces に存在しない")
-    return errors
-
-
-def check_formation_refs(data: dict) -> list[str]:
-    errors = []
-    descriptors = _get_descriptors(data)
-    descriptor_ids = {d["id"] for d in descriptors}
-    # v3: initial_confirmed の S 命題も有効な参照先
-    all_valid_ids = descriptor_ids | set(data.get("initial_confirmed", []))
-    for d in descriptors:
-        did = d["id"]
-        for cond_group in d.get("formation_conditions") or []:
-            for ref in cond_group:
-                if ref not in all_valid_ids:
-                    errors.append(f"命題 '{did}' の formation_conditions 参照 '{ref}' が存在しない")
-    return errors
-
-
-def check_entailment_refs(data: dict) -> list[str]:
-    errors = []
-    descriptors = _get_descriptors(data)
-    descriptor_ids = {d["id"] for d in descriptors}
-    all_valid_ids = descriptor_ids | set(data.get("initial_confirmed", []))
-    for d in descriptors:
-        did = d["id"]
-        for cond_group in d.get("entailment_conditions") or []:
-            for ref in cond_group:
-                if ref not in all_valid_ids:
-                    errors.append(f"命題 '{did}' の entailment_conditions 参照 '{ref}' が存在しない")
-    return errors
-
-
-def check_rejection_refs(data: dict) -> list[str]:
-    errors = []
-    descriptors = _get_descriptors(data)
-    descriptor_ids = {d["id"] for d in descriptors}
-    all_valid_ids = descriptor_ids | set(data.get("initial_confirmed", []))
-    for d in descriptors:
-        did = d["id"]
-        for cond_group in d.get("rejection_conditions") or []:
+            if dep not in self.index.piece_ids:
+                self.report(f"piece '{pid}' の depends_on 参照 '{dep}' が pieces に存在しない")
+
+
+class ConditionRefs(Rule):
+    """命題の条件（formation / entailment / rejection）の参照先が存在するか"""
+
+    def __init__(self, index: DataIndex, sink: _ErrorSink, key: str):
+        super().__init__(index, sink)
+        self.key = key
+        self.label = f"{key} の参照整合"
+
+    def on_descriptor(self, d: dict) -> None:
+        valid_ids = self.index.valid_ids
+        for cond_group in d.get(self.key) or []:
+            if valid_ids.issuperset(cond_group):
+                continue
             for ref in cond_group:
-                if ref not in all_valid_ids:
-                    errors.append(f"命題 '{did}' の rejection_conditions 参照 '{ref}' が存在しない")
-    return errors
+                if ref not in valid_ids:
+                    self.report(f"命題 '{d['id']}' の {self.key} 参照 '{ref}' が存在しない")
 
 
-def _get_reveals(q: dict) -> list[str]:
-    """reveals を文字列・リスト両対応でリストとして返す"""
-    r = q.get("reveals", [])
-    if isinstance(r, str):
-        return [r] if r else []
-    return r
+class QuestionRefs(Rule):
+    label = "questions の参照整合"
 
+    def on_question(self, q: dict) -> None:
+        reveals = _get_reveals(q)
+        if self.index.valid_ids.issuperset(reveals):
+            return
+        for ref in reveals:
+            if ref not in self.index.valid_ids:
+                self.report(f"question '{q['id']}' の reveals 参照 '{ref}' が存在しない")
 
-def check_question_refs(data: dict) -> list[str]:
-    errors = []
-    descriptors = _get_descriptors(data)
-    descriptor_ids = {d["id"] for d in descriptors}
-    # v3: initial_confirmed の S 命題も有効な参照先
-    all_valid_ids = descriptor_ids | set(data.get("initial_confirmed", []))
-    for q in data.get("questions", []):
-        qid = q["id"]
-        for ref in _get_reveals(q):
-            if ref not in all_valid_ids:
-                errors.append(f"question '{qid}' の reveals 参照 '{ref}' が存在しない")
-    return errors
 
+class MechanismValues(Rule):
+    label = "mechanism の値域"
+    v2_only = True  # v3 では mechanism を使用しない
 
-def check_mechanism_values(data: dict) -> list[str]:
-    if _is_v3(data):
-        return []  # v3 では mechanism を使用しない
-    errors = []
-    for q in data.get("questions", []):
-        qid = q["id"]
+    def on_question(self, q: dict) -> None:
         mech = q.get("mechanism")
         if mech not in VALID_MECHANISMS:
-            errors.append(f"question '{qid}' の mechanism '{mech}' が不正（有効値: {VALID_MECHANISMS}）")
-    return errors
+            self.report(f"question '{q['id']}' の mechanism '{mech}' が不正（有効値: {VALID_MECHANISMS}）")
+
+
+class PieceDag(Rule):
+    label = "ピース依存の非循環"
+    v2_only = True  # v3 では pieces を使用しない
+
+    def __init__(self, index: DataIndex, sink: _ErrorSink):
+        super().__init__(index, sink)
+        self.pieces: dict[str, list[str]] = {}
+
+    def on_piece(self, piece: dict) -> None:
+        self.pieces[piece["id"]] = piece.get("depends_on", [])
+
+    def finish(self) -> None:
+        pieces = self.pieces
+        independent = [pid for pid, deps in pieces.items() if len(deps) == 0]
+        dependent = [pid for pid, deps in pieces.items() if len(deps) > 0]
+        self.notes.append(f"独立ピース（依存なし）: {independent}")
+        self.notes.append(f"依存ピース: {[f'{pid} → {pieces[pid]}' for pid in dependent]}")
+
+        def has_cycle(node: str, visiting: set, visited: set) -> bool:
+            if node in visiting:
+                return True
+            if node in visited:
+                return False
+            visiting.add(node)
+            for dep in pieces.get(node, []):
+                if has_cycle(dep, visiting, visited):
+                    return True
+            visiting.remove(node)
+            visited.add(node)
+            return False
 
+        visited: set[str] = set()
+        for pid in pieces:
+            if pid not in visited:
+                if has_cycle(pid, set(), visited):
+                    self.report(f"pieces の depends_on に循環が存在する（'{pid}' を含む）")
 
-def check_prerequisites_grounded(data: dict) -> list[str]:
+
+class PrerequisitesGrounded(Rule):
     """前提条件の命題が対話上で確立可能か検証する。"""
-    errors = []
-    initial = set(data.get("initial_confirmed", []))
-    all_reveals = set()
-    for q in data.get("questions", []):
-        for ref in _get_reveals(q):
-            all_reveals.add(ref)
 
-    grounded = initial | all_reveals
+    label = "前提条件の対話上の確立"
 
-    for q in data.get("questions", []):
-        qid = q["id"]
-        for ref in q.get("prerequisites", []):
-            if ref not in grounded:
-                errors.append(
-                    f"question '{qid}' の prerequisites '{ref}' が "
+    def on_question(self, q: dict) -> None:
+        prerequisites = q.get("prerequisites", [])
+        if self.index.grounded.issuperset(prerequisites):
+            return
+        for ref in prerequisites:
+            if ref not in self.index.grounded:
+                self.report(
+                    f"question '{q['id']}' の prerequisites '{ref}' が "
                     f"initial_confirmed にも reveals にも含まれない（導出のみでは前提不成立）"
                 )
-    return errors
 
 
-def check_piece_dag(data: dict) -> list[str]:
-    if _is_v3(data):
-        return []  # v3 では pieces を使用しない
-    errors = []
-    pieces = {p["id"]: p.get("depends_on", []) for p in data.get("pieces", [])}
+def build_rules(index: DataIndex, sink: _ErrorSink) -> list[Rule]:
+    """表示順のチェック一覧"""
+    return [
+        RequiredKeys(index, sink),
+        UniqueIds(index, sink),
+        InitialConfirmed(index, sink),
+        ClearConditions(index, sink),
+        PieceRefs(index, sink),
+        ConditionRefs(index, sink, "formation_conditions"),
+        ConditionRefs(index, sink, "entailment_conditions"),
+        ConditionRefs(index, sink, "rejection_conditions"),
+        QuestionRefs(index, sink),
+        MechanismValues(index, sink),
+        PieceDag(index, sink),
+        PrerequisitesGrounded(index, sink),
+    ]
 
-    independent = [pid for pid, deps in pieces.items() if len(deps) == 0]
-    dependent = [pid for pid, deps in pieces.items() if len(deps) > 0]
-    print(f"    独立ピース（依存なし）: {independent}")
-    print(f"    依存ピース: {[f'{pid} → {pieces[pid]}' for pid in dependent]}")
 
-    def has_cycle(node: str, visiting: set, visited: set) -> bool:
-        if node in visiting:
-            return True
-        if node in visited:
-            return False
-        visiting.add(node)
-        for dep in pieces.get(node, []):
-            if has_cycle(dep, visiting, visited):
-                return True
-        visiting.remove(node)
-        visited.add(node)
-        return False
+@functools.cache
+def _overridden_hooks(cls: type[Rule]) -> tuple[str, ...]:
+    return tuple(name for name in HOOKS if getattr(cls, name) is not getattr(Rule, name))
 
-    visited: set[str] = set()
-    for pid in pieces:
-        if pid not in visited:
-            if has_cycle(pid, set(), visited):
-                errors.append(f"pieces の depends_on に循環が存在する（'{pid}' を含む）")
-    return errors
 
+def validate(data: dict, max_errors: int | None = None) -> tuple[list[Rule], bool]:
+    """全チェックを 1 回の走査で実行する。
 
-def run(path: str) -> tuple[bool, list[str]]:
+    戻り値は (チェック一覧, 最後まで走査したか)。max_errors に達すると打ち切り、
+    その時点までに見つかったエラーだけが各チェックに残る。
+    """
+    index = DataIndex(data)
+    sink = _ErrorSink(max_errors)
+    rules = build_rules(index, sink)
+    active = []
+    for rule in rules:
+        if rule.v2_only and index.is_v3:
+            rule.completed = True
+        else:
+            active.append(rule)
+    # 各訪問メソッドは上書きしているチェックにだけ配る
+    hooks: dict[str, list] = {name: [] for name in HOOKS}
+    for rule in active:
+        for name in _overridden_hooks(type(rule)):
+            hooks[name].append(getattr(rule, name))
+    try:
+        for visit in hooks["on_data"]:
+            visit(data)
+        for name, items in (("on_descriptor", index.descriptors), ("on_piece", index.pieces), ("on_question", index.questions)):
+            visitors = hooks[name]
+            if visitors:
+                for item in items:
+                    for visit in visitors:
+                        visit(item)
+        for visit in hooks["finish"]:
+            visit()
+    except _ErrorLimit:
+        return rules, False
+    for rule in active:
+        rule.completed = True
+    return rules, True
+
+
+def run(path: str, max_errors: int | None = None) -> tuple[bool, list[str]]:
     data = load_data(path)
-    is_v3 = _is_v3(data)
-    fmt = "v3" if is_v3 else "v2"
+    fmt = "v3" if _is_v3(data) else "v2"
     print(f"  形式: {fmt}")
 
-    checks = [
-        ("必須キーの存在", check_required_keys),
-        ("ID の一意性", check_unique_ids),
-        ("initial_confirmed の妥当性", check_initial_confirmed),
-        ("clear_conditions の妥当性", check_clear_conditions),
-        ("pieces の参照整合", check_piece_refs),
-        ("formation_conditions の参照整合", check_formation_refs),
-        ("entailment_conditions の参照整合", check_entailment_refs),
-        ("rejection_conditions の参照整合", check_rejection_refs),
-        ("questions の参照整合", check_question_refs),
-        ("mechanism の値域", check_mechanism_values),
-        ("ピース依存の非循環", check_piece_dag),
-        ("前提条件の対話上の確立", check_prerequisites_grounded),
-    ]
+    rules, completed = validate(data, max_errors)
 
     all_errors: list[str] = []
-    for label, fn in checks:
-        errors = fn(data)
-        if errors:
-            print(f"  FAIL: {label}")
-            for e in errors:
+    for rule in rules:
+        for note in rule.notes:
+            print(f"    {note}")
+        if rule.errors:
+            print(f"  FAIL: {rule.label}")
+            for e in rule.errors:
                 print(f"    - {e}")
-            all_errors.extend(errors)
+            all_errors.extend(rule.errors)
+        elif rule.completed:
+            print(f"  PASS: {rule.label}")
         else:
-            print(f"  PASS: {label}")
+            print(f"  ----: {rule.label}（未完了）")
 
+    if not completed:
+        print(f"  エラーが {max_errors} 件に達したため打ち切り")
     return len(all_errors) == 0, all_errors
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python check_integrity.py <data.json>", file=sys.stderr)
+    max_errors_arg = option_value("--max-errors")
+    paths = [a for a in sys.argv[1:] if not a.startswith("--") and a != max_errors_arg]
+    if not paths:
+        print("Usage: python check_integrity.py <data.json>... [--max-errors N]", file=sys.stderr)
         sys.exit(2)
 
-    path = sys.argv[1]
-    if not Path(path).exists():
-        print(f"Error: {path} が見つかりません", file=sys.stderr)
+    max_errors = int(max_errors_arg) if max_errors_arg else None
+    if max_errors is not None and max_errors < 1:
+        print("Error: --max-errors は 1 以上", file=sys.stderr)
         sys.exit(2)
 
+    for path in paths:
+        if not Path(path).exists():
+            print(f"Error: {path} が見つかりません", file=sys.stderr)
+            sys.exit(2)
+
     print("[check_integrity]")
-    ok, _ = run(path)
-    sys.exit(0 if ok else 1)
+    all_ok = True
+    for path in paths:
+        if len(paths) > 1:
+            print(f"--- {path}")
+        ok, _ = run(path, max_errors)
+        all_ok = all_ok and ok
+    sys.exit(0 if all_ok else 1)
 
 
 if __name__ == "__main__":
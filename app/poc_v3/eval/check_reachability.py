@@ -2,14 +2,22 @@
 
 initial_confirmed 以外の全命題が question の reveals 経由で到達可能かを検証する。
 v2（descriptors, pieces）と v3（propositions）の両形式に対応。
+
+各チェックは ReachabilityAnalysis を受け取る。条件マップ・reveals 集合・導出閉包・
+confirm 可能集合などはこのオブジェクトが初回アクセス時に 1 回だけ計算し、チェック間で共有する。
+--timing を指定するとチェックごとの所要時間を表示する（共有する値は最初に使ったチェックの時間に含まれる）。
 """
 
 from __future__ import annotations
 
 import json
 import sys
+import time
+from functools import cached_property
 from pathlib import Path
 
+from closure import DerivationClosure, get_closure
+
 
 def load_data(path: str) -> dict:
     with open(path, encoding="utf-8") as f:
@@ -45,15 +53,68 @@ def _has_entailment(d: dict) -> bool:
     return d.get("entailment_conditions") is not None
 
 
-def check_base_descriptor_reachability(data: dict) -> list[str]:
+class ReachabilityAnalysis:
+    """1 ファイル分の到達可能性解析。各値は初回アクセス時に 1 回だけ計算する"""
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.is_v3 = _is_v3(data)
+        self.descriptors = _get_descriptors(data)
+        self.questions = data.get("questions", [])
+        self.pieces = data.get("pieces", [])
+        self.initial = set(data.get("initial_confirmed", []))
+
+    @cached_property
+    def revealed(self) -> set[str]:
+        """いずれかの質問の reveals に含まれる命題"""
+        revealed: set[str] = set()
+        for q in self.questions:
+            revealed.update(_get_reveals(q))
+        return revealed
+
+    @cached_property
+    def descriptor_map(self) -> dict[str, dict]:
+        return {d["id"]: d for d in self.descriptors}
+
+    @cached_property
+    def formation_conds(self) -> dict[str, list[list[str]]]:
+        return {d["id"]: d["formation_conditions"] for d in self.descriptors if _has_formation(d)}
+
+    @cached_property
+    def entailment_conds(self) -> dict[str, list[list[str]]]:
+        return {d["id"]: d["entailment_conditions"] for d in self.descriptors if _has_entailment(d)}
+
+    @cached_property
+    def rejection_conds(self) -> dict[str, list[list[str]]]:
+        return {d["id"]: d["rejection_conditions"] for d in self.descriptors if d.get("rejection_conditions") is not None}
+
+    @cached_property
+    def closure(self) -> DerivationClosure:
+        """導出閉包（条件をコンパイルしたもの。allowed ごとの結果は閉包側でメモ化される）"""
+        return get_closure(self.formation_conds, self.entailment_conds, self.rejection_conds or None)
+
+    @cached_property
+    def reachable(self) -> frozenset[str]:
+        """initial ∪ 全 reveals から導出まで含めて到達可能な命題"""
+        return self.closure.closure(self.initial | self.revealed)
+
+    @cached_property
+    def confirmable(self) -> frozenset[str]:
+        """confirmed になりうる命題（initial ∪ 全 reveals から entailment の不動点計算）"""
+        return self.closure.entailed(self.initial | self.revealed)
+
+    def derivable(self, allowed_confirmed: set[str]) -> set[str]:
+        """allowed_confirmed から新たに到達可能な命題"""
+        return set(self.closure.derivable(allowed_confirmed))
+
+
+def check_base_descriptor_reachability(a: ReachabilityAnalysis) -> list[str]:
     """initial_confirmed に含まれない全基礎命題が、いずれかの question の reveals に含まれるか。"""
     errors = []
-    initial = set(data.get("initial_confirmed", []))
-    revealed: set[str] = set()
-    for q in data.get("questions", []):
-        revealed.update(_get_reveals(q))
+    initial = a.initial
+    revealed = a.revealed
 
-    for d in _get_descriptors(data):
+    for d in a.descriptors:
         if not _is_base(d):
             continue
         did = d["id"]
@@ -62,97 +123,24 @@ def check_base_descriptor_reachability(data: dict) -> list[str]:
     return errors
 
 
-def _derivable_descriptors(
-    allowed_confirmed: set[str],
-    formation_conditions: dict[str, list[list[str]]],
-    entailment_conditions: dict[str, list[list[str]]],
-    rejection_conditions: dict[str, list[list[str]]] | None = None,
-) -> set[str]:
-    """allowed_confirmed から到達可能な全命題を求める。"""
-    # Step 1: 論理的導出（不動点計算）
-    confirmed = set(allowed_confirmed)
-    changed = True
-    while changed:
-        changed = False
-        for did, conditions in entailment_conditions.items():
-            if did in confirmed:
-                continue
-            for cond_group in conditions:
-                if all(ref in confirmed for ref in cond_group):
-                    confirmed.add(did)
-                    changed = True
-                    break
-
-    # Step 2: 棄却集合の計算
-    rejected = set()
-    if rejection_conditions:
-        for did, conditions in rejection_conditions.items():
-            if any(all(c in confirmed for c in group) for group in conditions):
-                rejected.add(did)
-
-    # Step 3: 仮説導出（1 回パス）
-    derived = set()
-    for did, conditions in formation_conditions.items():
-        if did in confirmed or did in rejected:
-            continue
-        for cond_group in conditions:
-            if all(ref in confirmed for ref in cond_group):
-                derived.add(did)
-                break
-
-    return (confirmed | derived) - allowed_confirmed
-
-
-def check_proposition_reachability(data: dict) -> list[str]:
+def check_proposition_reachability(a: ReachabilityAnalysis) -> list[str]:
     """v3: 全 propositions が reveals または導出で到達可能か"""
     errors = []
-    initial = set(data.get("initial_confirmed", []))
-    revealed: set[str] = set()
-    for q in data.get("questions", []):
-        revealed.update(_get_reveals(q))
-
-    descriptors = _get_descriptors(data)
-    formation_conds = {d["id"]: d["formation_conditions"] for d in descriptors if _has_formation(d)}
-    entailment_conds = {d["id"]: d["entailment_conditions"] for d in descriptors if _has_entailment(d)}
-    rejection_conds: dict[str, list[list[str]]] = {}
-    for d in descriptors:
-        rc = d.get("rejection_conditions")
-        if rc is not None:
-            rejection_conds[d["id"]] = rc
-
-    derivable = _derivable_descriptors(initial | revealed, formation_conds, entailment_conds, rejection_conds or None)
-    reachable = initial | revealed | derivable
-
-    for d in descriptors:
+    reachable = a.reachable
+    for d in a.descriptors:
         did = d["id"]
         if did not in reachable:
             errors.append(f"命題 '{did}' ({d.get('label', '')}) が到達不能")
     return errors
 
 
-def check_piece_member_reachability(data: dict) -> list[str]:
+def check_piece_member_reachability(a: ReachabilityAnalysis) -> list[str]:
     """v2: 各ピースの members が全て到達可能か。"""
-    if _is_v3(data):
+    if a.is_v3:
         return []
     errors = []
-    initial = set(data.get("initial_confirmed", []))
-    revealed: set[str] = set()
-    for q in data.get("questions", []):
-        revealed.update(_get_reveals(q))
-
-    descriptors = _get_descriptors(data)
-    formation_conds = {d["id"]: d["formation_conditions"] for d in descriptors if _has_formation(d)}
-    entailment_conds = {d["id"]: d["entailment_conditions"] for d in descriptors if _has_entailment(d)}
-    rejection_conds: dict[str, list[list[str]]] = {}
-    for d in descriptors:
-        rc = d.get("rejection_conditions")
-        if rc is not None:
-            rejection_conds[d["id"]] = rc
-
-    derivable = _derivable_descriptors(initial | revealed, formation_conds, entailment_conds, rejection_conds or None)
-    reachable = initial | revealed | derivable
-
-    for piece in data.get("pieces", []):
+    reachable = a.reachable
+    for piece in a.pieces:
         pid = piece["id"]
         for mref in piece.get("members", []):
             if mref not in reachable:
@@ -171,77 +159,99 @@ def _transitive_deps(pid: str, piece_deps: dict[str, set[str]]) -> set[str]:
     return visited
 
 
-def check_availability_scope(data: dict) -> list[str]:
-    """v2: 各ピースの質問利用可能性スコープの検証。"""
-    if _is_v3(data):
+def _topological_pieces(piece_deps: dict[str, set[str]]) -> tuple[list[str], list[str]]:
+    """依存先が先に来るピースの順序と、循環に関わるため順序づけられないピース"""
+    dependents: dict[str, list[str]] = {}
+    waiting: dict[str, int] = {}
+    for pid, deps in piece_deps.items():
+        known = [dep for dep in deps if dep in piece_deps]
+        waiting[pid] = len(known)
+        for dep in known:
+            dependents.setdefault(dep, []).append(pid)
+    order = [pid for pid, n in waiting.items() if n == 0]
+    for pid in order:
+        for child in dependents.get(pid, []):
+            waiting[child] -= 1
+            if waiting[child] == 0:
+                order.append(child)
+    ordered = set(order)
+    return order, [pid for pid in piece_deps if pid not in ordered]
+
+
+def check_availability_scope(a: ReachabilityAnalysis) -> list[str]:
+    """v2: 各ピースの質問利用可能性スコープの検証。
+
+    ピースのスコープは initial ∪ 自身と推移的な依存先の構成命題（trigger を含む）。
+    依存先のスコープは自身のスコープの部分集合なので、依存先から順に（トポロジカル順）
+    閉包を求め、各ピースの閉包は依存先の閉包の論理的導出から差分で計算する。
+    依存が循環しているピースだけは推移的な依存先を辿って一から計算する。
+    """
+    if a.is_v3:
         return []
     errors = []
-    initial = set(data.get("initial_confirmed", []))
-
-    descriptor_to_piece: dict[str, str] = {}
-    for piece in data.get("pieces", []):
-        for mid in piece.get("members", []):
-            descriptor_to_piece[mid] = piece["id"]
+    closure = a.closure
 
-    piece_deps = {p["id"]: set(p.get("depends_on", [])) for p in data.get("pieces", [])}
+    piece_deps = {p["id"]: set(p.get("depends_on", [])) for p in a.pieces}
     piece_members: dict[str, set[str]] = {}
-    for p in data.get("pieces", []):
+    for p in a.pieces:
         ids = set(p.get("members", []))
         for group in p.get("trigger", []):
             ids.update(group)
         piece_members[p["id"]] = ids
 
-    reveals_map: dict[str, list[dict]] = {}
-    for q in data.get("questions", []):
-        for did in _get_reveals(q):
-            reveals_map.setdefault(did, []).append(q)
-
-    descriptors = _get_descriptors(data)
-    formation_conds = {d["id"]: d["formation_conditions"] for d in descriptors if _has_formation(d)}
-    entailment_conds = {d["id"]: d["entailment_conditions"] for d in descriptors if _has_entailment(d)}
-    rejection_conds: dict[str, list[list[str]]] = {}
-    for d in descriptors:
-        rejc = d.get("rejection_conditions")
-        if rejc is not None:
-            rejection_conds[d["id"]] = rejc
-
-    for piece in data.get("pieces", []):
-        pid = piece["id"]
-        deps = _transitive_deps(pid, piece_deps)
-
-        allowed_confirmed = set(initial)
-        allowed_confirmed.update(piece_members.get(pid, set()))
-        for dep_pid in deps:
+    # ピース → (スコープの許可集合ビット, 閉包ビット)
+    initial_bits = closure.encode(a.initial)
+    scopes: dict[str, tuple[int, int]] = {}
+    order, cyclic = _topological_pieces(piece_deps)
+    for pid in order:
+        allowed_bits = initial_bits | closure.encode(piece_members[pid])
+        bases = []
+        for dep in piece_deps[pid]:
+            if dep in scopes:
+                allowed_bits |= scopes[dep][0]
+                bases.append(scopes[dep][0])
+        scopes[pid] = (allowed_bits, closure.closure_bits(allowed_bits, bases=bases))
+    for pid in cyclic:
+        allowed_confirmed = set(a.initial)
+        allowed_confirmed.update(piece_members[pid])
+        for dep_pid in _transitive_deps(pid, piece_deps):
             allowed_confirmed.update(piece_members.get(dep_pid, set()))
+        allowed_bits = closure.encode(allowed_confirmed)
+        scopes[pid] = (allowed_bits, closure.closure_bits(allowed_bits))
 
-        derivable = _derivable_descriptors(allowed_confirmed, formation_conds, entailment_conds, rejection_conds or None)
-        allowed = allowed_confirmed | derivable
+    # reveals 先 → (質問 ID, 利用可能条件の fc, fc のグループごとのビット)
+    reveals_map: dict[str, list[tuple[str, list[list[str]], list[int]]]] = {}
+    for q in a.questions:
+        fc = _get_availability_fc(q, a.descriptor_map)
+        if not fc:
+            continue
+        entry = (q["id"], fc, [closure.encode(group) for group in fc])
+        for did in _get_reveals(q):
+            reveals_map.setdefault(did, []).append(entry)
 
-        d_lookup = {dd["id"]: dd for dd in descriptors}
+    for piece in a.pieces:
+        pid = piece["id"]
+        allowed_bits = scopes[pid][1]
+        allowed = None
         for mid in piece.get("members", []):
-            for q in reveals_map.get(mid, []):
-                qid = q["id"]
-                fc = _get_availability_fc(q, d_lookup)
-                if not fc:
+            for qid, fc, groups in reveals_map.get(mid, []):
+                if any(g & allowed_bits == g for g in groups):
                     continue
-                has_valid_group = any(
-                    all(ref in allowed for ref in cond_group)
-                    for cond_group in fc
+                if allowed is None:
+                    allowed = closure.decode(allowed_bits)
+                out_of_scope = []
+                for i, cond_group in enumerate(fc):
+                    for ref in cond_group:
+                        if ref not in allowed:
+                            out_of_scope.append(f"[{i}]:'{ref}'")
+                errors.append(
+                    f"ピース '{pid}': question '{qid}' の "
+                    f"reveals 先の fc にスコープ内のグループがない（スコープ外: {', '.join(out_of_scope)}）"
                 )
-                if not has_valid_group:
-                    out_of_scope = []
-                    for i, cond_group in enumerate(fc):
-                        for ref in cond_group:
-                            if ref not in allowed:
-                                out_of_scope.append(f"[{i}]:'{ref}'")
-                    errors.append(
-                        f"ピース '{pid}': question '{qid}' の "
-                        f"reveals 先の fc にスコープ内のグループがない（スコープ外: {', '.join(out_of_scope)}）"
-                    )
     return errors
 
 
-def check_confirmability(data: dict) -> list[str]:
+def check_confirmability(a: ReachabilityAnalysis) -> list[str]:
     """v3: 全命題が confirm 可能かを検証する。
 
     命題が confirmed になる手段は以下のみ:
@@ -251,34 +261,13 @@ def check_confirmability(data: dict) -> list[str]:
 
     上記いずれにも該当しない命題は永遠に confirmed にならない。
     """
-    if not _is_v3(data):
+    if not a.is_v3:
         return []
 
     errors = []
-    initial = set(data.get("initial_confirmed", []))
-
-    revealable: set[str] = set()
-    for q in data.get("questions", []):
-        revealable.update(_get_reveals(q))
-
-    descriptors = _get_descriptors(data)
-    entailment_conds = {d["id"]: d["entailment_conditions"] for d in descriptors if _has_entailment(d)}
-
-    # initial + 全 reveals から entailment の不動点計算
-    confirmable = initial | revealable
-    changed = True
-    while changed:
-        changed = False
-        for did, conds in entailment_conds.items():
-            if did in confirmable:
-                continue
-            for cond_group in conds:
-                if all(c in confirmable for c in cond_group):
-                    confirmable.add(did)
-                    changed = True
-                    break
-
-    for d in descriptors:
+    confirmable = a.confirmable
+
+    for d in a.descriptors:
         did = d["id"]
         if did in confirmable:
             continue
@@ -294,15 +283,13 @@ def check_confirmability(data: dict) -> list[str]:
     return errors
 
 
-def check_orphan_descriptors(data: dict) -> list[str]:
+def check_orphan_descriptors(a: ReachabilityAnalysis) -> list[str]:
     """孤立基礎命題の検出。"""
     warnings = []
-    initial = set(data.get("initial_confirmed", []))
-    revealed: set[str] = set()
-    for q in data.get("questions", []):
-        revealed.update(_get_reveals(q))
+    initial = a.initial
+    revealed = a.revealed
 
-    for d in _get_descriptors(data):
+    for d in a.descriptors:
         if not _is_base(d):
             continue
         did = d["id"]
@@ -332,38 +319,18 @@ def _get_availability_fc(q: dict, descriptor_map: dict) -> list[list[str]] | Non
     return d.get("formation_conditions")
 
 
-def check_formation_reachability_v3(data: dict) -> list[str]:
+def check_formation_reachability_v3(a: ReachabilityAnalysis) -> list[str]:
     """v3: 各質問の利用可能条件が confirmed 可能な命題で構成されているか。
 
     エンジン (engine.py) は質問のオープン判定を confirmed のみで行う。
     fc 条件の命題が confirmable でなければ質問は永遠にオープンしない。
     """
     errors = []
-    initial = set(data.get("initial_confirmed", []))
-
     # confirmable = confirmed になりうる命題集合
-    revealable: set[str] = set()
-    for q in data.get("questions", []):
-        revealable.update(_get_reveals(q))
-
-    descriptors = _get_descriptors(data)
-    descriptor_map = {d["id"]: d for d in descriptors}
-    entailment_conds = {d["id"]: d["entailment_conditions"] for d in descriptors if _has_entailment(d)}
-
-    confirmable = initial | revealable
-    changed = True
-    while changed:
-        changed = False
-        for did, conds in entailment_conds.items():
-            if did in confirmable:
-                continue
-            for cond_group in conds:
-                if all(c in confirmable for c in cond_group):
-                    confirmable.add(did)
-                    changed = True
-                    break
-
-    for q in data.get("questions", []):
+    confirmable = a.confirmable
+    descriptor_map = a.descriptor_map
+
+    for q in a.questions:
         qid = q["id"]
         fc = _get_availability_fc(q, descriptor_map)
         if not fc:
@@ -384,11 +351,11 @@ def check_formation_reachability_v3(data: dict) -> list[str]:
     return errors
 
 
-def run(path: str) -> tuple[bool, list[str]]:
+def run(path: str, timing: bool = False) -> tuple[bool, list[str]]:
     data = load_data(path)
-    is_v3 = _is_v3(data)
+    analysis = ReachabilityAnalysis(data)
 
-    if is_v3:
+    if analysis.is_v3:
         checks = [
             ("命題の到達可能性", check_proposition_reachability),
             ("命題の confirm 可能性", check_confirmability),
@@ -404,22 +371,29 @@ def run(path: str) -> tuple[bool, list[str]]:
         ]
 
     all_errors: list[str] = []
+    total = 0.0
     for label, fn in checks:
-        errors = fn(data)
+        start = time.perf_counter()
+        errors = fn(analysis)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        suffix = f" ({elapsed * 1e3:.2f} ms)" if timing else ""
         if errors:
-            print(f"  FAIL: {label}")
+            print(f"  FAIL: {label}{suffix}")
             for e in errors:
                 print(f"    - {e}")
             all_errors.extend(errors)
         else:
-            print(f"  PASS: {label}")
+            print(f"  PASS: {label}{suffix}")
+    if timing:
+        print(f"  計: {total * 1e3:.2f} ms")
 
     return len(all_errors) == 0, all_errors
 
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python check_reachability.py <data.json>", file=sys.stderr)
+        print("Usage: python check_reachability.py <data.json> [--timing]", file=sys.stderr)
         sys.exit(2)
 
     path = sys.argv[1]
@@ -428,7 +402,7 @@ def main():
         sys.exit(2)
 
     print("[check_reachability]")
-    ok, _ = run(path)
+    ok, _ = run(path, timing="--timing" in sys.argv)
     sys.exit(0 if ok else 1)
 
 
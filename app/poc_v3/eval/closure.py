@@ -0,0 +1,230 @@
+"""導出閉包サービス（v3）
+
+「許可集合（allowed）から到達可能な命題」の計算を 1 か所に集約する。
+条件はパズルごとに 1 回だけビットマスクへコンパイルし、内容の指紋をキーに
+モジュール内でキャッシュする。結果は allowed の正準ビットセットをキーにメモ化する。
+常駐プロセス（watch.py）でも増え続けないよう、キャッシュとメモはどちらも件数に上限を設け、
+最も長く使われていないものから捨てる。
+
+v3 の 2 段階導出:
+1. 論理的導出（entailment）: confirmed → confirmed の不動点計算
+2. 棄却集合の計算（rejection_conditions が confirmed で満たされるもの）
+3. 仮説導出（formation）: confirmed → derived の 1 回パス（棄却済みを除く）
+
+base（複数なら bases）に既に問い合わせた部分集合を渡すと、その論理的導出の結果から
+不動点計算を再開する。
+論理的導出は単調なので結果は変わらない（棄却・仮説導出は毎回 confirmed から計算し直す）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from collections.abc import Iterable
+
+_MAX_CLOSURES = 128
+_MAX_MEMO = 1 << 16  # 1 閉包あたりのメモ（閉包・decode 結果それぞれ）の上限
+
+
+def _remember(cache: dict, key, value, limit: int) -> None:
+    """cache に追加する（上限に達していれば最も長く使われていないものを捨てる）"""
+    if len(cache) >= limit:
+        del cache[next(iter(cache))]
+    cache[key] = value
+
+
+class DerivationClosure:
+    """1 パズル分の導出条件をコンパイルし、閉包をメモ化して返す"""
+
+    def __init__(
+        self,
+        formation_conditions: dict[str, list[list[str]]],
+        entailment_conditions: dict[str, list[list[str]]],
+        rejection_conditions: dict[str, list[list[str]]] | None = None,
+    ):
+        self.ids: list[str] = []
+        self.index: dict[str, int] = {}
+        self._entailment = self._compile(entailment_conditions)
+        self._rejection = self._compile(rejection_conditions or {})
+        self._formation = self._compile(formation_conditions)
+
+        # allowed ビット → (論理的導出ビット, 閉包ビット)
+        self._memo: dict[int, tuple[int, int]] = {}
+        self._decoded: dict[int, frozenset[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.extended = 0
+
+    def _compile(self, conditions: dict[str, list[list[str]]]) -> list[tuple[int, list[int]]]:
+        return [(self._bit(did), [self.encode(g) for g in groups]) for did, groups in conditions.items()]
+
+    # --- ビットセット ---
+
+    def _bit(self, id_: str) -> int:
+        """ID のビットを返す（未知の ID には遅延的に番号を振る）"""
+        idx = self.index.get(id_)
+        if idx is None:
+            idx = len(self.ids)
+            self.ids.append(id_)
+            self.index[id_] = idx
+        return 1 << idx
+
+    def encode(self, members: Iterable[str]) -> int:
+        bits = 0
+        for id_ in members:
+            bits |= self._bit(id_)
+        return bits
+
+    def decode(self, bits: int) -> frozenset[str]:
+        result = self._decoded.pop(bits, None)
+        if result is not None:
+            self._decoded[bits] = result  # 最近使ったものとして末尾に移す
+        else:
+            ids = []
+            rest = bits
+            while rest:
+                low = rest & -rest
+                ids.append(self.ids[low.bit_length() - 1])
+                rest ^= low
+            result = frozenset(ids)
+            _remember(self._decoded, bits, result, _MAX_MEMO)
+        return result
+
+    # --- 閉包 ---
+
+    def _entail(self, confirmed: int) -> int:
+        changed = True
+        while changed:
+            changed = False
+            for bit, groups in self._entailment:
+                if confirmed & bit:
+                    continue
+                if any(confirmed & g == g for g in groups):
+                    confirmed |= bit
+                    changed = True
+        return confirmed
+
+    def closure_bits(self, allowed: int, base: int | None = None, bases: Iterable[int] = ()) -> int:
+        """confirmed ∪ derived のビットセット（allowed を含む）
+
+        base / bases は allowed の部分集合として既に問い合わせた許可集合。
+        それぞれの論理的導出の結果を合わせた所から不動点計算を再開する。
+        """
+        cached = self._memo.pop(allowed, None)
+        if cached is not None:
+            self._memo[allowed] = cached
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+
+        start = allowed
+        extended = False
+        for b in (base, *bases) if base is not None else bases:
+            if b & allowed == b:
+                prior = self._memo.get(b)
+                if prior is not None:
+                    start |= prior[0]
+                    extended = True
+        if extended:
+            self.extended += 1
+        confirmed = self._entail(start)
+
+        rejected = 0
+        for bit, groups in self._rejection:
+            if any(confirmed & g == g for g in groups):
+                rejected |= bit
+
+        derived = 0
+        for bit, groups in self._formation:
+            if confirmed & bit or rejected & bit:
+                continue
+            if any(confirmed & g == g for g in groups):
+                derived |= bit
+
+        known = confirmed | derived
+        _remember(self._memo, allowed, (confirmed, known), _MAX_MEMO)
+        return known
+
+    def closure(self, allowed: Iterable[str], base: Iterable[str] | None = None) -> frozenset[str]:
+        """allowed から到達可能な命題（allowed を含む）"""
+        base_bits = None if base is None else self.encode(base)
+        return self.decode(self.closure_bits(self.encode(allowed), base_bits))
+
+    def derivable(self, allowed: Iterable[str], base: Iterable[str] | None = None) -> frozenset[str]:
+        """allowed から新たに到達可能な命題（allowed を除く）"""
+        allowed_bits = self.encode(allowed)
+        base_bits = None if base is None else self.encode(base)
+        return self.decode(self.closure_bits(allowed_bits, base_bits) & ~allowed_bits)
+
+    def entailed(self, allowed: Iterable[str]) -> frozenset[str]:
+        """allowed から論理的導出だけで confirmed になる命題（allowed を含む）"""
+        allowed_bits = self.encode(allowed)
+        self.closure_bits(allowed_bits)
+        return self.decode(self._memo[allowed_bits][0])
+
+    # --- 統計 ---
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "extended": self.extended,
+            "hit_rate": round(self.hit_rate, 4),
+            "cached": len(self._memo),
+        }
+
+
+_CLOSURES: dict[str, DerivationClosure] = {}
+
+
+def _fingerprint(*conditions: dict | None) -> str:
+    """条件の内容に対する指紋（id が null の命題を含む壊れたデータでも落ちない）
+
+    >>> _fingerprint({None: [["I1"]], "P1": [["I1"]]}, None) == _fingerprint({"P1": [["I1"]], None: [["I1"]]}, {})
+    True
+    """
+    payload = json.dumps([sorted(map(repr, (c or {}).items())) for c in conditions], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def get_closure(
+    formation_conditions: dict[str, list[list[str]]],
+    entailment_conditions: dict[str, list[list[str]]],
+    rejection_conditions: dict[str, list[list[str]]] | None = None,
+) -> DerivationClosure:
+    """条件の内容が同じなら同じ DerivationClosure を返す（パズルごとに 1 回コンパイル）"""
+    key = _fingerprint(formation_conditions, entailment_conditions, rejection_conditions)
+    closure = _CLOSURES.pop(key, None)
+    if closure is not None:
+        _CLOSURES[key] = closure  # 最近使ったものとして末尾に移す
+    else:
+        closure = DerivationClosure(formation_conditions, entailment_conditions, rejection_conditions)
+        _remember(_CLOSURES, key, closure, _MAX_CLOSURES)
+    return closure
+
+
+def closure_stats() -> dict:
+    """キャッシュ中の全閉包の統計を合算する"""
+    hits = sum(c.hits for c in _CLOSURES.values())
+    misses = sum(c.misses for c in _CLOSURES.values())
+    total = hits + misses
+    return {
+        "puzzles": len(_CLOSURES),
+        "hits": hits,
+        "misses": misses,
+        "extended": sum(c.extended for c in _CLOSURES.values()),
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+    }
+
+
+def format_stats() -> str:
+    s = closure_stats()
+    return (
+        f"[closure] 閉包キャッシュ: hit {s['hits']} / miss {s['misses']} "
+        f"(hit率 {s['hit_rate']:.1%}, 差分拡張 {s['extended']}, 条件セット {s['puzzles']})"
+    )
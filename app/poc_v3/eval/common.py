@@ -0,0 +1,57 @@
+"""評価スクリプト共通モジュール (v3)
+
+コマンドライン引数の読み取り・データファイルの探索・プロセスプールでの一括処理・
+一時ファイル経由の書き出しをまとめる。
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TextIO
+
+
+def option_value(name: str) -> str | None:
+    """コマンドライン引数 name の次の値（なければ None）"""
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv):
+            return sys.argv[idx + 1]
+    return None
+
+
+def discover(roots: list[Path], names: Iterable[str]) -> list[Path]:
+    """roots 以下のファイル名が names のいずれかのファイル（ファイルを直接指定してもよい）"""
+    found: list[Path] = []
+    for root in roots:
+        if root.is_file():
+            found.append(root)
+            continue
+        for name in names:
+            found.extend(root.rglob(name))
+    return sorted(set(found))
+
+
+def parallel_map(fn: Callable, items: list, jobs: int) -> list:
+    """items の各要素に fn を適用した結果（2 件以上かつ jobs > 1 ならプロセスプールで並列に）"""
+    if len(items) > 1 and jobs > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(items))) as pool:
+            return list(pool.map(fn, items))
+    return [fn(item) for item in items]
+
+
+@contextmanager
+def atomic_write(path: str | Path) -> Iterator[TextIO]:
+    """path に一時ファイルから置き換える形で書き出す（途中で失敗しても書きかけの path を残さない）"""
+    path = Path(path)
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            yield f
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
@@ -0,0 +1,200 @@
+"""到達可能状態グラフの探索と行き詰まり検出（v3）
+
+available_questions / answer_question で到達できる全状態を BFS で列挙する。
+状態は (confirmed, answered) のビットセット組で同一視し、整数 ID と配列で保持する
+（数百万状態でもタプルや集合を状態ごとに持たない）。
+
+- 行き詰まり: 利用可能な質問がなく、クリアもしていない状態
+- 各行き詰まりへの最短経路（BFS 木の親をたどって復元）
+- ランダムウォーク（各手で利用可能な質問を一様に選ぶ）のうち行き詰まりに至る割合
+
+クリアした状態は終端として展開しない。
+"""
+
+from __future__ import annotations
+
+import random
+import sys
+import time
+from array import array
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from bitstate import BitRules, BitState  # noqa: E402
+from common import option_value  # noqa: E402
+from compiled import load_compiled  # noqa: E402
+from engine import PuzzleData, init_game  # noqa: E402
+
+DEFAULT_WALKS = 1000
+DEFAULT_SHOW = 20
+
+
+class StateGraph:
+    """BFS で構築した到達可能状態グラフ。
+
+    状態 ID i の keys[i] は confirmed と answered を 1 つの整数に詰めたもの
+    （下位 width ビットが answered）。parent[i] / parent_question[i] が BFS 木の親と
+    遷移質問の位置、depth[i] が最短手数。
+    """
+
+    def __init__(self, rules: BitRules):
+        self.rules = rules
+        self.width = len(rules.question_ids)
+        self.mask = (1 << self.width) - 1
+        self.keys: list[int] = []
+        self.parent = array("l")
+        self.parent_question = array("l")
+        self.depth = array("l")
+        self.seen: set[int] = set()  # 登録済みの keys
+        self.edges = 0
+        self.clear: list[int] = []
+        self.dead_ends: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def state(self, sid: int) -> tuple[int, int]:
+        """(confirmed, answered)"""
+        key = self.keys[sid]
+        return key >> self.width, key & self.mask
+
+    def add(self, confirmed: int, answered: int, parent: int, question: int, depth: int) -> bool:
+        """状態を登録する（登録済みなら何もしない）。新規登録なら True"""
+        key = confirmed << self.width | answered
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        self.keys.append(key)
+        self.parent.append(parent)
+        self.parent_question.append(question)
+        self.depth.append(depth)
+        return True
+
+    def path(self, sid: int) -> list[str]:
+        """初期状態から sid までの最短の質問列"""
+        qids = []
+        while self.parent[sid] >= 0:
+            qids.append(self.rules.question_ids[self.parent_question[sid]])
+            sid = self.parent[sid]
+        return qids[::-1]
+
+
+def explore(puzzle: PuzzleData, max_states: int | None = None) -> tuple[StateGraph, bool]:
+    """到達可能状態を BFS で列挙する。
+
+    戻り値: (状態グラフ, 全状態を列挙し終えたか)
+    """
+    rules = BitRules(puzzle)
+    graph = StateGraph(rules)
+    start = BitState.from_game_state(init_game(puzzle), puzzle.index)
+    graph.add(start.confirmed, start.answered, -1, -1, 0)
+
+    # 数百万状態を回すため、内側のループでは属性参照を避けてローカル変数で追記する
+    width, mask = graph.width, graph.mask
+    keys, seen = graph.keys, graph.seen
+    parents, parent_questions, depths = graph.parent, graph.parent_question, graph.depth
+    is_clear = rules.is_clear
+
+    sid = 0
+    while sid < len(keys):
+        key = keys[sid]
+        confirmed, answered = key >> width, key & mask
+        if is_clear(confirmed):
+            graph.clear.append(sid)
+        else:
+            moves = rules.moves(confirmed)
+            depth = depths[sid] + 1
+            expanded = 0
+            for i, qbit, after in moves:
+                if answered & qbit:
+                    continue
+                expanded += 1
+                succ = after << width | answered | qbit
+                if succ not in seen:
+                    seen.add(succ)
+                    keys.append(succ)
+                    parents.append(sid)
+                    parent_questions.append(i)
+                    depths.append(depth)
+            if not expanded:
+                graph.dead_ends.append(sid)
+            graph.edges += expanded
+            if max_states is not None and len(keys) >= max_states:
+                return graph, False
+        sid += 1
+    return graph, True
+
+
+def random_walks(rules: BitRules, start: BitState, walks: int, seed: int = 0) -> dict[str, int]:
+    """利用可能な質問を一様に選び続けるランダムウォークの結末を数える"""
+    rng = random.Random(seed)
+    outcome = {"clear": 0, "dead_end": 0}
+    for _ in range(walks):
+        confirmed, answered = start.confirmed, start.answered
+        while not rules.is_clear(confirmed):
+            moves = rules.available(confirmed, answered)
+            if not moves:
+                outcome["dead_end"] += 1
+                break
+            confirmed, answered = rules.answer(confirmed, answered, rng.choice(moves))
+        else:
+            outcome["clear"] += 1
+    return outcome
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(
+            "Usage: python explore_states.py <data.json> "
+            "[--max-states N] [--walks N] [--seed N] [--show N]",
+            file=sys.stderr,
+        )
+        sys.exit(2)
+
+    path = sys.argv[1]
+    if not Path(path).exists():
+        print(f"Error: {path} が見つかりません", file=sys.stderr)
+        sys.exit(2)
+
+    max_states = option_value("--max-states")
+    walks = int(option_value("--walks") or DEFAULT_WALKS)
+    seed = int(option_value("--seed") or 0)
+    show = int(option_value("--show") or DEFAULT_SHOW)
+
+    puzzle = load_compiled(path).puzzle
+
+    start_time = time.perf_counter()
+    graph, complete = explore(puzzle, int(max_states) if max_states else None)
+    elapsed = time.perf_counter() - start_time
+
+    note = "" if complete else f"（--max-states {max_states} で打ち切り）"
+    print(f"[explore_states] 到達可能状態: {len(graph)}{note} / 遷移: {graph.edges} ({elapsed:.2f} 秒)")
+    print(f"  最大深さ: {max(graph.depth)}")
+    print(f"  クリア状態: {len(graph.clear)}")
+    print(f"  行き詰まり状態: {len(graph.dead_ends)}")
+
+    if graph.dead_ends:
+        print()
+        print("  行き詰まりへの最短経路:")
+        index = puzzle.index
+        for sid in sorted(graph.dead_ends, key=lambda s: graph.depth[s])[:show]:
+            path_ids = graph.path(sid)
+            confirmed = sorted(index.props.decode(graph.state(sid)[0]))
+            print(f"    ({len(path_ids)}問) {' → '.join(path_ids) or '（初期状態）'}")
+            print(f"      confirmed: {confirmed}")
+        if len(graph.dead_ends) > show:
+            print(f"    …ほか {len(graph.dead_ends) - show} 状態")
+
+    if walks > 0:
+        start = BitState.from_game_state(init_game(puzzle), puzzle.index)
+        outcome = random_walks(graph.rules, start, walks, seed)
+        ratio = outcome["dead_end"] / walks
+        print()
+        print(f"  ランダムウォーク {walks} 回: クリア {outcome['clear']} / 行き詰まり {outcome['dead_end']} ({ratio:.1%})")
+
+    sys.exit(1 if graph.dead_ends else 0)
+
+
+if __name__ == "__main__":
+    main()
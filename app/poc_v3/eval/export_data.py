@@ -1,12 +1,47 @@
 """data_src.json → data.json 整形スクリプト
 
 _ プレフィックスのフィールドを除去して data.json を出力する。
+除去・必須フィールドの補完・reveals の正規化は 1 回の走査で行う（clean_puzzle）。
+
+複数のファイル・ディレクトリを渡すと、ディレクトリ以下の data_src.json もまとめて
+プロセスプールで並列に書き出す。--bundle を付けると、書き出した全パズルを
+アプリが一度に読み込めるバンドル（1 行の JSON。ID は共有の文字列表の添字に置き換える）にまとめる。
 """
 
+from __future__ import annotations
+
 import json
 import sys
+from collections import Counter
 from pathlib import Path
 
+from common import atomic_write, discover, option_value, parallel_map
+
+SOURCE_NAME = "data_src.json"
+
+# 命題に必須のフィールド（Swift Codable 互換）
+PROP_DEFAULTS = {
+    "negation_of": None,
+    "entailment_conditions": None,
+    "formation_conditions": None,
+    "rejection_conditions": None,
+}
+
+# data_src の短縮キー → エンジン互換のキー
+SHORT_KEYS = (("S", "statement"), ("T", "truth"))
+
+BUNDLE_FORMAT = 1
+
+# バンドル内で ID を参照するフィールド（"" はトップレベル）。値の文字列を ids の添字に置き換える
+ID_FIELDS = {
+    "": ("initial_confirmed", "clear_conditions"),
+    "propositions": ("id", "negation_of", "formation_conditions", "entailment_conditions", "rejection_conditions"),
+    "descriptors": ("id",),
+    "pieces": ("id", "members", "trigger", "depends_on"),
+    "questions": ("id", "reveals", "prerequisites", "recall_conditions", "topic_category"),
+    "topic_categories": ("id",),
+}
+
 
 def strip_underscore_fields(obj):
     """再帰的に _ プレフィックスのキーを除去する"""
@@ -17,62 +52,197 @@ def strip_underscore_fields(obj):
     return obj
 
 
-def export(src_path: str) -> str:
-    """data_src.json を読み込み、_ フィールドを除去した data.json を出力する。
-
-    戻り値: 出力先パス
-    """
-    src = Path(src_path)
-    with open(src, encoding="utf-8") as f:
-        data = json.load(f)
-
-    cleaned = strip_underscore_fields(data)
-
-    # 命題に必須フィールドを補完（Swift Codable 互換）
-    PROP_DEFAULTS = {
-        "negation_of": None,
-        "entailment_conditions": None,
-        "formation_conditions": None,
-        "rejection_conditions": None,
-    }
-    for prop in cleaned.get("propositions", []):
+def _clean_proposition(prop):
+    cleaned = strip_underscore_fields(prop)
+    if isinstance(cleaned, dict):
         for key, default in PROP_DEFAULTS.items():
-            if key not in prop:
-                prop[key] = default
-
-    # reveals: str → [str] 変換（v6 は str 型、アプリ DTO は配列型）
-    for q in cleaned.get("questions", []):
-        if isinstance(q.get("reveals"), str):
-            q["reveals"] = [q["reveals"]] if q["reveals"] else []
+            cleaned.setdefault(key, default)
+    return cleaned
+
+
+def _clean_question(q):
+    if not isinstance(q, dict):
+        return strip_underscore_fields(q)
+    cleaned = {}
+    for key, value in q.items():
+        if key.startswith("_"):
+            continue
+        # reveals: str → [str] 変換（v6 は str 型、アプリ DTO は配列型）
+        if key == "reveals" and isinstance(value, str):
+            cleaned[key] = [value] if value else []
+        else:
+            cleaned[key] = strip_underscore_fields(value)
+    return cleaned
+
+
+def clean_puzzle(data: dict) -> dict:
+    """_ フィールドの除去・命題の必須フィールドの補完・reveals の正規化を 1 回の走査で行う"""
+    cleaned = {}
+    for key, value in data.items():
+        if key.startswith("_"):
+            continue
+        if key == "propositions" and isinstance(value, list):
+            cleaned[key] = [_clean_proposition(p) for p in value]
+        elif key == "questions" and isinstance(value, list):
+            cleaned[key] = [_clean_question(q) for q in value]
+        else:
+            cleaned[key] = strip_underscore_fields(value)
 
     # data_src の短縮キーをエンジン互換に変換
-    if "S" in cleaned and "statement" not in cleaned:
-        cleaned["statement"] = cleaned.pop("S")
-    if "T" in cleaned and "truth" not in cleaned:
-        cleaned["truth"] = cleaned.pop("T")
+    for short, full in SHORT_KEYS:
+        if short in cleaned and full not in cleaned:
+            cleaned[full] = cleaned.pop(short)
     if "id" not in cleaned and "title" in cleaned:
         cleaned["id"] = cleaned["title"]
+    return cleaned
+
+
+def _export(src_path: str) -> tuple[str, dict]:
+    src = Path(src_path)
+    with open(src, encoding="utf-8") as f:
+        data = json.load(f)
+
+    cleaned = clean_puzzle(data)
 
     dst = src.parent / "data.json"
     with open(dst, "w", encoding="utf-8") as f:
         json.dump(cleaned, f, ensure_ascii=False, indent=2)
         f.write("\n")
 
-    return str(dst)
+    return str(dst), cleaned
+
+
+def export(src_path: str) -> str:
+    """data_src.json を読み込み、_ フィールドを除去した data.json を出力する。
+
+    戻り値: 出力先パス
+    """
+    return _export(src_path)[0]
+
+
+def export_all(src_paths: list[str], jobs: int = 1) -> list[tuple[str, dict]]:
+    """複数の data_src.json を書き出す（jobs > 1 ならプロセスプールで並列に）"""
+    return parallel_map(_export, src_paths, jobs)
+
+
+# --- バンドル ---
+
+def _id_values(puzzle: dict):
+    """パズル内の ID フィールドの値（レコード, キー）を列挙する"""
+    for section, keys in ID_FIELDS.items():
+        records = [puzzle] if not section else puzzle.get(section) or []
+        for record in records:
+            if isinstance(record, dict):
+                for key in keys:
+                    if record.get(key) is not None:
+                        yield record, key
+
+
+def _count_strings(value, counts: Counter) -> None:
+    if isinstance(value, str):
+        counts[value] += 1
+    elif isinstance(value, list):
+        for item in value:
+            _count_strings(item, counts)
+
+
+def _map_strings(value, fn):
+    if isinstance(value, str):
+        return fn(value)
+    if isinstance(value, list):
+        return [_map_strings(item, fn) for item in value]
+    return value
+
+
+def _shallow_copy(puzzle: dict) -> dict:
+    out = dict(puzzle)
+    for section in ID_FIELDS:
+        if section and isinstance(out.get(section), list):
+            out[section] = [dict(r) if isinstance(r, dict) else r for r in out[section]]
+    return out
+
+
+def build_bundle(puzzles: list[dict]) -> dict:
+    """パズルを 1 つのバンドルにまとめる（ID は出現回数の多い順に小さい添字を振る）"""
+    counts: Counter = Counter()
+    for puzzle in puzzles:
+        for record, key in _id_values(puzzle):
+            _count_strings(record[key], counts)
+    ids = [id_ for id_, _ in counts.most_common()]
+    index = {id_: i for i, id_ in enumerate(ids)}
+
+    interned = []
+    for puzzle in puzzles:
+        # ID フィールドを持つ辞書だけ浅くコピーして置き換える（元のパズルは変更しない）
+        out = _shallow_copy(puzzle)
+        for record, key in _id_values(out):
+            record[key] = _map_strings(record[key], index.__getitem__)
+        interned.append(out)
+    return {"format": BUNDLE_FORMAT, "ids": ids, "puzzles": interned}
+
+
+def expand_bundle(bundle: dict) -> list[dict]:
+    """build_bundle の逆変換（添字を ID の文字列に戻す）"""
+    if bundle.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"未対応のバンドル形式です: {bundle.get('format')}")
+    lookup = bundle["ids"].__getitem__
+    puzzles = []
+    for puzzle in bundle["puzzles"]:
+        out = _shallow_copy(puzzle)
+        for record, key in _id_values(out):
+            record[key] = _map_ints(record[key], lookup)
+        puzzles.append(out)
+    return puzzles
+
+
+def _map_ints(value, fn):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return fn(value)
+    if isinstance(value, list):
+        return [_map_ints(item, fn) for item in value]
+    return value
+
+
+def write_bundle(path: str | Path, puzzles: list[dict]) -> Path:
+    """バンドルを区切りの空白なしで書き出す"""
+    path = Path(path)
+    with atomic_write(path) as f:
+        json.dump(build_bundle(puzzles), f, ensure_ascii=False, separators=(",", ":"))
+    return path
+
+
+def latest_by_id(exported: list[tuple[str, dict]]) -> list[dict]:
+    """同じ id のパズルはパス順で最後のもの（samples の日付ディレクトリでは最新版）だけ残す"""
+    latest: dict[str, dict] = {}
+    for _, puzzle in exported:
+        latest[puzzle.get("id")] = puzzle
+    return list(latest.values())
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python export_data.py <data_src.json>", file=sys.stderr)
+    jobs_arg = option_value("--jobs")
+    bundle_arg = option_value("--bundle")
+    args = [a for a in sys.argv[1:] if not a.startswith("--") and a not in (jobs_arg, bundle_arg)]
+    # 1 ファイルは数 ms で書き出せるので、既定では並列化しない（プロセス起動の方が重い）
+    jobs = int(jobs_arg or 1)
+    if not args or jobs < 1 or ("--bundle" in sys.argv and bundle_arg is None):
+        print("Usage: python export_data.py <data_src.json|DIR>... [--jobs N] [--bundle OUT]", file=sys.stderr)
         sys.exit(2)
 
-    src_path = sys.argv[1]
-    if not Path(src_path).exists():
-        print(f"Error: {src_path} が見つかりません", file=sys.stderr)
-        sys.exit(2)
+    for src_path in args:
+        if not Path(src_path).exists():
+            print(f"Error: {src_path} が見つかりません", file=sys.stderr)
+            sys.exit(2)
+
+    sources = [str(p) for p in discover([Path(a) for a in args], (SOURCE_NAME,))]
+    exported = export_all(sources, jobs)
+    for src_path, (dst, _) in zip(sources, exported):
+        print(f"[export_data] {src_path} → {dst}")
 
-    dst = export(src_path)
-    print(f"[export_data] {src_path} → {dst}")
+    if bundle_arg:
+        puzzles = latest_by_id(exported)
+        out = write_bundle(bundle_arg, puzzles)
+        print(f"[export_data] {len(puzzles)} パズル → {out} ({out.stat().st_size:,} bytes)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,272 @@
+"""最小質問集合の算出（v3）
+
+クリア条件に到達するために必要な最小の質問数と、最適な質問順序を探索する。
+エンジン（src/engine.py）の v3 意味論に従う:
+- 利用可能性は confirmed のみで判定（prerequisites ∧ reveals 先の fc、いいえ は negation_of の fc）
+- reveals 先が confirmed の質問は利用不可
+- 回答後は論理的導出（entailment）で confirmed を閉包する
+- クリア判定は confirmed のみ
+
+回答済みの質問は reveals 先が confirmed なので二度と利用可能にならない。
+したがって探索状態は confirmed のビットセットだけで決まる（reveals を持たない質問は
+状態を変えないので探索しない）。さらにクリア条件から逆向きに辿って関係しない命題・質問を
+除き、状態を関係する命題に射影する。confirmed が大きい状態ほどクリアに近いので、
+同じ深さの層で他の状態の部分集合になる状態は枝刈りする（支配枝刈り）。
+
+最小質問数を層別 BFS で求めた後、残り手数の上限付き DFS で最適な質問順序を
+MAX_SOLUTIONS 件まで列挙する。
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from bitstate import BitState  # noqa: E402
+from compiled import load_compiled  # noqa: E402
+from engine import PuzzleData, answer_question, init_game  # noqa: E402
+
+MAX_SOLUTIONS = 200
+
+
+def _relevant(
+    puzzle: PuzzleData,
+    entailment_bodies: dict[str, list[tuple[str, ...]]],
+    availability_bodies: dict[str, list[tuple[str, ...]]],
+) -> tuple[set[str], set[str]]:
+    """クリア条件から逆向きに辿り、クリアに影響しうる命題と質問を求める。
+
+    命題 a が関係する → a を head とする entailment の前件、a を reveals する質問、
+    その質問の利用可能条件の原子も関係する。関係しない命題は関係する命題の
+    導出・利用可能性に一切寄与しないので、関係しない質問は最適解に現れない。
+    """
+    questions_by_reveal: dict[str, list[str]] = {}
+    for q in puzzle.question_order:
+        if q.reveals:
+            questions_by_reveal.setdefault(q.reveals, []).append(q.id)
+
+    relevant: set[str] = set()
+    relevant_questions: set[str] = set()
+    stack = [a for group in puzzle.clear_conditions for a in group]
+    while stack:
+        atom = stack.pop()
+        if atom in relevant:
+            continue
+        relevant.add(atom)
+        for body in entailment_bodies.get(atom, []):
+            stack.extend(body)
+        for qid in questions_by_reveal.get(atom, []):
+            relevant_questions.add(qid)
+            for body in availability_bodies.get(qid, []):
+                stack.extend(body)
+    return relevant, relevant_questions
+
+
+class SolverTables:
+    """パズルの条件を命題ビットセット上のマスクにコンパイルしたもの"""
+
+    def __init__(self, puzzle: PuzzleData):
+        props = puzzle.index.props
+
+        # 論理的導出: head → 前件のリスト（定義順）
+        entailment_bodies: dict[str, list[tuple[str, ...]]] = {}
+        network = puzzle.entailment_network
+        for c, body in enumerate(network.bodies):
+            entailment_bodies.setdefault(network.heads[network.clause_head[c]], []).append(body)
+
+        # 質問の利用可能条件: 質問ID → 前件のリスト
+        availability_bodies: dict[str, list[tuple[str, ...]]] = {}
+        network = puzzle.availability_network
+        for c, body in enumerate(network.bodies):
+            availability_bodies.setdefault(network.heads[network.clause_head[c]], []).append(body)
+
+        relevant, relevant_questions = _relevant(puzzle, entailment_bodies, availability_bodies)
+        self.relevant = props.encode(relevant)
+
+        self.entailment = [
+            (props.bit(head), [props.encode(b) for b in bodies])
+            for head, bodies in entailment_bodies.items()
+            if head in relevant
+        ]
+        # 質問: (質問ID, reveals ビット, 利用可能条件マスクのリスト)
+        self.questions = [
+            (q.id, props.bit(q.reveals), [props.encode(b) for b in availability_bodies.get(q.id, [])])
+            for q in puzzle.question_order
+            if q.id in relevant_questions
+        ]
+
+        self.clear = [props.encode(g) for g in puzzle.clear_conditions]
+        initial = BitState.from_game_state(init_game(puzzle), puzzle.index).confirmed
+        self.initial = initial & self.relevant
+
+    def entail(self, bits: int) -> int:
+        changed = True
+        while changed:
+            changed = False
+            for bit, masks in self.entailment:
+                if bits & bit:
+                    continue
+                if any(bits & m == m for m in masks):
+                    bits |= bit
+                    changed = True
+        return bits
+
+    def is_clear(self, bits: int) -> bool:
+        return any(bits & m == m for m in self.clear)
+
+    def successors(self, bits: int):
+        """(質問ID, 回答後の confirmed) を質問の定義順に返す（関係する命題に射影済み）"""
+        for qid, reveal, clauses in self.questions:
+            if bits & reveal:
+                continue
+            if any(bits & m == m for m in clauses):
+                yield qid, self.entail(bits | reveal) & self.relevant
+
+
+def _prune_dominated(layer: set[int]) -> set[int]:
+    """他の状態の真部分集合になっている状態を除く"""
+    kept: list[int] = []
+    for bits in sorted(layer, key=lambda b: (-b.bit_count(), b)):
+        if not any(bits & k == bits for k in kept):
+            kept.append(bits)
+    return set(kept)
+
+
+def find_minimum_questions(puzzle: PuzzleData, tables: SolverTables | None = None) -> tuple[int | None, dict]:
+    """層別 BFS で最小質問数を求める。
+
+    戻り値: (最小質問数（クリア不能なら None）, 探索統計)
+    """
+    tables = tables or SolverTables(puzzle)
+    stats = {"expanded": 0, "generated": 0, "pruned": 0, "visited": 1, "questions": len(tables.questions)}
+    if tables.is_clear(tables.initial):
+        return 0, stats
+
+    visited = {tables.initial}
+    layer = {tables.initial}
+    depth = 0
+    while layer:
+        depth += 1
+        next_layer: set[int] = set()
+        for bits in layer:
+            stats["expanded"] += 1
+            for _, succ in tables.successors(bits):
+                stats["generated"] += 1
+                if tables.is_clear(succ):
+                    return depth, stats
+                if succ not in visited:
+                    next_layer.add(succ)
+        kept = _prune_dominated(next_layer)
+        stats["pruned"] += len(next_layer) - len(kept)
+        visited |= kept
+        stats["visited"] = len(visited)
+        layer = kept
+    return None, stats
+
+
+def enumerate_optimal_orders(
+    tables: SolverTables, min_depth: int, limit: int = MAX_SOLUTIONS
+) -> list[list[str]]:
+    """min_depth 手でクリアする質問順序を最大 limit 件列挙する。
+
+    failed[bits] = b は「bits から b 手以内ではクリアできない」ことを表す。
+    """
+    solutions: list[list[str]] = []
+    failed: dict[int, int] = {}
+
+    def dfs(bits: int, remaining: int, path: list[str]) -> None:
+        for qid, succ in tables.successors(bits):
+            if len(solutions) >= limit:
+                return
+            if remaining == 1:
+                if tables.is_clear(succ):
+                    solutions.append(path + [qid])
+                continue
+            if failed.get(succ, -1) >= remaining - 1:
+                continue
+            before = len(solutions)
+            dfs(succ, remaining - 1, path + [qid])
+            if len(solutions) == before:
+                failed[succ] = max(failed.get(succ, -1), remaining - 1)
+
+    if min_depth == 0:
+        return [[]]
+    dfs(tables.initial, min_depth, [])
+    return solutions
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python find_min_questions.py <data.json>", file=sys.stderr)
+        sys.exit(2)
+
+    path = sys.argv[1]
+    if not Path(path).exists():
+        print(f"Error: {path} が見つかりません", file=sys.stderr)
+        sys.exit(2)
+
+    puzzle = load_compiled(path).puzzle
+    if not puzzle.clear_conditions:
+        print("clear_conditions が未定義")
+        return
+
+    start = time.perf_counter()
+    tables = SolverTables(puzzle)
+    min_depth, stats = find_minimum_questions(puzzle, tables)
+    search_time = time.perf_counter() - start
+
+    print(f"関係する質問: {stats['questions']} / {len(puzzle.questions)}")
+    print(
+        f"探索: 展開 {stats['expanded']} 状態 / 生成 {stats['generated']} / "
+        f"支配枝刈り {stats['pruned']} / 訪問 {stats['visited']} 状態 ({search_time:.2f} 秒)"
+    )
+    if min_depth is None:
+        print("クリア不能: 質問の組み合わせでクリア条件に到達できません")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    solutions = enumerate_optimal_orders(tables, min_depth)
+    enum_time = time.perf_counter() - start
+
+    # 質問集合でグループ化
+    unique_sets: dict[frozenset, list[str]] = {}
+    for sol in solutions:
+        key = frozenset(sol)
+        if key not in unique_sets:
+            unique_sets[key] = sol
+
+    print(f"列挙: {len(solutions)} 通り ({enum_time:.2f} 秒)")
+    print()
+    print(f"最小質問数: {min_depth}")
+    print(f"最小質問集合の種類: {len(unique_sets)}")
+    suffix = f"（上限 {MAX_SOLUTIONS} で打ち切り）" if len(solutions) >= MAX_SOLUTIONS else ""
+    print(f"順序バリエーション総数: {len(solutions)}{suffix}")
+    print()
+
+    labels = {pid: p.label for pid, p in puzzle.propositions.items()}
+    for i, (qset, example_order) in enumerate(unique_sets.items(), 1):
+        print(f"=== 質問集合 {i}: {{{', '.join(sorted(qset))}}} ===")
+        print()
+
+        # エンジンで再生して検証する
+        state = init_game(puzzle)
+        for step, qid in enumerate(example_order, 1):
+            q = puzzle.questions[qid]
+            result = answer_question(state, q, puzzle)
+            print(f"  {step}. {qid} 「{q.text}」 → {q.answer}")
+            for pid in result.new_confirmed:
+                kind = "reveals" if pid == q.reveals else "導出"
+                print(f"     {kind}: {pid} ({labels.get(pid, '?')})")
+            for pid in result.new_derived:
+                print(f"     仮説:   {pid} ({labels.get(pid, '?')})")
+
+        clear_met = tables.is_clear(BitState.from_game_state(state, puzzle.index).confirmed)
+        print(f"\n  クリア: {'✓' if clear_met else '✗'}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
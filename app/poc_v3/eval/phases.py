@@ -0,0 +1,179 @@
+"""phase 構造のアダプター (v3)
+
+data_src.json の _phaseN は版によって同じ構造を別の番号に置く
+（v3 と v4 で 1 つずれる、途中の phase が省かれる等）。
+どの構造をどの phase から読むかを STRUCTURES の 1 か所で決め、
+ファイル（data の辞書）ごとに 1 回だけ解決してキャッシュする。
+
+解決規則: 候補の phase を優先順に見て、値が空でない最初のものを採る。
+どこも空なら、キーを持つ最初の phase（空の値）とする。
+"""
+
+from __future__ import annotations
+
+import re
+from functools import cached_property
+from typing import Any
+
+# 構造名 → 候補の phase 番号（優先順）
+STRUCTURES: dict[str, tuple[int, ...]] = {
+    "models": (1,),
+    "tensions": (1,),
+    "division_propositions": (2,),
+    "division_hierarchy": (2,),
+    "derivation_graph": (3, 2),  # v3=_phase2, v4=_phase3
+    "s_propositions": (4, 3),  # v3=_phase3, v4=_phase4
+    "tactical_chains": (4, 3),  # v3=_phase3, v4=_phase4
+    "initial_confirmed": (4, 3),
+    "chain_mapping": (5, 4),  # v3=_phase4, v4=_phase5
+    "exploration_paths": (5, 4),  # v3=_phase4, v4=_phase5
+    "chain_extensions": (5, 6),
+    "chain_designs": (6, 7),
+    "clear_conditions": (6,),
+    "chain_branches": (8, 9),  # v3=_phase9, v4=_phase8
+    "generated": (8, 9),  # v3=_phase9, v4=_phase8
+    "coverage": (8, 9),
+}
+
+# 辞書を値に持つ構造（それ以外はリスト）
+_DICT_STRUCTURES = frozenset({"derivation_graph", "chain_mapping", "generated", "coverage"})
+
+_PHASE_KEY = re.compile(r"_phase(\d+)")
+
+
+class PhaseIndex:
+    """1 ファイル分の phase 構造の解決結果"""
+
+    def __init__(self, data: dict):
+        self.data = data
+        # phase 番号 → 内容（_phase7_step1 のような派生キーは含めない）
+        self.phases: dict[int, dict] = {}
+        for key, value in data.items():
+            m = _PHASE_KEY.fullmatch(key)
+            if m and isinstance(value, dict):
+                self.phases[int(m.group(1))] = value
+        self._resolved: dict[str, tuple[int | None, Any]] = {}
+
+    def phase(self, n: int) -> dict:
+        return self.phases.get(n, {})
+
+    def has_phase(self, n: int) -> bool:
+        return n in self.phases
+
+    def find(self, name: str) -> tuple[int | None, Any]:
+        """(構造を持つ phase 番号, 値)。どの phase にもなければ (None, None)"""
+        resolved = self._resolved.get(name)
+        if resolved is None:
+            resolved = (None, None)
+            for n in STRUCTURES[name]:
+                phase = self.phases.get(n, {})
+                if name not in phase:
+                    continue
+                if phase[name]:
+                    resolved = (n, phase[name])
+                    break
+                if resolved[0] is None:
+                    resolved = (n, phase[name])
+            self._resolved[name] = resolved
+        return resolved
+
+    def phase_of(self, name: str) -> int | None:
+        return self.find(name)[0]
+
+    def get(self, name: str):
+        """構造の値（なければ空のリスト / 辞書）"""
+        value = self.find(name)[1]
+        if value:
+            return value
+        return {} if name in _DICT_STRUCTURES else []
+
+    # --- 型付きのアクセサー ---
+
+    @property
+    def models(self) -> list[dict]:
+        return self.get("models")
+
+    @property
+    def tensions(self) -> list[dict]:
+        return self.get("tensions")
+
+    @property
+    def division_propositions(self) -> list[dict]:
+        return self.get("division_propositions")
+
+    @property
+    def division_hierarchy(self) -> list[dict]:
+        return self.get("division_hierarchy")
+
+    @property
+    def derivation_graph(self) -> dict:
+        return self.get("derivation_graph")
+
+    @property
+    def s_propositions(self) -> list[dict]:
+        return self.get("s_propositions")
+
+    @cached_property
+    def s_proposition_map(self) -> dict[str, dict]:
+        return {s["id"]: s for s in self.s_propositions}
+
+    @property
+    def tactical_chains(self) -> list[dict]:
+        return self.get("tactical_chains")
+
+    @cached_property
+    def chain_map(self) -> dict[str, dict]:
+        return {c["id"]: c for c in self.tactical_chains if "id" in c}
+
+    @property
+    def initial_confirmed(self) -> list[str]:
+        return self.get("initial_confirmed")
+
+    @property
+    def chain_mapping(self) -> dict:
+        return self.get("chain_mapping")
+
+    @property
+    def exploration_paths(self) -> list[dict]:
+        return self.get("exploration_paths")
+
+    @property
+    def chain_extensions(self) -> list[dict]:
+        return self.get("chain_extensions")
+
+    @property
+    def chain_designs(self) -> list[dict]:
+        return self.get("chain_designs")
+
+    @property
+    def clear_conditions(self) -> list[list[str]]:
+        return self.get("clear_conditions")
+
+    @property
+    def chain_branches(self) -> list[dict]:
+        return self.get("chain_branches")
+
+    @property
+    def generated(self) -> dict:
+        return self.get("generated")
+
+    @property
+    def coverage(self) -> dict:
+        return self.get("coverage")
+
+
+# id(data) → (data, PhaseIndex)。data を保持して id の再利用を防ぐ
+_INDEXES: dict[int, tuple[dict, PhaseIndex]] = {}
+_MAX_INDEXES = 128
+
+
+def phase_index(data: dict) -> PhaseIndex:
+    """data の PhaseIndex（同じ辞書には同じものを返す）"""
+    entry = _INDEXES.get(id(data))
+    if entry is not None and entry[0] is data:
+        return entry[1]
+    if len(_INDEXES) >= _MAX_INDEXES:
+        del _INDEXES[next(iter(_INDEXES))]  # 最も古いもの
+    index = PhaseIndex(data)
+    _INDEXES[id(data)] = (data, index)
+    return index
@@ -0,0 +1,71 @@
+"""回答処理の段階別計測（v3）
+
+利用可能な質問からランダムに選んでゲームを繰り返し、計測（src/instrumentation.py）を
+有効にしたエンジンで 1 ターンごとの段階別の経過時間・走査回数・評価した節の数・
+伝播した原子の数を記録する。段階ごとの集計を表示し、--out を指定すると全ターンを
+JSON Lines で書き出す。
+"""
+
+from __future__ import annotations
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import instrumentation  # noqa: E402
+from common import option_value  # noqa: E402
+from compiled import load_compiled  # noqa: E402
+from engine import answer_question, available_questions, check_complete, init_game  # noqa: E402
+
+DEFAULT_GAMES = 100
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python profile_turns.py <data.json> [--games N] [--seed N] [--out PATH]", file=sys.stderr)
+        sys.exit(2)
+
+    path = sys.argv[1]
+    if not Path(path).exists():
+        print(f"Error: {path} が見つかりません", file=sys.stderr)
+        sys.exit(2)
+
+    games = int(option_value("--games") or DEFAULT_GAMES)
+    rng = random.Random(int(option_value("--seed") or 0))
+    out = option_value("--out")
+
+    puzzle = load_compiled(path).puzzle
+    recorder = instrumentation.enable()
+    start = time.perf_counter()
+    try:
+        for _ in range(games):
+            state = init_game(puzzle)
+            while not check_complete(state, puzzle):
+                questions = available_questions(state, puzzle)
+                if not questions:
+                    break
+                answer_question(state, rng.choice(questions), puzzle)
+    finally:
+        instrumentation.disable()
+    elapsed = time.perf_counter() - start
+
+    print(f"[profile_turns] {games} ゲーム / {len(recorder.turns)} ターン ({elapsed:.2f} 秒)")
+    print(f"  {'段階':<20}{'回数':>8}{'合計(ms)':>11}{'平均(µs)':>11}{'最大(µs)':>11}{'走査':>8}{'節':>10}{'原子':>9}")
+    for stage, t in recorder.summary().items():
+        print(
+            f"  {stage:<20}{t['count']:>8}{t['wall_time'] * 1e3:>11.2f}"
+            f"{t['wall_time'] / t['count'] * 1e6:>11.1f}{t['max_wall_time'] * 1e6:>11.1f}"
+            f"{t['iterations']:>8}{t['clauses_evaluated']:>10}{t['atoms_propagated']:>9}"
+        )
+
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            recorder.write_jsonl(f)
+        print(f"  → {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""可視化 HTML の生成（レンダラーの選択）
+
+data_src.json の構造から visualize.py（v3/v4）と visualize_v6.py（v6）のどちらで
+描画するかを決め、visualization.html を書き出す。
+
+v6 の data_src.json は _phase1 に competing_models と elements を持ち、
+連鎖を _phase2 の chains / chain_mapping に置く。それ以外は v3/v4 として扱う。
+
+コマンドラインからは samples 以下の全 data_src.json をまとめて再生成する。
+出力がソース（data_src.json とレンダラーのモジュール）より新しければ描画しない。
+描画はプロセスプールで並列に行い、失敗したファイルは報告して残りを続ける。
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import visualize
+import visualize_v6
+from common import atomic_write, discover, option_value, parallel_map
+from phases import phase_index
+
+EVAL_DIR = Path(__file__).resolve().parent
+DEFAULT_ROOT = EVAL_DIR.parent / "samples"
+OUTPUT_NAME = "visualization.html"
+SOURCE_NAME = "data_src.json"
+
+# 出力に影響するモジュール（これより古い出力は作り直す）
+RENDERER_SOURCES = ("render.py", "phases.py", "visualize.py", "visualize_v6.py")
+
+
+def is_v6(data: dict) -> bool:
+    phases = phase_index(data)
+    phase1 = phases.phase(1)
+    phase2 = phases.phase(2)
+    return (
+        "competing_models" in phase1
+        and "elements" in phase1
+        and ("chains" in phase2 or "chain_mapping" in phase2)
+    )
+
+
+def renderer_name(data: dict) -> str:
+    return "v6" if is_v6(data) else "v3/v4"
+
+
+def output_path(src_path: str | Path) -> Path:
+    return Path(src_path).parent / OUTPUT_NAME
+
+
+def render(src_path: str | Path, data: dict | None = None, out_path: str | Path | None = None) -> Path:
+    """src_path の可視化を書き出して出力先を返す（data を渡せば読み直さない）"""
+    if data is None:
+        data = visualize.load_data(str(src_path))
+    out = Path(out_path) if out_path is not None else output_path(src_path)
+    # 途中で失敗しても、書きかけの出力が最新に見えないよう一時ファイルから置き換える
+    with atomic_write(out) as f:
+        if is_v6(data):
+            f.write(visualize_v6.build_html(dict(data, _src_path=str(Path(src_path).resolve()))))
+        else:
+            visualize.write_html(data, f)
+    return out
+
+
+# --- 一括再生成 ---
+
+def renderer_mtime() -> int:
+    return max((EVAL_DIR / name).stat().st_mtime_ns for name in RENDERER_SOURCES)
+
+
+def is_stale(src_path: Path, newest_renderer: int) -> bool:
+    """出力がない、または data_src.json かレンダラーより古い"""
+    try:
+        out_mtime = output_path(src_path).stat().st_mtime_ns
+    except FileNotFoundError:
+        return True
+    return out_mtime < max(src_path.stat().st_mtime_ns, newest_renderer)
+
+
+def regenerate(src_path: str) -> dict:
+    """1 ファイル分を描画して結果を返す（例外はそのファイルの失敗として記録する）"""
+    start = time.perf_counter()
+    try:
+        data = visualize.load_data(src_path)
+        renderer = renderer_name(data)
+        out = render(src_path, data)
+    except Exception as e:
+        return {"path": src_path, "ok": False, "error": f"{type(e).__name__}: {e}"}
+    return {
+        "path": src_path,
+        "ok": True,
+        "renderer": renderer,
+        "out": str(out),
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def main():
+    jobs_arg = option_value("--jobs")
+    roots = [Path(a) for a in sys.argv[1:] if not a.startswith("--") and a != jobs_arg] or [DEFAULT_ROOT]
+    for root in roots:
+        if not root.exists():
+            print(f"Error: {root} が見つかりません", file=sys.stderr)
+            sys.exit(2)
+    jobs = int(jobs_arg or os.cpu_count() or 1)
+    if jobs < 1:
+        print("Usage: python render.py [ROOT|FILE]... [--jobs N] [--force]", file=sys.stderr)
+        sys.exit(2)
+    force = "--force" in sys.argv
+
+    start = time.perf_counter()
+    sources = discover(roots, (SOURCE_NAME,))
+    newest_renderer = renderer_mtime()
+    pending = [str(p) for p in sources if force or is_stale(p, newest_renderer)]
+    results = parallel_map(regenerate, pending, jobs)
+    elapsed = time.perf_counter() - start
+
+    failed = [r for r in results if not r["ok"]]
+    for r in results:
+        if r["ok"]:
+            print(f"  {r['out']} ({r['renderer']}, {r['elapsed'] * 1e3:.0f} ms)")
+        else:
+            print(f"  FAIL: {r['path']} ({r['error']})")
+    print(f"[render] {len(sources)} ファイル（描画 {len(results) - len(failed)} / 最新のため省略 "
+          f"{len(sources) - len(results)} / 失敗 {len(failed)}）{elapsed:.2f} 秒")
+    sys.exit(0 if not failed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,12 +7,15 @@ data_src.json の場合（_ フィールド検出で自動判別）:
   既存チェック + check_chain_consistency
 data.json の場合:
   既存チェックのみ
+
+--stats を指定すると、チェック間で共有した導出閉包キャッシュの hit 率を出力する。
 """
 
 import json
 import sys
 from pathlib import Path
 
+from closure import format_stats
 from check_integrity import run as run_integrity
 from check_reachability import run as run_reachability
 from check_chain_consistency import run as run_chain_consistency
@@ -38,7 +41,7 @@ def _has_underscore_fields(path: str) -> bool:
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python run_all.py <data.json|data_src.json>", file=sys.stderr)
+        print("Usage: python run_all.py <data.json|data_src.json> [--stats]", file=sys.stderr)
         sys.exit(2)
 
     path = sys.argv[1]
@@ -87,6 +90,9 @@ def main():
     else:
         print("Result: FAIL")
 
+    if "--stats" in sys.argv:
+        print(format_stats())
+
     sys.exit(0 if all_pass else 1)
 
 
@@ -0,0 +1,180 @@
+"""コーパス全体の一括チェック (v3)
+
+samples 以下の全 data.json / data_src.json を探し、run_all と同じ順序
+（check_integrity → check_reachability → data_src.json なら check_chain_consistency）で
+プロセスプールを使って並列に検証する。
+
+結果はファイル内容の SHA-256 とチェッカーのバージョン（チェック用モジュールのソースの指紋）を
+キーにキャッシュし、内容もチェッカーも変わっていないファイルは再評価しない。
+1 ファイルだけ編集した後の再検証は、その 1 ファイルを検証する時間とほぼ同じで済む。
+キャッシュには今回見つかったファイルの内容の結果だけを残す。
+
+全ファイルの結果は 1 つの JSON レポート（--out）にまとめて書き出す。
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from check_chain_consistency import run as run_chain_consistency
+from check_integrity import run as run_integrity
+from check_reachability import run as run_reachability
+from common import atomic_write, discover, option_value, parallel_map
+from run_all import _has_underscore_fields
+
+EVAL_DIR = Path(__file__).resolve().parent
+DEFAULT_ROOT = EVAL_DIR.parent / "samples"
+DEFAULT_OUT = EVAL_DIR / "corpus_report.json"
+DEFAULT_CACHE = EVAL_DIR / ".corpus_cache.json"
+DATA_FILES = ("data.json", "data_src.json")
+CACHE_FORMAT = 1
+
+# 結果に影響するモジュール（ソースが変わればキャッシュを無効にする）
+CHECKER_SOURCES = (
+    "check_integrity.py",
+    "check_reachability.py",
+    "check_chain_consistency.py",
+    "closure.py",
+    "phases.py",
+    "run_all.py",
+    "run_corpus.py",
+)
+
+
+def checker_version() -> str:
+    h = hashlib.sha256(str(CACHE_FORMAT).encode())
+    for name in CHECKER_SOURCES:
+        h.update((EVAL_DIR / name).read_bytes())
+    return h.hexdigest()[:16]
+
+
+def _run_check(fn, path: str) -> dict:
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        ok, errors = fn(path)
+    return {"ok": ok, "skipped": False, "errors": errors, "output": buf.getvalue()}
+
+
+def evaluate(path: str) -> dict:
+    """1 ファイル分の結果（run_all と同じ判定）"""
+    try:
+        is_src = _has_underscore_fields(path)
+        checks = {"check_integrity": _run_check(run_integrity, path)}
+        ok_integrity = checks["check_integrity"]["ok"]
+        if ok_integrity:
+            checks["check_reachability"] = _run_check(run_reachability, path)
+        else:
+            # 整合性が壊れている場合、到達可能性チェックの結果は信頼できない
+            checks["check_reachability"] = {"ok": False, "skipped": True, "errors": [], "output": ""}
+        if is_src and ok_integrity:
+            checks["check_chain_consistency"] = _run_check(run_chain_consistency, path)
+    except Exception as e:  # 壊れた JSON など: そのファイルの失敗として記録する
+        return {"mode": None, "ok": False, "error": f"{type(e).__name__}: {e}", "checks": {}}
+    return {
+        "mode": "data_src" if is_src else "data",
+        "ok": all(c["ok"] for c in checks.values()),
+        "checks": checks,
+    }
+
+
+def load_cache(path: Path, version: str) -> dict[str, dict]:
+    """内容の SHA-256 → 結果（チェッカーのバージョンが違うキャッシュは捨てる）"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("checker_version") != version:
+        return {}
+    return cache.get("results", {})
+
+
+def save_cache(path: Path, version: str, results: dict[str, dict]) -> None:
+    try:
+        with atomic_write(path) as f:
+            json.dump({"checker_version": version, "results": results}, f, ensure_ascii=False)
+    except OSError:  # キャッシュが書けなくても結果は出す
+        pass
+
+
+def main():
+    options = ("--jobs", "--out", "--cache")
+    values = {option_value(name) for name in options} - {None}
+    roots = [Path(a) for a in sys.argv[1:] if not a.startswith("--") and a not in values] or [DEFAULT_ROOT]
+    for root in roots:
+        if not root.exists():
+            print(f"Error: {root} が見つかりません", file=sys.stderr)
+            sys.exit(2)
+
+    jobs = int(option_value("--jobs") or os.cpu_count() or 1)
+    if jobs < 1:
+        print("Usage: python run_corpus.py [ROOT|FILE]... [--jobs N] [--out PATH] [--cache PATH] [--no-cache]",
+              file=sys.stderr)
+        sys.exit(2)
+    out = Path(option_value("--out") or DEFAULT_OUT)
+    cache_path = Path(option_value("--cache") or DEFAULT_CACHE)
+    use_cache = "--no-cache" not in sys.argv
+
+    start = time.perf_counter()
+    version = checker_version()
+    files = discover(roots, DATA_FILES)
+    digests = {path: hashlib.sha256(path.read_bytes()).hexdigest() for path in files}
+    cache = load_cache(cache_path, version) if use_cache else {}
+
+    # 同じ内容のファイルは 1 回だけ評価する
+    pending = sorted({digest for digest in digests.values() if digest not in cache})
+    representative = {}
+    for path, digest in digests.items():
+        representative.setdefault(digest, str(path))
+    evaluated = dict(zip(pending, parallel_map(evaluate, [representative[d] for d in pending], jobs)))
+
+    results = cache | evaluated
+    # 今ある内容の結果だけ保存する（削除・編集されたファイルの古い結果は捨てる）
+    live = {digest: results[digest] for digest in sorted(set(digests.values()))}
+    if use_cache and (evaluated or len(live) < len(cache)):
+        save_cache(cache_path, version, live)
+    elapsed = time.perf_counter() - start
+
+    entries = []
+    for path in files:
+        digest = digests[path]
+        entries.append({"path": str(path), "sha256": digest, "cached": digest not in evaluated, **results[digest]})
+    failed = [e for e in entries if not e["ok"]]
+    report = {
+        "checker_version": version,
+        "roots": [str(r) for r in roots],
+        "summary": {
+            "files": len(entries),
+            "passed": len(entries) - len(failed),
+            "failed": len(failed),
+            "evaluated": sum(1 for e in entries if not e["cached"]),
+            "cached": sum(1 for e in entries if e["cached"]),
+            "elapsed": round(elapsed, 3),
+        },
+        "files": entries,
+    }
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    s = report["summary"]
+    print(f"[run_corpus] {s['files']} ファイル（評価 {s['evaluated']} / キャッシュ {s['cached']}）{elapsed:.2f} 秒")
+    for e in failed:
+        reason = e.get("error") or ", ".join(
+            name for name, c in e["checks"].items() if not c["ok"] and not c["skipped"]
+        )
+        print(f"  FAIL: {e['path']} ({reason})")
+    print(f"  → {out}")
+    print()
+    print("Result: ALL PASS" if not failed else f"Result: FAIL ({len(failed)} ファイル)")
+    sys.exit(0 if not failed else 1)
+
+
+if __name__ == "__main__":
+    main()
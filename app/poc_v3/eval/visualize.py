@@ -1,10 +1,25 @@
-"""data_src.json の構造を可視化する HTML を生成する"""
+"""data_src.json の構造を可視化する HTML を生成する
 
+大きなパズルでも出力サイズと描画時間が膨らまないように:
+- HTML は 1 つの文字列に組み立てず、セクションごとにファイルへ書き出す（write_html）
+- 導出グラフと fc フローは推移簡約し、他の経路で到達できる単独導出の辺を描かない
+- ノード数が node_budget を超える図は連結成分ごとに部分図へ分け、
+  先頭以外は開いたときに描画する（<details> の toggle で mermaid.run）
+"""
+
+import io
 import json
 import re
 import sys
 import html
+from collections import Counter
 from pathlib import Path
+from typing import TextIO
+
+from common import option_value
+from phases import phase_index
+
+NODE_BUDGET = 150  # 1 つの Mermaid 図に描くノード数の上限
 
 
 def load_data(path: str) -> dict:
@@ -12,99 +27,69 @@ def load_data(path: str) -> dict:
         return json.load(f)
 
 
-def build_html(data: dict) -> str:
-    title = data.get("title", "Puzzle")
-
-    # --- Extract structures (v3/v4 compatible) ---
-    propositions = {p["id"]: p for p in data.get("propositions", [])}
-    questions = {q["id"]: q for q in data.get("questions", [])}
-    # s_propositions: v3=_phase3, v4=_phase4
-    s_props = {s["id"]: s for s in (
-        data.get("_phase4", {}).get("s_propositions", [])
-        or data.get("_phase3", {}).get("s_propositions", [])
-    )}
-    # tactical_chains: v3=_phase3, v4=_phase4
-    tactical_chains = (
-        data.get("_phase4", {}).get("tactical_chains", [])
-        or data.get("_phase3", {}).get("tactical_chains", [])
-    )
-    division_props = data.get("_phase2", {}).get("division_propositions", [])
-    division_hierarchy = data.get("_phase2", {}).get("division_hierarchy", [])
-    models = data.get("_phase1", {}).get("models", [])
-    tensions = data.get("_phase1", {}).get("tensions", [])
-    # chain_branches: v3=_phase9, v4=_phase8
-    chain_branches = (
-        data.get("_phase8", {}).get("chain_branches", [])
-        or data.get("_phase9", {}).get("chain_branches", [])
-    )
-    # chain_mapping: v3=_phase4, v4=_phase5
-    chain_mapping = (
-        data.get("_phase5", {}).get("chain_mapping", {})
-        or data.get("_phase4", {}).get("chain_mapping", {})
-    )
-    # exploration_paths: v3=_phase4, v4=_phase5
-    exploration_paths = (
-        data.get("_phase5", {}).get("exploration_paths", [])
-        or data.get("_phase4", {}).get("exploration_paths", [])
-    )
-    chain_extensions = (
-        data.get("_phase5", {}).get("chain_extensions", [])
-        or data.get("_phase6", {}).get("chain_extensions", [])
-    )
-    chain_designs = (
-        data.get("_phase6", {}).get("chain_designs", [])
-        or data.get("_phase7", {}).get("chain_designs", [])
-    )
-    # generated: v3=_phase9, v4=_phase8
-    generated = (
-        data.get("_phase8", {}).get("generated", {})
-        or data.get("_phase9", {}).get("generated", {})
-    )
-    # derivation_graph: v3=_phase2, v4=_phase3
-    derivation_graph = (
-        data.get("_phase3", {}).get("derivation_graph", {})
-        or data.get("_phase2", {}).get("derivation_graph", {})
-    )
-
-    # --- Build Mermaid diagrams ---
-
-    # Diagram 0: Derivation Graph (conceptual derivation relationships)
-    deriv_graph_lines = _build_derivation_graph_diagram(derivation_graph, division_props, propositions)
-
-    # Diagram 1: Proposition Derivation Flow (NF excluded)
-    derivation_lines = _build_derivation_diagram(propositions, s_props)
-
-    # Diagram 2: Question → Proposition Mapping
-    q_lines = _build_question_diagram(questions, propositions)
+def build_html(data: dict, node_budget: int = NODE_BUDGET) -> str:
+    buf = io.StringIO()
+    write_html(data, buf, node_budget)
+    return buf.getvalue()
 
-    # Diagram 3: Model Division Hierarchy
-    div_lines = _build_division_diagram(models, division_props, division_hierarchy)
 
-    # Diagram 4: Chain Flow (parse description for intermediate steps)
-    chain_lines = _build_chain_diagram(tactical_chains, chain_extensions, chain_designs)
-
-    # Diagram 5: Chain Branches (Rejection Analysis)
-    branch_lines = _build_branch_diagram(chain_branches, generated)
-
-    # Diagram 6: Exploration Paths
-    path_lines = _build_path_diagram(exploration_paths)
-
-    # --- Integrity Summary ---
-    integrity = _check_integrity(data, propositions, questions, s_props)
-
-    # --- Build HTML ---
-    return _render_html(
-        title=title,
-        deriv_graph_diagram="\n".join(deriv_graph_lines),
-        derivation_diagram="\n".join(derivation_lines),
-        question_diagram="\n".join(q_lines),
-        division_diagram="\n".join(div_lines),
-        chain_diagram="\n".join(chain_lines),
-        branch_diagram="\n".join(branch_lines),
-        path_diagram="\n".join(path_lines),
-        integrity=integrity,
-        data=data,
-    )
+def write_html(data: dict, fp: TextIO, node_budget: int = NODE_BUDGET) -> None:
+    """HTML をセクションごとに fp へ書き出す（図は 1 つずつ組み立て、書いたら捨てる）"""
+    s = _extract_structures(data)
+    title = data.get("title", "Puzzle")
+    fp.write(_render_head(title, data))
+
+    split = False
+    for tab_id, heading, note, build in _diagram_sections(s):
+        parts = _split_diagram(build(), node_budget)
+        split |= len(parts) > 1
+        fp.write(f'<div id="{tab_id}" class="tab-content">\n<h2>{heading}</h2>\n{note}')
+        _write_diagram(fp, parts, node_budget)
+        fp.write("</div>\n\n")
+
+    integrity = _check_integrity(data, s["propositions"], s["questions"], s["s_props"])
+    fp.write(_render_integrity(integrity))
+    fp.write(_TAIL.replace("{lazy}", _LAZY_SCRIPT if split else ""))
+
+
+def _extract_structures(data: dict) -> dict:
+    """図に使う構造を取り出す（どの phase にあるかは phases.STRUCTURES で解決する）"""
+    phases = phase_index(data)
+    return {
+        "propositions": {p["id"]: p for p in data.get("propositions", [])},
+        "questions": {q["id"]: q for q in data.get("questions", [])},
+        "s_props": phases.s_proposition_map,
+        "tactical_chains": phases.tactical_chains,
+        "division_props": phases.division_propositions,
+        "division_hierarchy": phases.division_hierarchy,
+        "models": phases.models,
+        "chain_branches": phases.chain_branches,
+        "exploration_paths": phases.exploration_paths,
+        "chain_extensions": phases.chain_extensions,
+        "chain_designs": phases.chain_designs,
+        "generated": phases.generated,
+        "derivation_graph": phases.derivation_graph,
+    }
+
+
+def _diagram_sections(s: dict):
+    """(タブ ID, 見出し, 注記, 図の組み立て関数) を描画順に返す"""
+    return [
+        ("deriv_graph", "derivation graph (_phase2)", _DERIV_GRAPH_NOTE,
+         lambda: _build_derivation_graph_diagram(s["derivation_graph"], s["division_props"], s["propositions"])),
+        ("derivation", "formation_conditions", _DERIVATION_NOTE,
+         lambda: _build_derivation_diagram(s["propositions"], s["s_props"])),
+        ("questions", "Q -&gt; proposition (reveals)", _QUESTION_NOTE,
+         lambda: _build_question_diagram(s["questions"], s["propositions"])),
+        ("division", "model division hierarchy", "",
+         lambda: _build_division_diagram(s["models"], s["division_props"], s["division_hierarchy"])),
+        ("chains", "tactical chains", _CHAIN_NOTE,
+         lambda: _build_chain_diagram(s["tactical_chains"], s["chain_extensions"], s["chain_designs"])),
+        ("branches", "chain branches / rejection (_phase9)", _BRANCH_NOTE,
+         lambda: _build_branch_diagram(s["chain_branches"], s["generated"])),
+        ("paths", "exploration paths", "",
+         lambda: _build_path_diagram(s["exploration_paths"])),
+    ]
 
 
 def _build_derivation_graph_diagram(derivation_graph, division_props, propositions):
@@ -166,7 +151,13 @@ def _build_derivation_graph_diagram(derivation_graph, division_props, propositio
         lines.append(f'  {nid}["{nid}: {_esc(short_label)}"]:::{cls}')
 
     # Single derivation edges (from → to = "from derives to, from is more concrete")
+    # 推移簡約: 他の単独導出を経由して到達できる from → to は描かない
+    redundant = _transitive_reduction([(sd["from"], sd["to"]) for sd in single_derivs])
+    if redundant:
+        lines.append(f"  %% transitive reduction: {len(redundant)} redundant edges omitted")
     for sd in single_derivs:
+        if (sd["from"], sd["to"]) in redundant:
+            continue
         reason = sd.get("reason", "")
         short_reason = reason[:40] + "..." if len(reason) > 40 else reason
         if short_reason:
@@ -231,13 +222,25 @@ def _build_derivation_diagram(propositions, s_props):
             if parent in filtered_ids:
                 lines.append(f"  {parent} -.-> {sid}")
 
+    # 推移簡約: 単独ソースの fc 辺は、他の単独ソース辺を経由して到達できるなら描かない
+    single_edges = [
+        (group[0], pid)
+        for pid, prop in filtered_props.items()
+        for group in ([src for src in g if src in filtered_ids] for g in prop.get("formation_conditions") or [])
+        if len(group) == 1
+    ]
+    redundant = _transitive_reduction(single_edges)
+    if redundant:
+        lines.append(f"  %% transitive reduction: {len(redundant)} redundant edges omitted")
+
     for pid, prop in filtered_props.items():
         for fc_group in prop.get("formation_conditions") or []:
             valid_sources = [src for src in fc_group if src in filtered_ids]
             if not valid_sources:
                 continue
             if len(valid_sources) == 1:
-                lines.append(f"  {valid_sources[0]} --> {pid}")
+                if (valid_sources[0], pid) not in redundant:
+                    lines.append(f"  {valid_sources[0]} --> {pid}")
             else:
                 jid = f"j_{pid}_{'_'.join(valid_sources)}"
                 lines.append(f"  {jid}(( ))")
@@ -258,11 +261,15 @@ def _build_question_diagram(questions, propositions):
         "  classDef fNode fill:#f5f5f5,stroke:#757575,color:#424242",
     ]
 
-    # Pass 1: define all nodes
+    # Pass 1: define all nodes（複数の質問が明かす命題は 1 回だけ定義する）
+    defined = set()
     for qid, q in sorted(questions.items()):
         ans_mark = "O" if q["answer"] in ("はい", "yes") else "X"
         lines.append(f'  {qid}["{qid} {ans_mark}<br/>{_esc(q["text"])}"]:::qNode')
         for rev in q.get("reveals", []):
+            if rev in defined:
+                continue
+            defined.add(rev)
             prop = propositions.get(rev, {})
             rev_label = prop.get("label", rev)
             lines.append(f'  {rev}_q["{rev}: {_esc(rev_label)}"]:::{_node_class(rev)}')
@@ -546,12 +553,7 @@ def _check_integrity(data, propositions, questions, s_props):
             ok.append("negation_of の対称性が保たれている")
 
     # 3. Formation conditions reference valid IDs
-    # Rebuild s_props for integrity check (v3/v4 compatible)
-    _s_props_list = (
-        data.get("_phase4", {}).get("s_propositions", [])
-        or data.get("_phase3", {}).get("s_propositions", [])
-    )
-    s_props = {s["id"]: s for s in _s_props_list}
+    phases = phase_index(data)
     all_ids = set(propositions.keys()) | set(s_props.keys())
     for pid, prop in propositions.items():
         for fc_group in (prop.get("formation_conditions") or []):
@@ -562,10 +564,7 @@ def _check_integrity(data, propositions, questions, s_props):
         ok.append("全命題の formation_conditions の参照先が存在")
 
     # 4. Model coverage completeness
-    coverage = (
-        data.get("_phase8", {}).get("coverage", {})
-        or data.get("_phase9", {}).get("coverage", {})
-    )
+    coverage = phases.coverage
     uncovered = coverage.get("uncovered", [])
     if uncovered:
         issues.append(f"カバーされていないモデル: {uncovered}")
@@ -575,10 +574,7 @@ def _check_integrity(data, propositions, questions, s_props):
 
     # 5. Duplicate initial_confirmed
     top_ic = data.get("initial_confirmed", [])
-    phase3_ic = (
-        data.get("_phase4", {}).get("initial_confirmed", [])
-        or data.get("_phase3", {}).get("initial_confirmed", [])
-    )
+    phase3_ic = phases.initial_confirmed
     if top_ic and phase3_ic:
         if set(top_ic) == set(phase3_ic):
             issues.append("initial_confirmed がトップレベルと _phase3 で重複（実害なし、データ冗長）")
@@ -587,7 +583,7 @@ def _check_integrity(data, propositions, questions, s_props):
 
     # 6. Clear conditions consistency
     cc = data.get("clear_conditions", [])
-    p6_cc = data.get("_phase6", {}).get("clear_conditions", [])
+    p6_cc = phases.clear_conditions
     if cc and p6_cc and cc == p6_cc:
         ok.append("clear_conditions がトップレベルと _phase6 で一致")
     elif cc and p6_cc and cc != p6_cc:
@@ -612,21 +608,14 @@ def _normalize_conds(conds):
     return sorted([sorted(g) for g in conds])
 
 
-def _render_html(*, title, deriv_graph_diagram, derivation_diagram, question_diagram,
-                 division_diagram, chain_diagram, branch_diagram, path_diagram,
-                 integrity, data):
-    issues_html = ""
-    for issue in integrity["issues"]:
-        issues_html += f'<li class="issue">&#9888; {html.escape(issue)}</li>\n'
-    for ok_item in integrity["ok"]:
-        issues_html += f'<li class="ok">&#10003; {html.escape(ok_item)}</li>\n'
-
+def _render_head(title: str, data: dict) -> str:
     n_props = len(data.get("propositions", []))
     n_questions = len(data.get("questions", []))
-    n_s = len(data.get("_phase4", {}).get("s_propositions", data.get("_phase3", {}).get("s_propositions", [])))
-    n_chains = len(data.get("_phase4", {}).get("tactical_chains", data.get("_phase3", {}).get("tactical_chains", [])))
-    n_models = len(data.get("_phase1", {}).get("models", []))
-    n_tensions = len(data.get("_phase1", {}).get("tensions", []))
+    phases = phase_index(data)
+    n_s = len(phases.s_propositions)
+    n_chains = len(phases.tactical_chains)
+    n_models = len(phases.models)
+    n_tensions = len(phases.tensions)
 
     return f"""<!DOCTYPE html>
 <html lang="ja">
@@ -700,141 +689,321 @@ def _render_html(*, title, deriv_graph_diagram, derivation_diagram, question_dia
   <div class="tab" data-tab="integrity">integrity</div>
 </div>
 
-<div id="deriv_graph" class="tab-content">
-<h2>derivation graph (_phase2)</h2>
-<p class="note">
-  Conceptual derivation: A &rarr; B means confirming A makes B redundant.
-  Blue = independent axis, green = root (S-reachable), purple = composite, orange = derived.
-  Dashed = combination derivation.
-</p>
-<pre class="mermaid">
-{deriv_graph_diagram}
-</pre>
-</div>
+"""
 
-<div id="derivation" class="tab-content">
-<h2>formation_conditions</h2>
-<p class="note">
-  S -&gt; N -&gt; P -&gt; NT -&gt; NU. Solid = fc, dotted = S derived_from.
-  Junction = AND. Multiple arrows to same node = OR.
-</p>
-<pre class="mermaid">
-{derivation_diagram}
-</pre>
-</div>
-
-<div id="questions" class="tab-content">
-<h2>Q -&gt; proposition (reveals)</h2>
-<p class="note">O = yes, X = no</p>
-<pre class="mermaid">
-{question_diagram}
-</pre>
-</div>
 
-<div id="division" class="tab-content">
-<h2>model division hierarchy</h2>
-<pre class="mermaid">
-{division_diagram}
-</pre>
-</div>
-
-<div id="chains" class="tab-content">
-<h2>tactical chains</h2>
-<p class="note">C1-C5 + extensions. Parsed from _phase3 description.</p>
-<pre class="mermaid">
-{chain_diagram}
-</pre>
-</div>
-
-<div id="branches" class="tab-content">
-<h2>chain branches / rejection (_phase9)</h2>
-<p class="note">T = true side, F = false side (parallel). Dotted = generated NF proposition.</p>
-<pre class="mermaid">
-{branch_diagram}
-</pre>
-</div>
-
-<div id="paths" class="tab-content">
-<h2>exploration paths</h2>
-<pre class="mermaid">
-{path_diagram}
-</pre>
-</div>
-
-<div id="integrity" class="tab-content">
+def _render_integrity(integrity: dict) -> str:
+    issues_html = ""
+    for issue in integrity["issues"]:
+        issues_html += f'<li class="issue">&#9888; {html.escape(issue)}</li>\n'
+    for ok_item in integrity["ok"]:
+        issues_html += f'<li class="ok">&#10003; {html.escape(ok_item)}</li>\n'
+    return f"""<div id="integrity" class="tab-content">
 <h2>integrity check</h2>
 <ul class="checks">
 {issues_html}
 </ul>
 </div>
 
-<script>
+"""
+
+
+_DERIV_GRAPH_NOTE = """<p class="note">
+  Conceptual derivation: A &rarr; B means confirming A makes B redundant.
+  Blue = independent axis, green = root (S-reachable), purple = composite, orange = derived.
+  Dashed = combination derivation.
+</p>
+"""
+_DERIVATION_NOTE = """<p class="note">
+  S -&gt; N -&gt; P -&gt; NT -&gt; NU. Solid = fc, dotted = S derived_from.
+  Junction = AND. Multiple arrows to same node = OR.
+</p>
+"""
+_QUESTION_NOTE = '<p class="note">O = yes, X = no</p>\n'
+_CHAIN_NOTE = '<p class="note">C1-C5 + extensions. Parsed from _phase3 description.</p>\n'
+_BRANCH_NOTE = '<p class="note">T = true side, F = false side (parallel). Dotted = generated NF proposition.</p>\n'
+
+# 部分図は開いたときに描画する（非表示のまま描画すると Mermaid のレイアウトが崩れるため）
+_LAZY_SCRIPT = """
+  // Render split sub-diagrams when their <details> is first opened
+  document.querySelectorAll('details.part').forEach(function(part) {
+    part.addEventListener('toggle', function() {
+      var pre = part.querySelector('pre.mermaid-lazy');
+      if (part.open && pre) {
+        pre.classList.replace('mermaid-lazy', 'mermaid');
+        mermaid.run({ nodes: [pre] });
+      }
+    });
+  });
+"""
+
+_TAIL = """<script>
   // Initialize mermaid - render all diagrams while all tabs visible
-  mermaid.initialize({{
+  mermaid.initialize({
     startOnLoad: true,
     theme: 'default',
     securityLevel: 'loose',
-    flowchart: {{
+    flowchart: {
       htmlLabels: true,
       curve: 'basis',
       useMaxWidth: false,
       nodeSpacing: 30,
       rankSpacing: 60,
       padding: 15
-    }},
-    themeVariables: {{
+    },
+    themeVariables: {
       fontSize: '14px'
-    }}
-  }});
+    }
+  });
 
   // After mermaid renders, hide non-active tabs
-  window.addEventListener('load', function() {{
-    setTimeout(function() {{
+  window.addEventListener('load', function() {
+    setTimeout(function() {
       var tabs = document.querySelectorAll('.tab-content');
-      for (var i = 1; i < tabs.length; i++) {{
+      for (var i = 1; i < tabs.length; i++) {
         tabs[i].classList.add('hidden');
-      }}
-    }}, 500);
-  }});
+      }
+    }, 500);
+  });
 
   // Tab switching
-  document.querySelectorAll('.tab').forEach(function(tab) {{
-    tab.addEventListener('click', function() {{
-      document.querySelectorAll('.tab-content').forEach(function(el) {{
+  document.querySelectorAll('.tab').forEach(function(tab) {
+    tab.addEventListener('click', function() {
+      document.querySelectorAll('.tab-content').forEach(function(el) {
         el.classList.add('hidden');
-      }});
-      document.querySelectorAll('.tab').forEach(function(el) {{
+      });
+      document.querySelectorAll('.tab').forEach(function(el) {
         el.classList.remove('active');
-      }});
+      });
       var target = tab.getAttribute('data-tab');
       document.getElementById(target).classList.remove('hidden');
       tab.classList.add('active');
-    }});
-  }});
-</script>
+    });
+  });
+{lazy}</script>
 
 </body>
 </html>"""
 
 
+def _write_diagram(fp: TextIO, parts: list[list[str]], node_budget: int) -> None:
+    if len(parts) == 1:
+        fp.write('<pre class="mermaid">\n' + "\n".join(parts[0]) + "\n</pre>\n")
+        return
+    sizes = [_count_nodes(p) - sum(1 for line in p if line.endswith('"])')) for p in parts]  # 参照用の再定義を除く
+    fp.write(f'<p class="note">{sum(sizes)} nodes: split into {len(parts)} parts '
+             f'(budget {node_budget}). Parts render when opened. '
+             f'Stadium-shaped nodes are defined in another part.</p>\n')
+    for i, (part, size) in enumerate(zip(parts, sizes)):
+        # 先頭の部分図だけ読み込み時に描画し、残りは開いたときに描画する
+        opened, cls = (" open", "mermaid") if i == 0 else ("", "mermaid-lazy")
+        fp.write(f'<details class="part"{opened}>\n<summary>part {i + 1}/{len(parts)} ({size} nodes)</summary>\n'
+                 f'<pre class="{cls}">\n' + "\n".join(part) + "\n</pre>\n</details>\n")
+
+
+# --- グラフの簡約と分割 ---
+
+def _transitive_reduction(edges: list[tuple[str, str]]) -> set[tuple[str, str]]:
+    """他の経路でも到達できる冗長な辺 u → v の集合
+
+    到達集合はトポロジカル順の逆にビットセットで積み上げる。
+    閉路があると冗長な辺を同時に外せるとは限らないので、その場合は何も外さない。
+    """
+    succ: dict[str, set[str]] = {}
+    indegree: dict[str, int] = {}
+    for u, v in edges:
+        if v not in succ.setdefault(u, set()):
+            succ[u].add(v)
+            indegree[v] = indegree.get(v, 0) + 1
+        succ.setdefault(v, set())
+    order = [n for n in succ if not indegree.get(n)]
+    for n in order:
+        for m in succ[n]:
+            indegree[m] -= 1
+            if not indegree[m]:
+                order.append(m)
+    if len(order) < len(succ):
+        return set()
+
+    bit = {n: 1 << i for i, n in enumerate(order)}
+    reach: dict[str, int] = {}  # n から 1 歩以上で到達できるノード
+    redundant = set()
+    for n in reversed(order):
+        via = 0  # 後続ノードから 1 歩以上で到達できるノード
+        direct = 0
+        for m in succ[n]:
+            via |= reach[m]
+            direct |= bit[m]
+        reach[n] = via | direct
+        for m in succ[n]:
+            if via & bit[m]:
+                redundant.add((n, m))
+    return redundant
+
+
+# Mermaid の ID は - や + を含むことがある（D-5_q, C4+C5 など）
+_ID = r"[^\s\[\(]+"
+_NODE_RE = re.compile(rf"^\s*({_ID})(?:\[|\()")
+_EDGE_RE = re.compile(rf"^\s*({_ID})\s+(?:-->|-\.->|---)(?:\|.*?\|)?\s*({_ID})\s*$")
+_SUBGRAPH_RE = re.compile(rf"^  subgraph ({_ID})")
+
+
+def _count_nodes(lines: list[str]) -> int:
+    return sum(1 for line in lines if _NODE_RE.match(line))
+
+
+def _split_diagram(lines: list[str], budget: int) -> list[list[str]]:
+    """ノード数が budget を超える図を部分図に分ける（超えなければそのまま 1 つ返す）
+
+    subgraph ブロックは分けずに 1 単位として扱う。連結成分ごとに順に詰め、
+    budget を超える連結成分はトポロジカル順に切る。部分図をまたぐ辺は
+    行き先の部分図に置き、元の部分図で定義されたノードを参照用に再定義する。
+    コメントや認識できない行は先頭の部分図に置き、入力のどの行も落とさない。
+    """
+    if _count_nodes(lines) <= budget:
+        return [lines]
+
+    header = []
+    i = 0
+    while i < len(lines) and (lines[i].startswith("graph ") or lines[i].lstrip().startswith(("classDef", "%%"))):
+        header.append(lines[i])
+        i += 1
+
+    # 単位: [行, ノード数]。ノード/subgraph ID → 単位番号
+    units: list[list] = []
+    owner: dict[str, int] = {}
+    edges: list[tuple[int, int, str]] = []
+    pending: list[tuple[str, str, str]] = []
+    loose: list[str] = []  # 先頭の部分図に置く行
+    while i < len(lines):
+        line = lines[i]
+        sub = _SUBGRAPH_RE.match(line)
+        if sub:
+            j = lines.index("  end", i)
+            block = lines[i:j + 1]
+            owner[sub.group(1)] = len(units)
+            for inner in block[1:-1]:
+                node = _NODE_RE.match(inner)
+                if node:
+                    owner.setdefault(node.group(1), len(units))
+            units.append([block, max(1, _count_nodes(block))])
+            i = j + 1
+            continue
+        edge = _EDGE_RE.match(line)
+        if line.startswith("  %%"):
+            loose.append(line)
+        elif edge:
+            pending.append((edge.group(1), edge.group(2), line))
+        else:
+            node = _NODE_RE.match(line)
+            if node is None:
+                loose.append(line)
+            elif node.group(1) not in owner:
+                owner[node.group(1)] = len(units)
+                units.append([[line], 1])
+            else:
+                units[owner[node.group(1)]][0].append(line)
+        i += 1
+    for u, v, line in pending:
+        for n in (u, v):
+            if n not in owner:  # 定義行のないノード（Mermaid が暗黙に作る）
+                owner[n] = len(units)
+                units.append([[], 1])
+        edges.append((owner[u], owner[v], line))
+
+    # 連結成分（union-find）
+    parent = list(range(len(units)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b, _ in edges:
+        parent[find(a)] = find(b)
+    components: dict[int, list[int]] = {}
+    for u in range(len(units)):
+        components.setdefault(find(u), []).append(u)
+
+    # 単位 → 部分図番号
+    chunk_of: dict[int, int] = {}
+    chunk_sizes: list[int] = []
+    succ: dict[int, list[int]] = {}
+    for a, b, _ in edges:
+        succ.setdefault(a, []).append(b)
+    for members in components.values():
+        size = sum(units[u][1] for u in members)
+        if size > budget:
+            members = _topological_units(members, succ)
+        elif chunk_sizes and chunk_sizes[-1] + size <= budget:
+            for u in members:
+                chunk_of[u] = len(chunk_sizes) - 1
+            chunk_sizes[-1] += size
+            continue
+        for u in members:
+            if not chunk_sizes or chunk_sizes[-1] + units[u][1] > budget and chunk_sizes[-1]:
+                chunk_sizes.append(0)
+            chunk_of[u] = len(chunk_sizes) - 1
+            chunk_sizes[-1] += units[u][1]
+
+    parts = [list(header) for _ in chunk_sizes]
+    parts[0].extend(loose)
+    for u, (unit_lines, _) in enumerate(units):
+        parts[chunk_of[u]].extend(unit_lines)
+    stubs: list[set[str]] = [set() for _ in chunk_sizes]
+    for a, b, line in edges:
+        target = chunk_of[b]
+        if chunk_of[a] != target:
+            src = _EDGE_RE.match(line).group(1)
+            if src not in stubs[target]:
+                stubs[target].add(src)
+                parts[target].append(f'  {src}(["{src}"])')
+        parts[target].append(line)
+
+    missing = Counter(lines) - Counter(line for part in parts for line in part)
+    if missing:
+        raise ValueError(f"部分図から落ちた行があります: {next(iter(missing))!r}")
+    return parts
+
+
+def _topological_units(members: list[int], succ: dict[int, list[int]]) -> list[int]:
+    """連結成分内の単位をトポロジカル順に並べる（閉路に残った単位は元の順で末尾に）"""
+    member_set = set(members)
+    indegree = {u: 0 for u in members}
+    for u in members:
+        for v in succ.get(u, []):
+            if v in member_set:
+                indegree[v] += 1
+    order = [u for u in members if not indegree[u]]
+    for u in order:
+        for v in succ.get(u, []):
+            if v in member_set:
+                indegree[v] -= 1
+                if not indegree[v]:
+                    order.append(v)
+    seen = set(order)
+    return order + [u for u in members if u not in seen]
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python visualize.py <data_src.json> [output.html]")
+    budget_arg = option_value("--node-budget")
+    args = [a for a in sys.argv[1:] if not a.startswith("--") and a != budget_arg]
+    if not args or (budget_arg is not None and not (budget_arg.isdigit() and int(budget_arg) > 0)):
+        print("Usage: python visualize.py <data_src.json> [output.html] [--node-budget N]")
         sys.exit(1)
 
-    src_path = sys.argv[1]
-    out_path = sys.argv[2] if len(sys.argv) > 2 else str(
+    src_path = args[0]
+    out_path = args[1] if len(args) > 1 else str(
         Path(src_path).parent / "visualization.html"
     )
+    node_budget = int(budget_arg) if budget_arg else NODE_BUDGET
 
     data = load_data(src_path)
-    html_content = build_html(data)
-
     with open(out_path, "w", encoding="utf-8") as f:
-        f.write(html_content)
+        write_html(data, f, node_budget)
 
     print(f"Generated: {out_path}")
 
-
 if __name__ == "__main__":
     main()
@@ -4,10 +4,13 @@ v6 固有の構造（descriptors, entailment_conditions, _phase1.derivation_grap
 """
 
 import json
+import os
 import html as html_mod
 import sys
 from pathlib import Path
 
+from phases import phase_index
+
 
 def load_data(path: str) -> dict:
     with open(path, encoding="utf-8") as f:
@@ -40,8 +43,9 @@ def build_html(data: dict) -> str:
     descriptors = {d["id"]: d for d in data.get("descriptors", data.get("propositions", []))}
     questions = {q["id"]: q for q in data.get("questions", [])}
     initial_confirmed = set(data.get("initial_confirmed", []))
-    phase1 = data.get("_phase1", {})
-    phase2 = data.get("_phase2", {})
+    phases = phase_index(data)
+    phase1 = phases.phase(1)
+    phase2 = phases.phase(2)
 
     # --- Stats ---
     n_desc = len(descriptors)
@@ -317,7 +321,7 @@ def _build_game_simulation(data):
             puzzle = load_puzzle(str(data_json))
         else:
             # Fallback: write temp file
-            tmp = Path(__file__).resolve().parent / "_tmp_vis.json"
+            tmp = Path(__file__).resolve().parent / f"_tmp_vis.{os.getpid()}.json"  # 並列描画で衝突しないように
             cleaned = {k: v for k, v in data.items() if not k.startswith("_")}
             if "S" in cleaned and "statement" not in cleaned:
                 cleaned["statement"] = cleaned.pop("S")
@@ -0,0 +1,160 @@
+"""監視モード (v3)
+
+samples 以下の data_src.json / data.json の更新時刻をポーリングし（外部依存なし）、
+変更されたファイルだけを処理する:
+  data_src.json → export_data で data.json を書き出し、両方を検証し、data.json をコンパイルし、
+                  visualization.html を再生成
+  data.json（対応する data_src.json がない、または直接編集した場合）→ 検証とコンパイルのみ
+
+data.json はコンパイル（compiled.load_compiled）してエンジンが読めるかを確かめる。
+ソースの隣のキャッシュ（.compiled）も更新するので、バッチ処理のツールは次に読むときに
+コンパイルし直さずに済む。
+
+プロセスを起動したままにするので、モジュールの読み込みや導出閉包のキャッシュ
+（closure.get_closure。条件が変わっていなければ前回のコンパイル結果と閉包のメモを再利用する）は
+編集ごとにやり直さない。内容が前回の処理時と同じファイル（保存し直しただけ等）は処理しない。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from common import option_value  # noqa: E402
+from compiled import cache_path, load_compiled  # noqa: E402
+from export_data import export  # noqa: E402
+from render import render, renderer_name  # noqa: E402
+from run_corpus import DATA_FILES, DEFAULT_ROOT, evaluate  # noqa: E402
+from visualize import load_data  # noqa: E402
+
+DEFAULT_INTERVAL = 0.5  # 秒
+
+
+def scan(roots: list[Path]) -> dict[Path, int]:
+    """監視対象ファイル → 更新時刻（ns）"""
+    mtimes: dict[Path, int] = {}
+    for root in roots:
+        if root.is_file():
+            mtimes[root] = root.stat().st_mtime_ns
+            continue
+        for dirpath, _, filenames in os.walk(root):
+            for name in DATA_FILES:
+                if name in filenames:
+                    path = Path(dirpath) / name
+                    try:
+                        mtimes[path] = path.stat().st_mtime_ns
+                    except FileNotFoundError:  # 走査中に消えた
+                        pass
+    return mtimes
+
+
+def _digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _print_result(path: Path, result: dict) -> None:
+    if result.get("error"):
+        print(f"  ✗ {path.name}: {result['error']}")
+        return
+    for name, check in result["checks"].items():
+        if check["skipped"]:
+            print(f"  - {path.name}: {name} SKIP（整合性エラーのため）")
+        elif check["ok"]:
+            print(f"  ✓ {path.name}: {name}")
+        else:
+            print(f"  ✗ {path.name}: {name}")
+            for e in check["errors"]:
+                print(f"      - {e}")
+
+
+class Watcher:
+    """更新されたファイルだけを処理する"""
+
+    def __init__(self, roots: list[Path], visualize: bool = True):
+        self.roots = roots
+        self.visualize = visualize
+        self.mtimes = scan(roots)
+        self.digests: dict[Path, str] = {}  # 最後に処理した時点の内容
+
+    def poll(self) -> list[Path]:
+        """前回の走査から更新・追加されたファイル（data_src.json を先に）"""
+        current = scan(self.roots)
+        changed = [path for path, mtime in current.items() if self.mtimes.get(path) != mtime]
+        self.mtimes = current
+        return sorted(changed, key=lambda p: (p.parent, p.name != "data_src.json"))
+
+    def _unchanged(self, path: Path) -> bool:
+        digest = _digest(path)
+        if self.digests.get(path) == digest:
+            return True
+        self.digests[path] = digest
+        return False
+
+    def process(self, path: Path) -> None:
+        start = time.perf_counter()
+        if not path.exists() or self._unchanged(path):
+            return
+        print(f"[watch] {time.strftime('%H:%M:%S')} {path}")
+        try:
+            if path.name == "data_src.json":
+                self._process_src(path)
+            else:
+                _print_result(path, evaluate(str(path)))
+                self._compile(path)
+        except Exception as e:  # 保存途中の壊れた JSON など: 次の変更を待つ
+            print(f"  ✗ {type(e).__name__}: {e}")
+        print(f"  ({(time.perf_counter() - start) * 1e3:.0f} ms)")
+
+    def _process_src(self, src: Path) -> None:
+        data = load_data(str(src))  # 構文エラーならここで止める（data.json を壊さない）
+        dst = Path(export(str(src)))
+        print(f"  export → {dst.name}")
+        # 書き出した data.json は次の poll で変更として拾わないよう、ここで検証済みにする
+        self.mtimes[dst] = dst.stat().st_mtime_ns
+        self.digests[dst] = _digest(dst)
+        _print_result(src, evaluate(str(src)))
+        _print_result(dst, evaluate(str(dst)))
+        self._compile(dst)
+        if self.visualize:
+            out = render(src, data)
+            print(f"  visualize ({renderer_name(data)}) → {out.name}")
+
+    def _compile(self, path: Path) -> None:
+        try:
+            compiled = load_compiled(path)
+        except Exception as e:  # エンジンが読めない data.json: 検証結果とは別に報告する
+            print(f"  ✗ {path.name}: compile: {type(e).__name__}: {e}")
+            return
+        print(f"  compile → {cache_path(path).name}（命題 {compiled.defined} / 質問 {len(compiled.question_ids)}）")
+
+
+def main():
+    interval_arg = option_value("--interval")
+    roots = [Path(a) for a in sys.argv[1:] if not a.startswith("--") and a != interval_arg] or [DEFAULT_ROOT]
+    for root in roots:
+        if not root.exists():
+            print(f"Error: {root} が見つかりません", file=sys.stderr)
+            sys.exit(2)
+    interval = float(interval_arg or DEFAULT_INTERVAL)
+    if interval <= 0:
+        print("Usage: python watch.py [ROOT|FILE]... [--interval SEC] [--no-visualize]", file=sys.stderr)
+        sys.exit(2)
+
+    watcher = Watcher(roots, visualize="--no-visualize" not in sys.argv)
+    print(f"[watch] {len(watcher.mtimes)} ファイルを監視中（{interval} 秒間隔、Ctrl-C で終了）")
+    try:
+        while True:
+            time.sleep(interval)
+            for path in watcher.poll():
+                watcher.process(path)
+    except KeyboardInterrupt:
+        print()
+
+
+if __name__ == "__main__":
+    main()
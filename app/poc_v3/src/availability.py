@@ -0,0 +1,76 @@
+"""v3 POC: パズルエンジン - 質問の利用可能性
+
+各質問の利用可能条件（prerequisites と reveals 先の formation_conditions）を
+ロード時に 1 本の OR of AND（= Horn 節の集合）に解決し、原子ごとに索引する。
+ゲーム状態ごとに節カウンタを保持し、confirmed の差分だけで利用可能集合を更新する。
+"""
+
+from __future__ import annotations
+
+from clauses import ClauseCounters, ClauseNetwork
+
+
+def availability_clause(
+    prerequisites: list[str], fc: list[list[str]] | None
+) -> list[list[str]]:
+    """prerequisites ∧ fc を OR of AND に展開する（fc が None なら条件なし、[] なら常に不可）"""
+    if fc is None:
+        return [list(prerequisites)]
+    return [list(prerequisites) + list(group) for group in fc]
+
+
+class AvailabilityLayer:
+    """1 ゲーム状態分の利用可能な質問集合（質問の定義順の位置で保持）"""
+
+    def __init__(
+        self,
+        network: ClauseNetwork,
+        reveals: list[str],
+        confirmed: set[str],
+        answered: set[str],
+        seen: int,
+        seen_answered: int,
+    ):
+        self.network = network
+        self.counters = ClauseCounters(network, confirmed)
+        # reveals 先 → 質問の位置
+        self.by_reveal: dict[str, list[int]] = {}
+        for i, r in enumerate(reveals):
+            if r:
+                self.by_reveal.setdefault(r, []).append(i)
+        self.reveals = reveals
+        self.closed: set[int] = set()  # 回答済み・reveals 先が confirmed の質問（以後二度と開かない）
+        for i, qid in enumerate(network.heads):
+            if qid in answered or (reveals[i] and reveals[i] in confirmed):
+                self.closed.add(i)
+        self.open: set[int] = {
+            i for i, n in enumerate(self.counters.satisfied) if n > 0 and i not in self.closed
+        }
+        # 反映済みの confirmed / answered のビットセット（PuzzleIndex の番号付け）
+        self.seen = seen
+        self.answered = seen_answered
+
+    def apply(self, new_confirmed: list[str], seen: int) -> int:
+        """このターンに confirmed へ追加された命題を反映し、新たに開いた質問の数を返す（seen は反映後の confirmed）"""
+        for atom in new_confirmed:
+            for i in self.by_reveal.get(atom, ()):
+                self.closed.add(i)
+                self.open.discard(i)
+        opened = 0
+        for i in self.counters.apply(new_confirmed):
+            if i not in self.closed and i not in self.open:
+                self.open.add(i)
+                opened += 1
+        self.seen = seen
+        return opened
+
+    def close(self, question_id: str, answered: int) -> None:
+        """回答済みの質問を閉じる（answered は閉じた後の answered のビットセット）"""
+        i = self.network.head_index.get(question_id)
+        if i is not None:
+            self.closed.add(i)
+            self.open.discard(i)
+        self.answered = answered
+
+    def positions(self) -> list[int]:
+        return sorted(self.open)
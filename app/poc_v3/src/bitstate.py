@@ -0,0 +1,243 @@
+"""v3 POC: パズルエンジン - ビットセット状態
+
+GameState の各集合（confirmed, derived, discovered_pieces, answered）を、
+パズルごとの命題・質問・ピースの番号付けに基づく整数ビットセット 1 個ずつで表す。
+不変なので fork はコピー不要、hash / 等価性は探索の重複排除にそのまま使える。
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING
+
+from models import GameState
+
+if TYPE_CHECKING:
+    from engine import PuzzleData
+
+
+class IdSpace:
+    """ID ↔ ビット位置の対応（登録順に番号を振る）"""
+
+    def __init__(self, ids: Iterable[str] = ()):
+        self.ids: list[str] = []
+        self.index: dict[str, int] = {}
+        self.update(ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, id_: str) -> int:
+        idx = self.index.get(id_)
+        if idx is None:
+            idx = len(self.ids)
+            self.ids.append(id_)
+            self.index[id_] = idx
+        return idx
+
+    def update(self, ids: Iterable[str]) -> None:
+        for id_ in ids:
+            self.add(id_)
+
+    def bit(self, id_: str) -> int:
+        return 1 << self.index[id_]
+
+    def encode(self, members: Iterable[str]) -> int:
+        """ID 集合をビットセットにする（未登録の ID は KeyError。番号は add / update でだけ振る）"""
+        index = self.index
+        bits = 0
+        for id_ in members:
+            bits |= 1 << index[id_]
+        return bits
+
+    def decode(self, bits: int) -> set[str]:
+        ids = set()
+        while bits:
+            low = bits & -bits
+            ids.add(self.ids[low.bit_length() - 1])
+            bits ^= low
+        return ids
+
+
+class PuzzleIndex:
+    """パズルごとの命題・質問・ピースの番号付け。
+
+    命題には propositions の定義順に番号を振り、続いて条件・初期状態・クリア条件・
+    reveals・ピース構成で参照されるだけの ID にも番号を振る（未定義 ID も表現できる）。
+    """
+
+    def __init__(self, puzzle: PuzzleData):
+        self.props = IdSpace(puzzle.propositions)
+        for p in puzzle.propositions.values():
+            for conditions in (p.entailment_conditions, p.formation_conditions, p.rejection_conditions):
+                for group in conditions or []:
+                    for ref in group:
+                        self.props.add(ref)
+        for ref in puzzle.initial_confirmed:
+            self.props.add(ref)
+        for group in puzzle.clear_conditions:
+            for ref in group:
+                self.props.add(ref)
+        for q in puzzle.questions.values():
+            if q.reveals:
+                self.props.add(q.reveals)
+            for ref in q.prerequisites:
+                self.props.add(ref)
+        for piece in puzzle.pieces.values():
+            for ref in piece.members:
+                self.props.add(ref)
+        self.questions = IdSpace(puzzle.questions)
+        self.pieces = IdSpace(puzzle.pieces)
+
+
+@dataclass(frozen=True, slots=True)
+class BitState:
+    """GameState のビットセット表現（history は hash / 等価性に含めない）"""
+
+    confirmed: int = 0
+    derived: int = 0
+    discovered_pieces: int = 0
+    answered: int = 0
+    history: tuple[str, ...] = field(default=(), compare=False)
+
+    @property
+    def known(self) -> int:
+        """confirmed ∪ derived"""
+        return self.confirmed | self.derived
+
+    def fork(self, **changes) -> BitState:
+        """一部の成分を差し替えた状態を返す（変更なしなら自身をそのまま共有できる）"""
+        return replace(self, **changes) if changes else self
+
+    @classmethod
+    def from_game_state(cls, state: GameState, index: PuzzleIndex) -> BitState:
+        return cls(
+            confirmed=index.props.encode(state.confirmed),
+            derived=index.props.encode(state.derived),
+            discovered_pieces=index.pieces.encode(state.discovered_pieces),
+            answered=index.questions.encode(state.answered),
+            history=tuple(state.history),
+        )
+
+    def to_game_state(self, index: PuzzleIndex) -> GameState:
+        """集合 API の GameState に戻す（差分評価用カウンタは次回の評価時に作り直される）"""
+        return GameState(
+            confirmed=index.props.decode(self.confirmed),
+            derived=index.props.decode(self.derived),
+            discovered_pieces=index.pieces.decode(self.discovered_pieces),
+            answered=index.questions.decode(self.answered),
+            history=list(self.history),
+        )
+
+
+class BitRules:
+    """エンジンの遷移（利用可能性・回答・論理的導出・クリア判定）を BitState 上で行う。
+
+    仮説導出・ピースは利用可能性とクリア判定に影響しないので扱わない
+    （derived / discovered_pieces が必要なら to_game_state で戻してエンジンで評価する）。
+    """
+
+    def __init__(self, puzzle: PuzzleData):
+        self.index = puzzle.index
+        props = self.index.props
+
+        # 論理的導出: (head ビット, 前件マスクのリスト)（定義順）
+        network = puzzle.entailment_network
+        groups: list[list[int]] = [[] for _ in network.heads]
+        for c, body in enumerate(network.bodies):
+            groups[network.clause_head[c]].append(props.encode(body))
+        self.entailment = [(props.bit(h), g) for h, g in zip(network.heads, groups)]
+        # 原子のビット位置 → その原子を前件に含む規則（差分伝播用）
+        self.entailment_watch: dict[int, list[tuple[int, list[int]]]] = {}
+        for bit, masks in self.entailment:
+            atoms = 0
+            for m in masks:
+                atoms |= m
+            while atoms:
+                low = atoms & -atoms
+                self.entailment_watch.setdefault(low.bit_length() - 1, []).append((bit, masks))
+                atoms ^= low
+
+        # 質問（定義順）: reveals ビット（なければ 0）と利用可能条件マスクのリスト
+        network = puzzle.availability_network
+        clauses: list[list[int]] = [[] for _ in network.heads]
+        for c, body in enumerate(network.bodies):
+            clauses[network.clause_head[c]].append(props.encode(body))
+        self.question_ids = [q.id for q in puzzle.question_order]
+        self.question_bits = [self.index.questions.bit(q.id) for q in puzzle.question_order]
+        self.reveals = [props.bit(q.reveals) if q.reveals else 0 for q in puzzle.question_order]
+        self.clauses = clauses
+        self._questions = list(zip(range(len(clauses)), self.question_bits, self.reveals, clauses))
+
+        self.clear = [props.encode(g) for g in puzzle.clear_conditions]
+
+    def entail(self, confirmed: int, new: int | None = None) -> int:
+        """論理的導出の不動点。
+
+        new を渡す場合、confirmed − new が既に不動点であることを前提に
+        new のビットを前件に含む規則だけを辿る。
+        """
+        if new is not None:
+            watch = self.entailment_watch
+            pending = new
+            while pending:
+                low = pending & -pending
+                pending ^= low
+                for bit, masks in watch.get(low.bit_length() - 1, ()):
+                    if confirmed & bit:
+                        continue
+                    for m in masks:
+                        if confirmed & m == m:
+                            confirmed |= bit
+                            pending |= bit
+                            break
+            return confirmed
+
+        changed = True
+        while changed:
+            changed = False
+            for bit, masks in self.entailment:
+                if confirmed & bit:
+                    continue
+                if any(confirmed & m == m for m in masks):
+                    confirmed |= bit
+                    changed = True
+        return confirmed
+
+    def is_clear(self, confirmed: int) -> bool:
+        return any(confirmed & m == m for m in self.clear)
+
+    def available(self, confirmed: int, answered: int) -> list[int]:
+        """利用可能な質問の位置（定義順）"""
+        result = []
+        for i, clauses in enumerate(self.clauses):
+            if answered & self.question_bits[i] or confirmed & self.reveals[i]:
+                continue
+            if any(confirmed & m == m for m in clauses):
+                result.append(i)
+        return result
+
+    def moves(self, confirmed: int) -> list[tuple[int, int, int]]:
+        """confirmed の下で開いている質問の (位置, 質問ビット, 回答後の confirmed)。
+
+        回答済みかどうかは見ないので、confirmed が同じ状態どうしで共有できる
+        （呼び出し側で answered のビットを除外する）。
+        """
+        result = []
+        for i, qbit, reveal, clauses in self._questions:
+            if confirmed & reveal:
+                continue
+            for m in clauses:
+                if confirmed & m == m:
+                    after = self.entail(confirmed | reveal, reveal) if reveal else confirmed
+                    result.append((i, qbit, after))
+                    break
+        return result
+
+    def answer(self, confirmed: int, answered: int, i: int) -> tuple[int, int]:
+        """位置 i の質問に回答した後の (confirmed, answered)"""
+        reveal = self.reveals[i]
+        if reveal and not confirmed & reveal:
+            confirmed = self.entail(confirmed | reveal, reveal)
+        return confirmed, answered | self.question_bits[i]
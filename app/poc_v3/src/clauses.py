@@ -0,0 +1,153 @@
+"""v3 POC: パズルエンジン - Horn 節ネットワーク
+
+OR of AND の条件（entailment_conditions など）を Horn 節の集合としてコンパイルする。
+各グループが 1 本の節「body の全原子 → head」になる。
+
+節ごとの未充足原子カウンタと原子ごとの監視リスト（Dowling–Gallier 方式）により、
+新たに confirmed になった原子が触れる節だけを辿って伝播する。
+"""
+
+from __future__ import annotations
+
+import heapq
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from instrumentation import StageStats
+
+
+class ClauseNetwork:
+    """head ごとの条件（OR of AND）を Horn 節として保持する"""
+
+    def __init__(self, rules: Iterable[tuple[str, list[list[str]]]]):
+        self.heads: list[str] = []  # 節の結論となる命題（定義順）
+        self.clause_head: list[int] = []  # 節 → heads のインデックス
+        self.bodies: list[tuple[str, ...]] = []  # 節 → 前件の原子（重複除去済み）
+        self.watch: dict[str, list[int]] = {}  # 原子 → それを前件に含む節
+        self.empty: list[int] = []  # 前件が空の節（常に充足）
+        self.head_index: dict[str, int] = {}
+        for head, groups in rules:
+            h = len(self.heads)
+            self.heads.append(head)
+            self.head_index[head] = h
+            for group in groups:
+                c = len(self.bodies)
+                body = tuple(dict.fromkeys(group))
+                self.clause_head.append(h)
+                self.bodies.append(body)
+                if not body:
+                    self.empty.append(c)
+                for atom in body:
+                    self.watch.setdefault(atom, []).append(c)
+
+    def __len__(self) -> int:
+        return len(self.bodies)
+
+    def unmet_counts(self, confirmed: set[str]) -> list[int]:
+        """節ごとの未充足原子数"""
+        return [sum(1 for atom in body if atom not in confirmed) for body in self.bodies]
+
+    def propagate(
+        self, confirmed: set[str], seeds: Iterable[str] | None = None, stats: StageStats | None = None
+    ) -> list[str]:
+        """confirmed を不動点まで拡張し、追加した命題を追加順に返す。
+
+        seeds を渡す場合、confirmed − seeds が既に不動点であることを前提に
+        seeds に触れる節だけを辿る。seeds が None なら全節を評価する。
+
+        追加順は「heads を定義順に繰り返し走査し、条件を満たしたものを即座に追加する」
+        素朴な不動点計算と一致する。各原子の確定時刻を (走査回, heads 位置) とし、
+        節が充足した時刻以降で最初に head の位置へ到達する時刻に発火させる。
+
+        stats を渡すと走査回数（最後に処理した走査回 + 1）・触れた節の数・追加した原子の数を加算する。
+        """
+        heads = self.heads
+        clause_head = self.clause_head
+        bodies = self.bodies
+        watch = self.watch
+
+        pending: list[tuple[int, int]] = []  # (走査回, head 位置) のヒープ
+        remaining: dict[int, int] = {}  # 節 → 未充足原子数（触れた節のみ遅延初期化）
+
+        def schedule(c: int, sweep: int, pos: int) -> None:
+            h = clause_head[c]
+            if heads[h] in confirmed:
+                return
+            heapq.heappush(pending, (sweep if pos < h else sweep + 1, h))
+
+        if seeds is None:
+            for c, body in enumerate(bodies):
+                n = sum(1 for atom in body if atom not in confirmed)
+                remaining[c] = n
+                if n == 0:
+                    schedule(c, 0, -1)
+        else:
+            for atom in dict.fromkeys(seeds):
+                for c in watch.get(atom, ()):
+                    if c in remaining:
+                        continue
+                    n = sum(1 for a in bodies[c] if a not in confirmed)
+                    remaining[c] = n
+                    if n == 0:
+                        schedule(c, 0, -1)
+
+        newly_confirmed: list[str] = []
+        sweep = 0
+        while pending:
+            sweep, h = heapq.heappop(pending)
+            head = heads[h]
+            if head in confirmed:
+                continue
+            confirmed.add(head)
+            newly_confirmed.append(head)
+            for c in watch.get(head, ()):
+                n = remaining.get(c)
+                if n is None:
+                    # head は追加済みなので未充足数に含まれない
+                    n = sum(1 for a in bodies[c] if a not in confirmed)
+                else:
+                    n -= 1
+                remaining[c] = n
+                if n == 0:
+                    schedule(c, sweep, h)
+        if stats is not None:
+            stats.iterations += sweep + 1
+            stats.clauses_evaluated += len(remaining)
+            stats.atoms_propagated += len(newly_confirmed)
+        return newly_confirmed
+
+
+class ClauseCounters:
+    """ClauseNetwork に対する 1 状態分の未充足原子カウンタ。
+
+    原子は単調に増えるだけなので、apply は触れた節のカウンタを減らすだけでよい。
+    """
+
+    def __init__(self, network: ClauseNetwork, confirmed: set[str]):
+        self.network = network
+        self.remaining = network.unmet_counts(confirmed)
+        # head ごとの充足済み節の数
+        self.satisfied = [0] * len(network.heads)
+        for c, n in enumerate(self.remaining):
+            if n == 0:
+                self.satisfied[network.clause_head[c]] += 1
+
+    def holds(self, head: str) -> bool:
+        """head のいずれかの節が充足済みか"""
+        h = self.network.head_index.get(head)
+        return h is not None and self.satisfied[h] > 0
+
+    def apply(self, atoms: Iterable[str]) -> list[int]:
+        """atoms を充足済みとして反映し、初めて充足した head の位置を返す"""
+        network = self.network
+        newly: list[int] = []
+        for atom in atoms:
+            for c in network.watch.get(atom, ()):
+                self.remaining[c] -= 1
+                if self.remaining[c] == 0:
+                    h = network.clause_head[c]
+                    self.satisfied[h] += 1
+                    if self.satisfied[h] == 1:
+                        newly.append(h)
+        return newly
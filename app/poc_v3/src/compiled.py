@@ -0,0 +1,330 @@
+"""v3 POC: パズルエンジン - コンパイル済みパズル
+
+パズル JSON を整数添字の表（命題、条件の節配列、質問の reveals・利用可能条件の配列、
+ピース、初期状態、クリア条件）に 1 回の走査で変換し、ソースの隣に pickle でキャッシュする。
+多数のパズルを読むバッチ処理は表だけを使えばよく、データクラスへの詰め替えや
+条件の入れ子リストの保持・reveals の正規化を毎回やり直さずに済む。
+
+PuzzleData が必要なときは CompiledPuzzle.puzzle で組み立てる（load_puzzle と同じ内容）。
+load_compiled はキャッシュを書く前に組み立てておき、節ネットワークや番号付けを含めた
+PuzzleData ごと保存するので、キャッシュから読めば load_puzzle の組み立て処理を丸ごと省ける。
+キャッシュのキーにはソースのサイズ・更新時刻に加えて、表と PuzzleData の内容を決める
+モジュールのソースの指紋を含める（エンジン側を変更すれば古いキャッシュは使われない）。
+
+命題の番号付けは PuzzleIndex と同じ順（propositions の定義順、続いて条件・初期状態・
+クリア条件・reveals / prerequisites・ピース構成で参照される ID）なので、
+表の添字はそのまま BitState のビット位置として使える。
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+import pickle
+from array import array
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from availability import availability_clause
+from bitstate import IdSpace
+from models import Piece, Proposition, Question
+
+if TYPE_CHECKING:
+    from engine import PuzzleData
+
+CACHE_SUFFIX = ".compiled"
+CACHE_VERSION = 2
+SRC_DIR = Path(__file__).resolve().parent
+
+# 表と PuzzleData の内容に影響するモジュール（ソースが変わればキャッシュを作り直す）
+COMPILER_SOURCES = (
+    "availability.py",
+    "bitstate.py",
+    "clauses.py",
+    "compiled.py",
+    "engine.py",
+    "models.py",
+)
+
+
+@dataclass
+class ClauseTable:
+    """OR of AND の条件群を平坦な整数配列で持つ。
+
+    節 c の前件は atoms[offsets[c]:offsets[c + 1]]、結論は heads[clause_head[c]]。
+    条件が None の命題は heads に含めず、[] の命題は節 0 本で含める（ClauseNetwork と同じ区別）。
+    前件の重複は元データのまま残す。
+    """
+
+    heads: array = field(default_factory=lambda: array("i"))
+    clause_head: array = field(default_factory=lambda: array("i"))
+    offsets: array = field(default_factory=lambda: array("i", [0]))
+    atoms: array = field(default_factory=lambda: array("i"))
+
+    def __len__(self) -> int:
+        return len(self.clause_head)
+
+    def add(self, head: int, groups: Iterable[Iterable[int]]) -> None:
+        h = len(self.heads)
+        self.heads.append(head)
+        for group in groups:
+            self.atoms.extend(group)
+            self.clause_head.append(h)
+            self.offsets.append(len(self.atoms))
+
+    def body(self, c: int) -> array:
+        return self.atoms[self.offsets[c]:self.offsets[c + 1]]
+
+    def groups(self) -> dict[int, list[array]]:
+        """head → 前件のリスト（定義順）"""
+        result: dict[int, list[array]] = {head: [] for head in self.heads}
+        for c, h in enumerate(self.clause_head):
+            result[self.heads[h]].append(self.body(c))
+        return result
+
+
+@dataclass
+class CompiledPuzzle:
+    """整数添字のパズル表"""
+
+    id: str
+    title: str
+    statement: str
+    truth: str
+    props: list[str]  # 命題の番号付け（先頭 defined 個が propositions の定義順）
+    defined: int
+    labels: list[str]  # 定義済み命題のラベル
+    negation_of: list[str | None]  # 定義済み命題の negation_of（未定義 ID もそのまま）
+    entailment: ClauseTable
+    formation: ClauseTable
+    rejection: ClauseTable
+    question_ids: list[str]  # 質問の定義順
+    question_text: list[str]
+    question_answer: list[str]
+    question_mechanism: list[str]
+    question_reveals: list[str]  # 元の reveals（正規化済み）
+    reveals: array  # reveals 先の命題の添字（reveals がなければ -1）
+    prerequisites: ClauseTable  # head = 質問の位置、節 1 本
+    availability: ClauseTable  # head = 質問の位置（prerequisites ∧ reveals 先の fc を解決済み）
+    piece_ids: list[str]
+    piece_labels: list[str]
+    piece_members: ClauseTable  # head = ピースの位置、節 1 本
+    piece_depends_on: list[list[str]]
+    initial: array
+    clear: ClauseTable  # head なし（節のみ）
+    _puzzle: PuzzleData | None = field(default=None, init=False, repr=False, compare=False)
+
+    def __getstate__(self) -> dict:
+        state = dict(self.__dict__)
+        # load_hints で状態が付け加えられた PuzzleData は保存しない
+        if self._puzzle is not None and self._puzzle.hints is not None:
+            state["_puzzle"] = None
+        return state
+
+    @property
+    def puzzle(self) -> PuzzleData:
+        """load_puzzle と同じ PuzzleData（初回アクセス時に組み立てる）"""
+        if self._puzzle is None:
+            self._puzzle = self._build_puzzle()
+        return self._puzzle
+
+    def _build_puzzle(self) -> PuzzleData:
+        from engine import PuzzleData
+
+        props = self.props
+
+        def conditions(table: ClauseTable) -> dict[int, list[list[str]]]:
+            return {head: [[props[a] for a in body] for body in bodies] for head, bodies in table.groups().items()}
+
+        entailment = conditions(self.entailment)
+        formation = conditions(self.formation)
+        rejection = conditions(self.rejection)
+        propositions = {}
+        for i in range(self.defined):
+            p = Proposition(
+                id=props[i],
+                label=self.labels[i],
+                negation_of=self.negation_of[i],
+                formation_conditions=formation.get(i),
+                entailment_conditions=entailment.get(i),
+                rejection_conditions=rejection.get(i),
+            )
+            propositions[p.id] = p
+
+        members = conditions(self.piece_members)
+        pieces = {}
+        for i, pid in enumerate(self.piece_ids):
+            pieces[pid] = Piece(
+                id=pid,
+                label=self.piece_labels[i],
+                members=members[i][0],
+                depends_on=list(self.piece_depends_on[i]),
+            )
+
+        prerequisites = conditions(self.prerequisites)
+        questions = {}
+        for i, qid in enumerate(self.question_ids):
+            questions[qid] = Question(
+                id=qid,
+                text=self.question_text[i],
+                answer=self.question_answer[i],
+                reveals=self.question_reveals[i],
+                mechanism=self.question_mechanism[i],
+                prerequisites=prerequisites[i][0],
+            )
+
+        return PuzzleData(
+            id=self.id,
+            title=self.title,
+            statement=self.statement,
+            truth=self.truth,
+            propositions=propositions,
+            initial_confirmed=[props[a] for a in self.initial],
+            clear_conditions=[[props[a] for a in self.clear.body(c)] for c in range(len(self.clear))],
+            pieces=pieces,
+            questions=questions,
+        )
+
+
+def compile_puzzle(raw: dict) -> CompiledPuzzle:
+    """パース済みの JSON を整数添字の表に変換する（load_puzzle と同じ解釈）"""
+    # ID の重複は後の定義で上書き（位置は最初の定義のまま）
+    propositions = {item["id"]: item for item in raw.get("propositions", raw.get("descriptors", []))}
+    pieces = {item["id"]: item for item in raw.get("pieces", [])}
+    questions = {item["id"]: item for item in raw["questions"]}
+    reveals_ids = [
+        item["reveals"] if isinstance(item["reveals"], str) else item["reveals"][0] for item in questions.values()
+    ]
+    initial_confirmed = raw["initial_confirmed"]
+    clear_conditions = raw.get("clear_conditions", [])
+
+    # 番号付け（PuzzleIndex と同じ順）
+    space = IdSpace(propositions)
+    kinds = ("entailment_conditions", "formation_conditions", "rejection_conditions")
+    for item in propositions.values():
+        for kind in kinds:
+            for group in item.get(kind) or []:
+                for ref in group:
+                    space.add(ref)
+    space.update(initial_confirmed)
+    for group in clear_conditions:
+        space.update(group)
+    for item, reveals in zip(questions.values(), reveals_ids):
+        if reveals:
+            space.add(reveals)
+        space.update(item.get("prerequisites", []))
+    for item in pieces.values():
+        space.update(item["members"])
+    index = space.index
+
+    tables = {kind: ClauseTable() for kind in kinds}
+    for i, item in enumerate(propositions.values()):
+        for kind in kinds:
+            groups = item.get(kind)
+            if groups is not None:
+                tables[kind].add(i, ([index[a] for a in group] for group in groups))
+
+    prerequisites = ClauseTable()
+    availability = ClauseTable()
+    for i, (item, reveals) in enumerate(zip(questions.values(), reveals_ids)):
+        prereqs = item.get("prerequisites", [])
+        prerequisites.add(i, [[index[a] for a in prereqs]])
+        # engine._question_availability_conditions と同じ解決（いいえ は negation_of 先の fc）
+        fc = None
+        prop = propositions.get(reveals) if reveals else None
+        if prop is not None:
+            fc = prop.get("formation_conditions")
+            target = propositions.get(prop.get("negation_of")) if item["answer"] == "いいえ" else None
+            if target is not None:
+                fc = target.get("formation_conditions")
+        availability.add(i, ([index[a] for a in group] for group in availability_clause(prereqs, fc)))
+
+    members = ClauseTable()
+    for i, item in enumerate(pieces.values()):
+        members.add(i, [[index[a] for a in item["members"]]])
+
+    clear = ClauseTable()
+    for group in clear_conditions:
+        clear.atoms.extend(index[a] for a in group)
+        clear.clause_head.append(-1)
+        clear.offsets.append(len(clear.atoms))
+
+    return CompiledPuzzle(
+        id=raw["id"],
+        title=raw["title"],
+        statement=raw["statement"],
+        truth=raw["truth"],
+        props=space.ids,
+        defined=len(propositions),
+        labels=[item["label"] for item in propositions.values()],
+        negation_of=[item.get("negation_of") for item in propositions.values()],
+        entailment=tables["entailment_conditions"],
+        formation=tables["formation_conditions"],
+        rejection=tables["rejection_conditions"],
+        question_ids=list(questions),
+        question_text=[item["text"] for item in questions.values()],
+        question_answer=[item["answer"] for item in questions.values()],
+        question_mechanism=[item["mechanism"] for item in questions.values()],
+        question_reveals=reveals_ids,
+        reveals=array("i", (index[r] if r else -1 for r in reveals_ids)),
+        prerequisites=prerequisites,
+        availability=availability,
+        piece_ids=list(pieces),
+        piece_labels=[item["label"] for item in pieces.values()],
+        piece_members=members,
+        piece_depends_on=[list(item.get("depends_on", [])) for item in pieces.values()],
+        initial=array("i", (index[a] for a in initial_confirmed)),
+        clear=clear,
+    )
+
+
+def cache_path(path: str | Path) -> Path:
+    """ソースの隣に置くキャッシュファイルのパス（data.json → data.compiled）"""
+    return Path(path).with_suffix(CACHE_SUFFIX)
+
+
+@functools.cache
+def compiler_version() -> str:
+    h = hashlib.sha256(str(CACHE_VERSION).encode())
+    for name in COMPILER_SOURCES:
+        h.update((SRC_DIR / name).read_bytes())
+    return h.hexdigest()[:16]
+
+
+def load_compiled(path: str | Path, use_cache: bool = True) -> CompiledPuzzle:
+    """コンパイル済みパズルを返す。
+
+    キャッシュがソースのサイズ・更新時刻とコンパイラーのバージョンに一致すればそれを読み、
+    なければ JSON をコンパイルし、PuzzleData まで組み立ててキャッシュを書き出す
+    （書けない場所なら書かずに返す）。
+    """
+    source = Path(path)
+    stat = source.stat()
+    key = (compiler_version(), stat.st_size, stat.st_mtime_ns)
+    cached = cache_path(source)
+    if use_cache:
+        try:
+            with open(cached, "rb") as f:
+                stored_key, compiled = pickle.load(f)
+            if stored_key == key:
+                return compiled
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError, AttributeError):
+            pass
+
+    with open(source, encoding="utf-8") as f:
+        compiled = compile_puzzle(json.load(f))
+
+    if use_cache:
+        compiled.puzzle  # 組み立て済みの PuzzleData ごと保存する
+        tmp = cached.with_name(cached.name + f".{os.getpid()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump((key, compiled), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cached)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+    return compiled
@@ -8,9 +8,15 @@ v3 の導出は 2 段階:
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 
+from availability import AvailabilityLayer, availability_clause
+from bitstate import PuzzleIndex
+from clauses import ClauseNetwork
+from hints import HintTable, puzzle_fingerprint
+from hypotheses import HypothesisLayer
+from instrumentation import StageStats, TurnStats, active_recorder, clock
 from models import (
     GameState,
     Piece,
@@ -32,6 +38,32 @@ class PuzzleData:
     clear_conditions: list[list[str]]  # OR of AND: クリア条件（命題IDの族）
     pieces: dict[str, Piece]
     questions: dict[str, Question]
+    entailment_network: ClauseNetwork = field(init=False, repr=False, compare=False)
+    formation_network: ClauseNetwork = field(init=False, repr=False, compare=False)
+    rejection_network: ClauseNetwork = field(init=False, repr=False, compare=False)
+    availability_network: ClauseNetwork = field(init=False, repr=False, compare=False)
+    question_order: list[Question] = field(init=False, repr=False, compare=False)  # 定義順
+    index: PuzzleIndex = field(init=False, repr=False, compare=False)  # ビットセット状態用の番号付け
+    hints: HintTable | None = field(default=None, init=False, repr=False, compare=False)  # load_hints で設定
+
+    def __post_init__(self):
+        props = self.propositions.values()
+        self.entailment_network = ClauseNetwork(
+            (p.id, p.entailment_conditions) for p in props if p.entailment_conditions is not None
+        )
+        self.formation_network = ClauseNetwork(
+            (p.id, p.formation_conditions) for p in props if p.formation_conditions is not None
+        )
+        self.rejection_network = ClauseNetwork(
+            (p.id, p.rejection_conditions) for p in props if p.rejection_conditions is not None
+        )
+        # 質問ごとの利用可能条件（prerequisites ∧ reveals 先の fc）をロード時に解決
+        self.question_order = list(self.questions.values())
+        self.availability_network = ClauseNetwork(
+            (q.id, availability_clause(q.prerequisites, _question_availability_conditions(q, self)))
+            for q in self.question_order
+        )
+        self.index = PuzzleIndex(self)
 
 
 def load_puzzle(path: str | Path) -> PuzzleData:
@@ -39,8 +71,9 @@ def load_puzzle(path: str | Path) -> PuzzleData:
     with open(path, encoding="utf-8") as f:
         raw = json.load(f)
 
+    # v3 形式は propositions、旧形式は descriptors
     propositions = {}
-    for item in raw["descriptors"]:
+    for item in raw.get("propositions", raw.get("descriptors", [])):
         p = Proposition(
             id=item["id"],
             label=item["label"],
@@ -52,7 +85,7 @@ def load_puzzle(path: str | Path) -> PuzzleData:
         propositions[p.id] = p
 
     pieces = {}
-    for item in raw["pieces"]:
+    for item in raw.get("pieces", []):
         p = Piece(
             id=item["id"],
             label=item["label"],
@@ -94,61 +127,105 @@ def init_game(puzzle: PuzzleData) -> GameState:
     return state
 
 
-def evaluate_entailments(state: GameState, puzzle: PuzzleData) -> list[str]:
+def evaluate_entailments(
+    state: GameState,
+    puzzle: PuzzleData,
+    seeds: list[str] | None = None,
+    stats: StageStats | None = None,
+) -> list[str]:
     """論理的導出: confirmed → confirmed の不動点計算。
 
     entailment_conditions が confirmed で満たされる命題を confirmed に追加する。
     論理的帰結であり連鎖は許容される。
+    Horn 節ネットワークで伝播するため、コストは新たな confirmed が触れる節の数に比例する。
+    seeds: 前回の不動点以降に confirmed へ追加された命題（None なら全節を評価）
+    stats: 計測値の加算先（走査回数・触れた節の数・追加した命題の数）
     戻り値: 新たに confirmed に追加された命題のリスト
     """
-    newly_confirmed = []
-    changed = True
-    while changed:
-        changed = False
-        for p in puzzle.propositions.values():
-            if p.entailment_conditions is None:
-                continue
-            if p.id in state.confirmed:
-                continue
-            for cond_group in p.entailment_conditions:
-                if all(c in state.confirmed for c in cond_group):
-                    state.confirmed.add(p.id)
-                    newly_confirmed.append(p.id)
-                    changed = True
-                    break
-    return newly_confirmed
-
-
-def evaluate_hypotheses(state: GameState, puzzle: PuzzleData) -> tuple[list[str], list[str]]:
+    start = clock() if stats is not None else 0.0
+    newly = puzzle.entailment_network.propagate(state.confirmed, seeds, stats)
+    if state.confirmed_bits is not None:
+        state.confirmed_bits |= puzzle.index.props.encode(newly)
+    if stats is not None:
+        stats.wall_time += clock() - start
+    return newly
+
+
+def _confirmed_bits(state: GameState, puzzle: PuzzleData) -> int:
+    """state.confirmed のビットセット（未保持なら集合から作って state に持たせる）"""
+    if state.confirmed_bits is None:
+        state.confirmed_bits = puzzle.index.props.encode(state.confirmed)
+    return state.confirmed_bits
+
+
+def _answered_bits(state: GameState, puzzle: PuzzleData) -> int:
+    """state.answered のビットセット（未保持なら集合から作って state に持たせる）"""
+    if state.answered_bits is None:
+        state.answered_bits = puzzle.index.questions.encode(state.answered)
+    return state.answered_bits
+
+
+def evaluate_hypotheses(
+    state: GameState,
+    puzzle: PuzzleData,
+    new_confirmed: list[str] | None = None,
+    stats: StageStats | None = None,
+) -> tuple[list[str], list[str]]:
     """仮説導出: confirmed → derived の 1 回パス。
 
     formation_conditions が confirmed で満たされる命題を derived とする。
     不動点計算は行わない（derived からの連鎖なし）。
+    new_confirmed（このターンに confirmed へ追加された命題）を渡すと、
+    それに触れる形成・棄却条件を持つ命題だけを再判定する。
+    stats: 計測値の加算先（触れた形成・棄却節の数、derived の増減数）
     戻り値: (newly_derived, newly_rejected)
     """
-    # Step 1: 棄却集合の計算（confirmed のみ参照）
-    rejected = set()
-    for p in puzzle.propositions.values():
-        if p.rejection_conditions is not None:
-            if any(all(c in state.confirmed for c in group) for group in p.rejection_conditions):
-                rejected.add(p.id)
-
-    # Step 2: 1 回パス（confirmed のみ参照、連鎖なし）
-    new_derived = set()
-    for p in puzzle.propositions.values():
-        if p.formation_conditions is None:
-            continue
-        if p.id in state.confirmed or p.id in rejected:
-            continue
-        for cond_group in p.formation_conditions:
-            if all(c in state.confirmed for c in cond_group):
-                new_derived.add(p.id)
-                break
-
-    newly_derived = sorted(new_derived - state.derived)
-    newly_rejected = sorted((state.derived - new_derived) - state.confirmed)
-    state.derived = new_derived
-    return newly_derived, newly_rejected
+    start = clock() if stats is not None else 0.0
+    seen = _confirmed_bits(state, puzzle)
+    layer = state.hypotheses
+    if (
+        new_confirmed is None
+        or layer is None
+        or layer.formation is not puzzle.formation_network
+        or layer.seen != seen & ~puzzle.index.props.encode(new_confirmed)
+    ):
+        # 全体を再計算（初期化時、またはカウンタが反映済みの confirmed が状態と食い違う場合）
+        layer = HypothesisLayer(puzzle.formation_network, puzzle.rejection_network, state.confirmed, seen)
+        state.hypotheses = layer
+        new_derived = layer.derived(state.confirmed)
+        newly_derived = sorted(new_derived - state.derived)
+        newly_rejected = sorted((state.derived - new_derived) - state.confirmed)
+        state.derived = new_derived
+        if stats is not None:
+            stats.iterations += 1
+            stats.clauses_evaluated += len(puzzle.formation_network) + len(puzzle.rejection_network)
+            stats.atoms_propagated += len(newly_derived) + len(newly_rejected)
+            stats.wall_time += clock() - start
+        return newly_derived, newly_rejected
+
+    newly_derived = []
+    newly_rejected = []
+    for prop_id in layer.apply(new_confirmed, seen):
+        now = layer.is_derived(prop_id, state.confirmed)
+        if now and prop_id not in state.derived:
+            state.derived.add(prop_id)
+            newly_derived.append(prop_id)
+        elif not now and prop_id in state.derived:
+            state.derived.discard(prop_id)
+            if prop_id not in state.confirmed:
+                newly_rejected.append(prop_id)
+    if stats is not None:
+        stats.iterations += 1
+        stats.clauses_evaluated += _watched_clauses(puzzle.formation_network, new_confirmed)
+        stats.clauses_evaluated += _watched_clauses(puzzle.rejection_network, new_confirmed)
+        stats.atoms_propagated += len(newly_derived) + len(newly_rejected)
+        stats.wall_time += clock() - start
+    return sorted(newly_derived), sorted(newly_rejected)
+
+
+def _watched_clauses(network: ClauseNetwork, atoms: list[str]) -> int:
+    """atoms の反映でカウンタを更新する節の数（計測用）"""
+    return sum(len(network.watch.get(atom, ())) for atom in atoms)
 
 
 def _check_conditions(conditions: list[list[str]], state: GameState) -> bool:
@@ -181,24 +258,55 @@ def _question_availability_conditions(q: Question, puzzle: PuzzleData) -> list[l
     return prop.formation_conditions
 
 
-def available_questions(state: GameState, puzzle: PuzzleData) -> list[Question]:
+def _availability_layer(state: GameState, puzzle: PuzzleData) -> AvailabilityLayer:
+    """状態の利用可能性カウンタを返す（未作成・不整合なら confirmed から作り直す）"""
+    seen = _confirmed_bits(state, puzzle)
+    seen_answered = _answered_bits(state, puzzle)
+    layer = state.availability
+    if (
+        layer is None
+        or layer.network is not puzzle.availability_network
+        or layer.seen != seen
+        or layer.answered != seen_answered
+    ):
+        layer = AvailabilityLayer(
+            puzzle.availability_network,
+            [q.reveals for q in puzzle.question_order],
+            state.confirmed,
+            state.answered,
+            seen,
+            seen_answered,
+        )
+        state.availability = layer
+    return layer
+
+
+def available_questions(
+    state: GameState, puzzle: PuzzleData, stats: StageStats | None = None
+) -> list[Question]:
     """利用可能な質問を返す: 前提条件が満たされ、reveals 先の命題が形成可能で、未回答のもの
 
     - 前提条件（prerequisites）: confirmed のみで判定。対話上で確立された事実。
     - 形成条件: reveals 先の命題の formation_conditions を confirmed のみで判定。
+    - reveals 先が confirmed の質問は表示しない（既知の情報）。
+    条件はロード時に節へ解決済みで、状態ごとのカウンタを回答のたびに差分更新する。
+    stats: 計測値の加算先（カウンタを作り直した場合の節の数、利用可能な質問の数）。
+    None で計測が有効なら問い合わせ 1 回分を Recorder に記録する。
     """
-    result = []
-    for q in puzzle.questions.values():
-        if q.id in state.answered:
-            continue
-        # reveals 先が confirmed なら表示しない（既知の情報）
-        if q.reveals and q.reveals in state.confirmed:
-            continue
-        if q.prerequisites and not all(p in state.confirmed for p in q.prerequisites):
-            continue
-        fc = _question_availability_conditions(q, puzzle)
-        if fc is None or _check_conditions(fc, state):
-            result.append(q)
+    recorder = active_recorder()
+    if stats is None and recorder is not None:
+        stats = StageStats("available_questions")
+        recorder.record_query(stats)
+    start = clock() if stats is not None else 0.0
+    previous = state.availability
+    layer = _availability_layer(state, puzzle)
+    result = [puzzle.question_order[i] for i in layer.positions()]
+    if stats is not None:
+        if layer is not previous:  # カウンタを作り直した
+            stats.iterations += 1
+            stats.clauses_evaluated += len(puzzle.availability_network)
+        stats.atoms_propagated += len(result)
+        stats.wall_time += clock() - start
     return result
 
 
@@ -213,6 +321,7 @@ class AnswerResult:
     mechanism: str
     is_link: bool
     is_anomaly: bool
+    stats: TurnStats | None = None  # 計測が有効なときの段階ごとの計測値（instrumentation.enable）
 
 
 def answer_question(
@@ -221,20 +330,29 @@ def answer_question(
     """質問に回答し、状態を更新する"""
     new_confirmed: list[str] = []
     new_pieces: list[str] = []
+    recorder = active_recorder()
+    turn = TurnStats(question.id) if recorder is not None else None
+    turn_start = clock() if turn is not None else 0.0
 
     # 1. reveals の命題を confirmed に追加
     if question.reveals and question.reveals not in state.confirmed:
         state.confirmed.add(question.reveals)
         new_confirmed.append(question.reveals)
+        if state.confirmed_bits is not None:
+            state.confirmed_bits |= puzzle.index.props.bit(question.reveals)
 
-    # 2. 論理的導出（confirmed → confirmed の不動点計算）
-    entailed = evaluate_entailments(state, puzzle)
+    # 2. 論理的導出（confirmed → confirmed の不動点計算、reveals から差分伝播）
+    stats = turn.stage("entailment") if turn is not None else None
+    entailed = evaluate_entailments(state, puzzle, seeds=new_confirmed, stats=stats)
     new_confirmed.extend(entailed)
 
-    # 3. 仮説導出（confirmed → derived の 1 回パス）
-    new_derived, new_rejected = evaluate_hypotheses(state, puzzle)
+    # 3. 仮説導出（confirmed → derived の 1 回パス、このターンの confirmed 差分のみ再判定）
+    stats = turn.stage("hypotheses") if turn is not None else None
+    new_derived, new_rejected = evaluate_hypotheses(state, puzzle, new_confirmed, stats=stats)
 
     # 4. ピースの構成命題がすべて揃ったかチェック（confirmed ∪ derived で判定）
+    stats = turn.stage("pieces") if turn is not None else None
+    start = clock() if stats is not None else 0.0
     known = state.known
     for piece in puzzle.pieces.values():
         if piece.id in state.discovered_pieces:
@@ -245,12 +363,39 @@ def answer_question(
             continue
         state.discovered_pieces.add(piece.id)
         new_pieces.append(piece.id)
+    if stats is not None:
+        stats.iterations += 1
+        stats.clauses_evaluated += len(puzzle.pieces)
+        stats.atoms_propagated += len(new_pieces)
+        stats.wall_time += clock() - start
 
     # 履歴に記録
     state.answered.add(question.id)
     state.history.append(question.id)
-
-    return AnswerResult(
+    if state.answered_bits is not None:
+        state.answered_bits |= puzzle.index.questions.bit(question.id)
+
+    # 5. 利用可能性カウンタを差分更新（不整合なら次の available_questions で作り直す）
+    stats = turn.stage("availability") if turn is not None else None
+    start = clock() if stats is not None else 0.0
+    layer = state.availability
+    seen = _confirmed_bits(state, puzzle)
+    answered = _answered_bits(state, puzzle)
+    if (
+        layer is not None
+        and layer.seen == seen & ~puzzle.index.props.encode(new_confirmed)
+        and layer.answered | puzzle.index.questions.bit(question.id) == answered
+    ):
+        opened = layer.apply(new_confirmed, seen)
+        layer.close(question.id, answered)
+        if stats is not None:
+            stats.iterations += 1
+            stats.clauses_evaluated += _watched_clauses(puzzle.availability_network, new_confirmed)
+            stats.atoms_propagated += opened
+    if stats is not None:
+        stats.wall_time += clock() - start
+
+    result = AnswerResult(
         new_confirmed=new_confirmed,
         new_derived=new_derived,
         new_rejected=new_rejected,
@@ -259,6 +404,11 @@ def answer_question(
         is_link=question.mechanism == "link",
         is_anomaly=question.mechanism == "anomaly",
     )
+    if turn is not None:
+        turn.wall_time = clock() - turn_start
+        result.stats = turn
+        recorder.record_turn(turn)
+    return result
 
 
 def check_complete(state: GameState, puzzle: PuzzleData) -> bool:
@@ -267,3 +417,38 @@ def check_complete(state: GameState, puzzle: PuzzleData) -> bool:
         all(prop_id in state.confirmed for prop_id in condition_set)
         for condition_set in puzzle.clear_conditions
     )
+
+
+def load_hints(puzzle: PuzzleData, path: str | Path) -> None:
+    """ヒント表（eval/build_hints.py の出力）を読み込んで puzzle に結び付ける。
+
+    表を作ったときとパズル定義が異なる場合は ValueError。
+    """
+    table = HintTable(path)
+    if table.fingerprint != puzzle_fingerprint(puzzle):
+        table.close()
+        raise ValueError(f"{path}: ヒント表がパズル定義と一致しません（build_hints.py で作り直してください）")
+    puzzle.hints = table
+
+
+@dataclass
+class Hint:
+    """ヒント表から引いた現在の状態の評価"""
+
+    remaining: int | None  # クリアまでの最小残り質問数（クリア不能なら None）
+    questions: list[Question]  # 最短でクリアに向かう次の質問（定義順）
+
+
+def hint(state: GameState, puzzle: PuzzleData) -> Hint | None:
+    """現在の状態のヒントを返す。
+
+    ヒント表を 1 回引くだけなので O(1)。
+    ヒント表が未読み込み、または表にない状態なら None。
+    """
+    if puzzle.hints is None:
+        return None
+    found = puzzle.hints.lookup(_confirmed_bits(state, puzzle))
+    if found is None:
+        return None
+    remaining, question_ids = found
+    return Hint(remaining=remaining, questions=[puzzle.questions[qid] for qid in question_ids])
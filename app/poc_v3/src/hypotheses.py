@@ -0,0 +1,45 @@
+"""v3 POC: パズルエンジン - 仮説層
+
+formation_conditions / rejection_conditions の Horn 節ネットワークに対する
+節ごとの未充足原子カウンタをゲーム状態ごとに保持する。
+confirmed は単調に増えるだけなので、各ターンに新たに confirmed になった命題が
+触れる節のカウンタを減らし、影響を受けた命題だけ derived を再判定する。
+"""
+
+from __future__ import annotations
+
+from clauses import ClauseCounters, ClauseNetwork
+
+
+class HypothesisLayer:
+    """1 ゲーム状態分の仮説導出・棄却カウンタ"""
+
+    def __init__(self, formation: ClauseNetwork, rejection: ClauseNetwork, confirmed: set[str], seen: int):
+        self.formation = formation
+        self.rejection = rejection
+        self.form_counters = ClauseCounters(formation, confirmed)
+        self.rej_counters = ClauseCounters(rejection, confirmed)
+        self.seen = seen  # 反映済みの confirmed のビットセット（PuzzleIndex の番号付け）
+
+    def is_rejected(self, prop_id: str) -> bool:
+        return self.rej_counters.holds(prop_id)
+
+    def is_derived(self, prop_id: str, confirmed: set[str]) -> bool:
+        if not self.form_counters.holds(prop_id):
+            return False
+        return prop_id not in confirmed and not self.is_rejected(prop_id)
+
+    def derived(self, confirmed: set[str]) -> set[str]:
+        """現在のカウンタから derived 全体を求める"""
+        return {p for p in self.formation.heads if self.is_derived(p, confirmed)}
+
+    def apply(self, new_confirmed: list[str], seen: int) -> set[str]:
+        """new_confirmed をカウンタに反映し、derived の判定が変わりうる命題を返す（seen は反映後の confirmed）"""
+        # 命題自体が confirmed になると derived から外れる
+        affected = set(new_confirmed)
+        for h in self.form_counters.apply(new_confirmed):
+            affected.add(self.formation.heads[h])
+        for h in self.rej_counters.apply(new_confirmed):
+            affected.add(self.rejection.heads[h])
+        self.seen = seen
+        return affected
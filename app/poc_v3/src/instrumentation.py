@@ -0,0 +1,108 @@
+"""v3 POC: パズルエンジン - 計測
+
+1 回の回答（answer_question）を段階（論理的導出・仮説導出・ピース判定・利用可能性）に分け、
+段階ごとの経過時間・走査回数・評価した節の数・伝播した原子の数を記録する。
+
+enable() で Recorder を有効にしている間だけ、answer_question が TurnStats を作って
+AnswerResult.stats に付け、Recorder に蓄積する。無効時はエンジンの各関数が
+「Recorder / StageStats が None か」を 1 回見るだけなので、オーバーヘッドは無視できる。
+
+Recorder.write_jsonl はターンごと・利用可能性の問い合わせごとに 1 行、
+最後に段階ごとの集計を 1 行ずつ JSON Lines で書き出す。
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from typing import IO
+
+clock = time.perf_counter  # 経過時間の計測に使う時計
+
+
+@dataclass
+class StageStats:
+    """1 段階分の計測値（意味は段階ごとに engine の各関数の docstring を参照）"""
+
+    stage: str
+    wall_time: float = 0.0  # 秒
+    iterations: int = 0  # 不動点計算の走査回数（1 回パスの段階は 1）
+    clauses_evaluated: int = 0  # 充足判定・カウンタ更新を行った節の数
+    atoms_propagated: int = 0  # 新たに成り立った原子（命題・ピース・質問）の数
+
+
+@dataclass
+class TurnStats:
+    """1 回の answer_question の計測値"""
+
+    question_id: str
+    wall_time: float = 0.0
+    stages: list[StageStats] = field(default_factory=list)
+
+    def stage(self, name: str) -> StageStats:
+        stats = StageStats(name)
+        self.stages.append(stats)
+        return stats
+
+
+class Recorder:
+    """有効な間の全ターンと利用可能性の問い合わせを蓄積する"""
+
+    def __init__(self):
+        self.turns: list[TurnStats] = []
+        self.queries: list[StageStats] = []  # answer_question 外の available_questions
+
+    def record_turn(self, turn: TurnStats) -> None:
+        self.turns.append(turn)
+
+    def record_query(self, stats: StageStats) -> None:
+        self.queries.append(stats)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """段階ごとの集計（回数・合計・最大経過時間と各カウンタの合計）"""
+        totals: dict[str, dict[str, float]] = {}
+        stages = [s for turn in self.turns for s in turn.stages] + self.queries
+        for s in stages:
+            t = totals.setdefault(
+                s.stage,
+                {"count": 0, "wall_time": 0.0, "max_wall_time": 0.0, "iterations": 0,
+                 "clauses_evaluated": 0, "atoms_propagated": 0},
+            )
+            t["count"] += 1
+            t["wall_time"] += s.wall_time
+            t["max_wall_time"] = max(t["max_wall_time"], s.wall_time)
+            t["iterations"] += s.iterations
+            t["clauses_evaluated"] += s.clauses_evaluated
+            t["atoms_propagated"] += s.atoms_propagated
+        return totals
+
+    def write_jsonl(self, fp: IO[str]) -> None:
+        for i, turn in enumerate(self.turns):
+            fp.write(json.dumps({"kind": "turn", "index": i, **asdict(turn)}, ensure_ascii=False) + "\n")
+        for i, stats in enumerate(self.queries):
+            fp.write(json.dumps({"kind": "query", "index": i, **asdict(stats)}, ensure_ascii=False) + "\n")
+        for stage, totals in self.summary().items():
+            fp.write(json.dumps({"kind": "summary", "stage": stage, **totals}, ensure_ascii=False) + "\n")
+
+
+_recorder: Recorder | None = None
+
+
+def enable(recorder: Recorder | None = None) -> Recorder:
+    """計測を有効にする（以後の answer_question / available_questions を記録する）"""
+    global _recorder
+    _recorder = recorder or Recorder()
+    return _recorder
+
+
+def disable() -> Recorder | None:
+    """計測を無効にし、それまで使っていた Recorder を返す"""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+def active_recorder() -> Recorder | None:
+    return _recorder
+
@@ -3,6 +3,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from availability import AvailabilityLayer
+    from hypotheses import HypothesisLayer
 
 
 @dataclass
@@ -45,6 +50,14 @@ class GameState:
     discovered_pieces: set[str] = field(default_factory=set)
     answered: set[str] = field(default_factory=set)
     history: list[str] = field(default_factory=list)
+    # 仮説導出・棄却の差分評価用カウンタ（engine が管理。None なら次回全体を再計算）
+    hypotheses: HypothesisLayer | None = field(default=None, repr=False, compare=False)
+    # 利用可能な質問の差分管理用カウンタ（engine が管理。None なら次回全体を再計算）
+    availability: AvailabilityLayer | None = field(default=None, repr=False, compare=False)
+    # confirmed / answered のビットセット（engine が追加分を OR して保持。None なら次回の評価時に集合から作る）。
+    # init=False なので replace() で集合を差し替えた状態では None に戻り、copy() では値ごと複製される
+    confirmed_bits: int | None = field(default=None, init=False, repr=False, compare=False)
+    answered_bits: int | None = field(default=None, init=False, repr=False, compare=False)
 
     @property
     def known(self) -> set[str]: